@@ -0,0 +1,167 @@
+# backend/answer_cache.py
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from backend.embedding_store import chunk_hash
+from backend.table_loader import resolve_table
+from backend.tracing import span
+
+ANSWER_CACHE_PATH = "cache/answers.db"
+ANSWER_CACHE_MAX_ENTRIES = 2000
+ANSWER_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+# Cosine similarity above which a differently worded question reuses an answer. Off unless configured,
+# since questions differing only in a year, ID or part number retrieve the same chunks and embed almost alike
+SEMANTIC_MATCH_THRESHOLD = (
+    float(os.getenv("ANSWER_CACHE_SEMANTIC_THRESHOLD")) if os.getenv("ANSWER_CACHE_SEMANTIC_THRESHOLD") else None
+)
+
+
+def normalize_question(question):
+    question = " ".join(question.lower().split())
+    return re.sub(r"[\s?!.]+$", "", question)
+
+
+def table_fingerprint(table):
+    """
+    Content identity of a DataFrame or BackgroundTable: the ingest content
+    key of the upload it came from, or a hash of its values for frames
+    created some other way
+    """
+    fingerprint = getattr(table, "fingerprint", None)
+    if fingerprint is None and isinstance(table, pd.DataFrame):
+        fingerprint = table.attrs.get("fingerprint")
+    if fingerprint:
+        return fingerprint
+    df = resolve_table(table)
+    values = pd.util.hash_pandas_object(df, index=True).to_numpy()
+    return hashlib.sha1(values.tobytes() + ",".join(map(str, df.columns)).encode("utf-8", errors="ignore")).hexdigest()
+
+
+def context_fingerprint(text_chunks, named_dfs=None):
+    """Hash of the retrieved chunk ids and the contents of the DataFrames in play"""
+    digest = hashlib.sha1()
+    for key in sorted(chunk_hash(chunk[0]) for chunk in text_chunks):
+        digest.update(key.encode())
+    for name, (df, filename) in sorted((named_dfs or {}).items()):
+        digest.update(f"{name}|{filename}|{table_fingerprint(df)}".encode("utf-8", errors="ignore"))
+    return digest.hexdigest()
+
+
+class AnswerCache:
+    """
+    SQLite-backed cache of LLM answers keyed by normalized question plus
+    context fingerprint, with LRU eviction beyond max_entries, a TTL, and an
+    optional question-embedding similarity match within the same context.
+    """
+
+    def __init__(self, path=ANSWER_CACHE_PATH, max_entries=ANSWER_CACHE_MAX_ENTRIES,
+                 ttl_seconds=ANSWER_CACHE_TTL_SECONDS, similarity_threshold=SEMANTIC_MATCH_THRESHOLD):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                "key TEXT PRIMARY KEY, fingerprint TEXT, question TEXT, answer TEXT, "
+                "embedding BLOB, created REAL, last_used REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS answers_fingerprint ON answers (fingerprint)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS answers_last_used ON answers (last_used)")
+        return self._conn
+
+    @staticmethod
+    def _key(question, fingerprint):
+        return hashlib.sha1(f"{normalize_question(question)}|{fingerprint}".encode("utf-8")).hexdigest()
+
+    def get(self, question, text_chunks, named_dfs=None, question_embedding=None):
+        """Returning a cached answer for this question and context, or None"""
+        with span("answer_cache") as s:
+            answer = self._get(question, text_chunks, named_dfs, question_embedding)
+            s.set(hit=answer is not None)
+        return answer
+
+    def _get(self, question, text_chunks, named_dfs, question_embedding):
+        fingerprint = context_fingerprint(text_chunks, named_dfs)
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM answers WHERE created < ?", (now - self.ttl_seconds,))
+            key = self._key(question, fingerprint)
+            row = conn.execute("SELECT answer, key FROM answers WHERE key = ?", (key,)).fetchone()
+            if row is None and self.similarity_threshold is not None and question_embedding is not None:
+                row = self._similar(conn, fingerprint, question_embedding)
+                if row is not None:
+                    self.semantic_hits += 1
+            if row is None:
+                self.misses += 1
+                conn.commit()
+                return None
+
+            self.hits += 1
+            conn.execute("UPDATE answers SET last_used = ? WHERE key = ?", (now, row[1]))
+            conn.commit()
+            return row[0]
+
+    def _similar(self, conn, fingerprint, question_embedding):
+        rows = conn.execute(
+            "SELECT answer, key, embedding FROM answers WHERE fingerprint = ? AND embedding IS NOT NULL",
+            (fingerprint,)
+        ).fetchall()
+        if not rows:
+            return None
+        query = np.asarray(question_embedding, dtype=np.float32).ravel()
+        query = query / (np.linalg.norm(query) or 1.0)
+        matrix = np.stack([np.frombuffer(row[2], dtype=np.float32) for row in rows])
+        scores = matrix @ query
+        best = int(np.argmax(scores))
+        return rows[best][:2] if scores[best] >= self.similarity_threshold else None
+
+    def put(self, question, text_chunks, answer, named_dfs=None, question_embedding=None):
+        fingerprint = context_fingerprint(text_chunks, named_dfs)
+        embedding = None
+        if question_embedding is not None:
+            vector = np.asarray(question_embedding, dtype=np.float32).ravel()
+            embedding = (vector / (np.linalg.norm(vector) or 1.0)).tobytes()
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self._key(question, fingerprint), fingerprint, question, answer, embedding, now, now)
+            )
+            # Evicting the least recently used answers beyond max_entries
+            conn.execute(
+                "DELETE FROM answers WHERE key IN ("
+                "SELECT key FROM answers ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            conn.commit()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
+answer_cache = AnswerCache()
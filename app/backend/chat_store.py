@@ -0,0 +1,196 @@
+# backend/chat_store.py
+import datetime
+import json
+import os
+
+# On-disk layout for one user, under <data_dir>/<email>/:
+#
+#   chats.json             chat metadata (titles, counts), rewritten atomically
+#   messages/<chat>.jsonl  one message per line, append-only
+#   context/<chat>.jsonl   one {"chunks": [...], "sources": [...]} batch per line, append-only
+#
+# Saving compares the in-memory chat history with the counts recorded in
+# chats.json and only appends what is new, so a turn costs a few small writes
+# no matter how much history the user has. Embeddings live separately as
+# binary .npy files next to the chat index (see context_manager.index_path).
+
+STORE_VERSION = "2.0"
+CHAT_LIST_FILE = "chats.json"
+
+
+def user_dir(data_dir, email):
+    return os.path.join(data_dir, email)
+
+def _messages_path(data_dir, email, chat_id):
+    return os.path.join(user_dir(data_dir, email), "messages", f"{chat_id}.jsonl")
+
+def _context_path(data_dir, email, chat_id):
+    return os.path.join(user_dir(data_dir, email), "context", f"{chat_id}.jsonl")
+
+def _write_json_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(f"{path}.tmp", path)
+
+def _append_jsonl(path, records):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("".join(json.dumps(record) + "\n" for record in records))
+
+def _rewrite_jsonl(path, records):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+        f.write("".join(json.dumps(record) + "\n" for record in records))
+    os.replace(f"{path}.tmp", path)
+
+def _read_jsonl(path):
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # Skipping a line left half-written by an interrupted append
+                continue
+    return records
+
+def has_store(data_dir, email):
+    return os.path.exists(os.path.join(user_dir(data_dir, email), CHAT_LIST_FILE))
+
+def load_chat_list(data_dir, email):
+    """Reading chats.json, the small per-user file of chat metadata"""
+    path = os.path.join(user_dir(data_dir, email), CHAT_LIST_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def load_messages(data_dir, email, chat_id):
+    return _read_jsonl(_messages_path(data_dir, email, chat_id))
+
+def load_context(data_dir, email, chat_id):
+    context = {"text_chunks": [], "sources": []}
+    for batch in _read_jsonl(_context_path(data_dir, email, chat_id)):
+        context["text_chunks"].extend(batch.get("chunks", []))
+        context["sources"].extend(batch.get("sources", []))
+    return context
+
+def _save_messages(path, messages, saved_count):
+    # Appending new messages, or rewriting the log if the list shrank
+    if len(messages) > saved_count:
+        _append_jsonl(path, messages[saved_count:])
+    elif len(messages) < saved_count:
+        _rewrite_jsonl(path, messages)
+
+def save_chats(data_dir, email, name, chat_history):
+    """Persisting only the parts of chat_history that changed since the last save"""
+    chat_list = load_chat_list(data_dir, email)
+    saved = chat_list.get("chats", {})
+    chats = {}
+
+    for cid, chat in chat_history.items():
+        # Chats never opened this session are still on disk exactly as recorded
+        if chat.get("loaded") is False and cid in saved:
+            chats[cid] = saved[cid]
+            continue
+
+        meta = dict(saved.get(cid, {}))
+        messages = chat.get("messages", [])
+        context = chat.get("context", {})
+        chunks = context.get("text_chunks", [])
+        sources = context.get("sources", [])
+
+        _save_messages(_messages_path(data_dir, email, cid), messages, meta.get("message_count", 0))
+
+        # Chunks and sources grow together, so new ones are appended as one batch line
+        chunk_count = meta.get("chunk_count", 0)
+        source_count = meta.get("source_count", 0)
+        if len(chunks) < chunk_count or len(sources) < source_count:
+            _rewrite_jsonl(_context_path(data_dir, email, cid), [{"chunks": chunks, "sources": sources}])
+        elif len(chunks) > chunk_count or len(sources) > source_count:
+            _append_jsonl(
+                _context_path(data_dir, email, cid),
+                [{"chunks": chunks[chunk_count:], "sources": sources[source_count:]}]
+            )
+
+        counts = {
+            "title": chat.get("title", "New Chat"),
+            "message_count": len(messages),
+            "chunk_count": len(chunks),
+            "source_count": len(sources)
+        }
+        if any(meta.get(key) != value for key, value in counts.items()):
+            meta.update(counts)
+            meta["updated"] = str(datetime.datetime.now())
+        chats[cid] = meta
+
+    # Removing the logs of chats that no longer exist
+    for cid in set(saved) - set(chats):
+        for path in (_messages_path(data_dir, email, cid), _context_path(data_dir, email, cid)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    if chats != saved or chat_list.get("name") != name or not chat_list:
+        _write_json_atomic(os.path.join(user_dir(data_dir, email), CHAT_LIST_FILE), {
+            "version": STORE_VERSION,
+            "name": name,
+            "email": email,
+            "chats": chats,
+            "last_updated": str(datetime.datetime.now())
+        })
+
+def load_chat(data_dir, email, chat_id, meta=None):
+    """Reading one chat's messages and context, reconciling its counts with the logs"""
+    meta = meta if meta is not None else load_chat_list(data_dir, email).get("chats", {}).get(chat_id, {})
+    chat = {
+        "title": meta.get("title", "New Chat"),
+        "messages": load_messages(data_dir, email, chat_id),
+        "context": load_context(data_dir, email, chat_id)
+    }
+
+    # Trusting the logs over chats.json if a save was interrupted between the two writes
+    counts = {
+        "message_count": len(chat["messages"]),
+        "chunk_count": len(chat["context"]["text_chunks"]),
+        "source_count": len(chat["context"]["sources"])
+    }
+    if meta and any(meta.get(key) != value for key, value in counts.items()):
+        chat_list = load_chat_list(data_dir, email)
+        if chat_id in chat_list.get("chats", {}):
+            chat_list["chats"][chat_id].update(counts)
+            _write_json_atomic(os.path.join(user_dir(data_dir, email), CHAT_LIST_FILE), chat_list)
+    return chat
+
+def load_user(data_dir, email, lazy=True):
+    """
+    Reading a user's chats into the in-memory chat_history shape.
+
+    With lazy=True only chats.json is read and every chat is a stub
+    ({"title", "updated", "loaded": False}); load_chat fills one in when it
+    is opened, so login cost does not depend on history size.
+    """
+    chat_list = load_chat_list(data_dir, email)
+    if not chat_list:
+        return {}
+
+    chat_history = {}
+    for cid, meta in chat_list.get("chats", {}).items():
+        if lazy:
+            chat_history[cid] = {
+                "title": meta.get("title", "New Chat"),
+                "updated": meta.get("updated"),
+                "loaded": False
+            }
+        else:
+            chat_history[cid] = load_chat(data_dir, email, cid, meta)
+
+    return {
+        "version": chat_list.get("version", STORE_VERSION),
+        "name": chat_list.get("name"),
+        "email": email,
+        "chat_history": chat_history,
+        "last_updated": chat_list.get("last_updated")
+    }
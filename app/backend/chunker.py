@@ -0,0 +1,143 @@
+# backend/chunker.py
+import re
+
+from backend.tracing import span
+
+# Target chunk size and the overlap carried into the next chunk, in tokens
+CHUNK_TOKENS = 200
+CHUNK_OVERLAP = 30
+
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n")
+
+_encoding = None
+
+
+def _get_encoding():
+    # Loading the tokenizer once; falling back to a character estimate if tiktoken is unavailable
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    return _encoding
+
+
+def count_tokens(text):
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode_ordinary(text))
+    return max(1, len(text) // 4)
+
+
+def truncate_to_tokens(text, max_tokens):
+    encoding = _get_encoding()
+    if encoding:
+        tokens = encoding.encode_ordinary(text)
+        return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
+    return text[:max_tokens * 4]
+
+
+def _segments(text):
+    """
+    (start, end, ends_paragraph) character spans of the sentences in text,
+    never crossing a paragraph break
+    """
+    spans = []
+    paragraph_start = 0
+    for match in list(PARAGRAPH_BREAK.finditer(text)) + [None]:
+        paragraph_end = match.start() if match else len(text)
+        start = paragraph_start
+        for sentence in SENTENCE_END.finditer(text, paragraph_start, paragraph_end):
+            if text[start:sentence.start()].strip():
+                spans.append((start, sentence.start(), False))
+            start = sentence.end()
+        if text[start:paragraph_end].strip():
+            spans.append((start, paragraph_end, False))
+        if spans and not spans[-1][2]:
+            spans[-1] = (spans[-1][0], spans[-1][1], True)
+        paragraph_start = match.end() if match else len(text)
+    return spans
+
+
+def _split_long(text, start, end, max_tokens):
+    """Breaking a sentence longer than max_tokens at word boundaries"""
+    spans = []
+    piece_start = start
+    words = list(re.finditer(r"\S+", text[start:end]))
+    tokens = 0
+    for word in words:
+        word_tokens = count_tokens(word.group())
+        if tokens and tokens + word_tokens > max_tokens:
+            spans.append((piece_start, start + word.start()))
+            piece_start = start + word.start()
+            tokens = 0
+        tokens += word_tokens
+    spans.append((piece_start, end))
+    return spans
+
+
+def chunk_text(text, source, page=None, max_tokens=CHUNK_TOKENS, overlap=CHUNK_OVERLAP):
+    """
+    Splitting text into chunks of at most max_tokens, packing whole sentences
+    and preferring paragraph breaks, with about `overlap` tokens repeated
+    between consecutive chunks.
+
+    Returns (text, source, metadata) tuples where metadata holds the source,
+    page and character offset of the chunk within text.
+    """
+    if not text or not text.strip():
+        return []
+    with span("chunk") as s:
+        chunks = _chunk_text(text, source, page, max_tokens, overlap)
+        s.count("chars", len(text))
+        s.count("chunks", len(chunks))
+    return chunks
+
+
+def _chunk_text(text, source, page, max_tokens, overlap):
+
+    pieces = []
+    encoding = _get_encoding()
+    spans = _segments(text)
+    if encoding:
+        token_counts = [len(t) for t in encoding.encode_ordinary_batch([text[s:e] for s, e, _ in spans])]
+    else:
+        token_counts = [count_tokens(text[s:e]) for s, e, _ in spans]
+    for (start, end, paragraph_end), tokens in zip(spans, token_counts):
+        if tokens > max_tokens:
+            long_spans = _split_long(text, start, end, max_tokens)
+            pieces.extend((s, e, count_tokens(text[s:e]), False) for s, e in long_spans)
+        else:
+            pieces.append((start, end, tokens, paragraph_end))
+
+    chunks = []
+    window = []
+    window_tokens = 0
+    for piece in pieces:
+        # Cutting when the chunk is full, or early at a paragraph end once it is mostly full
+        full = window_tokens + piece[2] > max_tokens
+        at_paragraph = window and window[-1][3] and window_tokens >= max_tokens * 3 // 4
+        if window and (full or at_paragraph):
+            chunks.append(window)
+            # Carrying trailing pieces into the next chunk as overlap
+            carried = []
+            carried_tokens = 0
+            for previous in reversed(window):
+                if carried_tokens + previous[2] > overlap or carried_tokens + previous[2] + piece[2] > max_tokens:
+                    break
+                carried.insert(0, previous)
+                carried_tokens += previous[2]
+            window = carried
+            window_tokens = carried_tokens
+        window.append(piece)
+        window_tokens += piece[2]
+    if window:
+        chunks.append(window)
+
+    return [
+        (text[window[0][0]:window[-1][1]], source, {"source": source, "page": page, "offset": window[0][0]})
+        for window in chunks
+    ]
@@ -0,0 +1,545 @@
+# backend/code_executor.py
+import atexit
+import builtins
+import contextlib
+import io
+import itertools
+import multiprocessing
+import os
+import pickle
+import queue
+import signal
+import tempfile
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+try:
+    import resource
+except ImportError:  # not available on Windows, where only the wall-clock timeout applies
+    resource = None
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:  # pyarrow is optional, tables are then shared as pickles
+    pyarrow = None
+
+from backend.resources import shared_resource
+from backend.tracing import span
+
+# Worker processes kept warm for generated code, across all sessions
+EXEC_WORKERS = int(os.getenv("EXEC_WORKERS", "2"))
+# Limits of a single code block: CPU seconds, extra address space, and wall-clock time
+EXEC_CPU_SECONDS = 20
+EXEC_MEMORY_MB = int(os.getenv("EXEC_MEMORY_MB", "2048"))
+EXEC_WALL_SECONDS = 30
+# Time a freshly spawned worker gets to import pandas and plotly
+EXEC_STARTUP_SECONDS = 60
+# Captured stdout beyond this many characters is cut off
+EXEC_MAX_STDOUT_CHARS = 20000
+# Rows of each DataFrame the generated code shows that are sent back for display
+EXEC_MAX_TABLE_ROWS = 1000
+# Tables kept exported for the workers; least recently used ones are removed past this size
+SHARED_TABLES_MAX_BYTES = 1024 * 1024 * 1024
+# Exported tables each worker keeps mapped between calls
+WORKER_TABLE_CACHE = 8
+
+# Modules generated code may not import (the prompt already asks the model not to use them)
+BLOCKED_MODULES = {
+    "os", "sys", "io", "subprocess", "shutil", "socket", "ctypes", "multiprocessing",
+    "threading", "pathlib", "signal", "resource", "importlib", "pickle", "requests", "urllib",
+}
+
+SHARED_TABLES_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+
+class SharedTables:
+    """
+    DataFrames exported once to memory-backed files for the workers: Arrow
+    IPC files that workers memory-map without copying, or pickles when
+    pyarrow is missing or a column cannot be converted. Tables are keyed by
+    object identity and only weakly referenced, so an export never keeps its
+    DataFrame alive: the file is removed once the frame is garbage collected,
+    or least recently used first once the total exceeds max_bytes, except
+    while a run is using it.
+    """
+
+    def __init__(self, directory=SHARED_TABLES_DIR, max_bytes=SHARED_TABLES_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # id(df) -> {"ref", "finalizer", "path", "format", "size", "users"}
+        self._counter = itertools.count()
+        # Reentrant, since dropping the last reference to a DataFrame runs its finalizer on the spot
+        self._lock = threading.RLock()
+
+    def _write(self, df):
+        stem = os.path.join(self.directory, f"askdocs-{os.getpid()}-{next(self._counter)}")
+        if pyarrow is not None:
+            try:
+                table = pyarrow.Table.from_pandas(df, preserve_index=True)
+                path = f"{stem}.arrow"
+                with pyarrow.OSFile(path, "wb") as sink, pyarrow.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+                return path, "arrow"
+            except (pyarrow.ArrowException, ValueError, TypeError):
+                # Mixed-type object columns have no Arrow type
+                pass
+        path = f"{stem}.pkl"
+        with open(path, "wb") as f:
+            pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return path, "pickle"
+
+    def acquire(self, tables):
+        """Exporting every DataFrame of {name: df} not exported yet, returning {name: (path, format)}"""
+        handles = {}
+        with self._lock:
+            for name, df in tables.items():
+                entry = self._entries.get(id(df))
+                if entry is None or entry["ref"]() is not df:
+                    path, fmt = self._write(df)
+                    entry = {
+                        "ref": weakref.ref(df), "finalizer": weakref.finalize(df, self._discard, id(df), path),
+                        "path": path, "format": fmt, "size": os.path.getsize(path), "users": 0,
+                    }
+                    self._entries[id(df)] = entry
+                self._entries.move_to_end(id(df))
+                entry["users"] += 1
+                handles[name] = (entry["path"], entry["format"])
+            self._evict()
+        return handles
+
+    def release(self, tables):
+        with self._lock:
+            for df in tables.values():
+                entry = self._entries.get(id(df))
+                if entry is not None and entry["ref"]() is df:
+                    entry["users"] -= 1
+            self._evict()
+
+    def _discard(self, key, path):
+        # The DataFrame is gone, so nothing can ask for its export again
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["path"] == path:
+                del self._entries[key]
+        with contextlib.suppress(OSError):
+            os.unlink(path)
+
+    def _evict(self):
+        total = sum(entry["size"] for entry in self._entries.values())
+        for key, entry in list(self._entries.items()):
+            if total <= self.max_bytes:
+                break
+            if entry["users"]:
+                continue
+            entry["finalizer"].detach()
+            # Workers that still map the file keep it readable until they drop it
+            with contextlib.suppress(OSError):
+                os.unlink(entry["path"])
+            self._entries.pop(key, None)
+            total -= entry["size"]
+
+    def clear(self):
+        with self._lock:
+            for entry in self._entries.values():
+                entry["finalizer"].detach()
+                with contextlib.suppress(OSError):
+                    os.unlink(entry["path"])
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# --------- WORKER PROCESS ---------
+
+class CPULimitExceeded(Exception):
+    pass
+
+
+def _encode_table(data, max_rows):
+    """A {"kind": "table"} output: the first max_rows rows as an Arrow IPC stream, or JSON without pyarrow"""
+    import pandas as pd
+
+    df = data.to_frame() if isinstance(data, pd.Series) else pd.DataFrame(data)
+    output = {"kind": "table", "rows": len(df)}
+    df = df.head(max_rows)
+    if pyarrow is not None:
+        try:
+            table = pyarrow.Table.from_pandas(df, preserve_index=True)
+            sink = pyarrow.BufferOutputStream()
+            with pyarrow.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table)
+            return dict(output, format="arrow", value=sink.getvalue().to_pybytes())
+        except (pyarrow.ArrowException, ValueError, TypeError):
+            pass
+    return dict(output, format="json", value=df.to_json(orient="split", date_format="iso", default_handler=str))
+
+
+def decode_table(output):
+    """The DataFrame of a {"kind": "table"} output returned by CodeExecutor.run"""
+    import pandas as pd
+
+    if output["format"] == "arrow":
+        return pyarrow.ipc.open_stream(output["value"]).read_all().to_pandas()
+    return pd.read_json(io.StringIO(output["value"]), orient="split")
+
+
+class _Outputs:
+    """
+    What a code block shows, in order: {"kind": "text" | "markdown" | "table"}
+    entries. Also the stdout of the block, so printed text lands between the
+    tables; text and markdown beyond max_chars are cut off.
+    """
+
+    def __init__(self, max_chars, max_rows):
+        self.entries = []
+        self.max_chars = max_chars
+        self.max_rows = max_rows
+        self.chars = 0
+        self.truncated = False
+
+    def add(self, kind, text):
+        remaining = self.max_chars - self.chars
+        if len(text) > remaining:
+            text = text[:max(remaining, 0)]
+            self.truncated = True
+        if not text:
+            return
+        self.chars += len(text)
+        if kind == "text" and self.entries and self.entries[-1]["kind"] == "text":
+            self.entries[-1]["value"] += text
+        else:
+            self.entries.append({"kind": kind, "value": text})
+
+    def add_table(self, data):
+        self.entries.append(_encode_table(data, self.max_rows))
+
+    def write(self, text):
+        self.add("text", text)
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def finish(self):
+        if self.truncated:
+            self.entries.append({"kind": "text", "value": "\n... (output truncated)"})
+        return self.entries
+
+
+class _StreamlitShim:
+    """Stand-in for the `st` calls generated code may make, recording what they show and collecting figures"""
+
+    def __init__(self, outputs, figures):
+        self._outputs = outputs
+        self._figures = figures
+
+    def write(self, *args, **kwargs):
+        # Like st.write: DataFrames as tables, figures as charts, anything else as markdown
+        import pandas as pd
+        import plotly.graph_objects as go
+
+        for arg in args:
+            if isinstance(arg, (pd.DataFrame, pd.Series)):
+                self._outputs.add_table(arg)
+            elif isinstance(arg, go.Figure):
+                self._figures.append(arg)
+            else:
+                self.markdown(str(arg))
+
+    def markdown(self, body, *args, **kwargs):
+        self._outputs.add("markdown", str(body))
+
+    def text(self, body, *args, **kwargs):
+        self._outputs.add("text", f"{body}\n")
+
+    code = text
+
+    def dataframe(self, data, *args, **kwargs):
+        self._outputs.add_table(data)
+
+    table = dataframe
+
+    def plotly_chart(self, figure, *args, **kwargs):
+        self._figures.append(figure)
+
+
+def _restricted_import(name, *args, **kwargs):
+    if name.split(".")[0] in BLOCKED_MODULES:
+        raise ImportError(f"Importing '{name}' is not allowed in generated code")
+    return builtins.__import__(name, *args, **kwargs)
+
+
+def _blocked_open(*args, **kwargs):
+    raise PermissionError("Reading or writing files is not allowed in generated code")
+
+
+def _on_cpu_limit(signum, frame):
+    raise CPULimitExceeded()
+
+
+def _address_space_bytes():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+
+
+@contextlib.contextmanager
+def _limits(cpu_seconds, memory_bytes):
+    # Limits are raised again after each call since the worker serves many blocks
+    if resource is None:
+        yield
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    _, cpu_hard = resource.getrlimit(resource.RLIMIT_CPU)
+    _, as_hard = resource.getrlimit(resource.RLIMIT_AS)
+    resource.setrlimit(resource.RLIMIT_CPU, (int(usage.ru_utime + usage.ru_stime) + 1 + cpu_seconds, cpu_hard))
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (_address_space_bytes() + memory_bytes, as_hard))
+    except (OSError, ValueError):
+        pass
+    try:
+        yield
+    finally:
+        resource.setrlimit(resource.RLIMIT_AS, (as_hard, as_hard))
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_hard, cpu_hard))
+
+
+def _load_table(path, fmt):
+    if fmt == "arrow":
+        # Memory-mapping the file, so the Arrow buffers are the shared pages themselves
+        return pyarrow.ipc.open_file(pyarrow.memory_map(path, "r")).read_all()
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def _run_in_worker(code, handles, tables, cpu_seconds, memory_bytes, max_stdout, max_table_rows):
+    import pandas as pd
+    import numpy as np
+    import plotly.express as px
+    import plotly.graph_objects as go
+
+    started = time.perf_counter()
+    figures = []
+    outputs = _Outputs(max_stdout, max_table_rows)
+
+    def _print(*args, **kwargs):
+        # print(df) shows an interactive table, as it did when generated code ran in the app itself
+        if len(args) == 1 and not kwargs and isinstance(args[0], (pd.DataFrame, pd.Series)):
+            outputs.add_table(args[0])
+        else:
+            builtins.print(*args, **kwargs)
+
+    namespace = {
+        "__builtins__": dict(vars(builtins), __import__=_restricted_import, open=_blocked_open, print=_print),
+        "pd": pd, "np": np, "px": px, "go": go, "st": _StreamlitShim(outputs, figures),
+    }
+    error = None
+    try:
+        # Each call gets its own DataFrames, so code that mutates them cannot affect the next block
+        for name, (path, fmt) in handles.items():
+            if path not in tables:
+                tables[path] = _load_table(path, fmt)
+                while len(tables) > WORKER_TABLE_CACHE:
+                    tables.popitem(last=False)
+            tables.move_to_end(path)
+            loaded = tables[path]
+            namespace[name] = loaded.to_pandas() if fmt == "arrow" else loaded.copy()
+
+        # Limiting only the generated code itself; Arrow's conversion threads need their own address space
+        with _limits(cpu_seconds, memory_bytes), contextlib.redirect_stdout(outputs):
+            exec(compile(code, "<generated code>", "exec"), namespace)
+    except MemoryError:
+        error = f"Memory limit of {memory_bytes // (1024 * 1024)}MB exceeded"
+    except CPULimitExceeded:
+        error = f"CPU time limit of {cpu_seconds}s exceeded"
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+
+    # Figures left in variables are shown too, like the figures passed to st.plotly_chart
+    shown = {id(figure) for figure in figures}
+    figures.extend(value for value in namespace.values() if isinstance(value, go.Figure) and id(value) not in shown)
+    entries = outputs.finish()
+    return {
+        "stdout": "".join(entry["value"] for entry in entries if entry["kind"] == "text"),
+        "outputs": entries,
+        "figures": [figure.to_json() for figure in figures],
+        "error": error,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def _worker_main(conn):
+    """Entry point of a worker process: importing the analysis stack once, then serving code blocks"""
+    import pandas  # noqa: F401
+    import plotly.express  # noqa: F401
+    import plotly.graph_objects as go
+
+    # fig.show() would try to open a browser from the worker
+    go.Figure.show = lambda self, *args, **kwargs: None
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if hasattr(signal, "SIGXCPU"):
+        signal.signal(signal.SIGXCPU, _on_cpu_limit)
+    os.chdir(tempfile.mkdtemp(prefix="askdocs-exec-"))
+
+    tables = OrderedDict()
+    conn.send("ready")
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            return
+        if request is None:
+            return
+        try:
+            result = _run_in_worker(tables=tables, **request)
+        except Exception as e:
+            result = {"stdout": "", "outputs": [], "figures": [], "error": f"{type(e).__name__}: {e}", "seconds": 0.0}
+        conn.send(result)
+
+
+# --------- PARENT SIDE ---------
+
+class _Worker:
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), name="code-executor", daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+
+    def wait_ready(self, timeout):
+        if not self.ready:
+            if not self.conn.poll(timeout):
+                raise TimeoutError("Code executor worker did not start")
+            self.conn.recv()
+            self.ready = True
+
+    def kill(self):
+        with contextlib.suppress(Exception):
+            self.process.kill()
+            self.process.join(1)
+        self.conn.close()
+
+    def close(self):
+        with contextlib.suppress(Exception):
+            self.conn.send(None)
+            self.process.join(1)
+        self.kill()
+
+
+class CodeExecutor:
+    """
+    Running generated code blocks in a pool of warm worker processes, so a
+    runaway block cannot stall the Streamlit server. Each block is limited
+    to cpu_seconds of CPU time, memory_mb of extra address space and
+    wall_seconds overall; a worker that hits the wall-clock limit or dies is
+    replaced. DataFrames reach the workers as memory-mapped Arrow files.
+
+    This isolates resource use, not hostile code: imports of os, sys and
+    similar modules are refused, but the worker is an ordinary process.
+    """
+
+    def __init__(self, workers=EXEC_WORKERS, cpu_seconds=EXEC_CPU_SECONDS, memory_mb=EXEC_MEMORY_MB,
+                 wall_seconds=EXEC_WALL_SECONDS, shared_tables=None):
+        self.size = workers
+        self.cpu_seconds = cpu_seconds
+        self.memory_bytes = memory_mb * 1024 * 1024
+        self.wall_seconds = wall_seconds
+        self.shared_tables = shared_tables or SharedTables()
+        # Spawning rather than forking, so workers do not inherit the server's threads and loaded models
+        self._context = multiprocessing.get_context("spawn")
+        self._idle = queue.Queue()
+        self._started = False
+        self._lock = threading.Lock()
+        self.stats = {"runs": 0, "errors": 0, "timeouts": 0, "crashes": 0, "respawns": 0}
+
+    def start(self):
+        """Spawning the workers ahead of the first block, for warm-up"""
+        with self._lock:
+            if self._started:
+                return self
+            self._started = True
+            for _ in range(self.size):
+                self._idle.put(_Worker(self._context))
+        return self
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _replace(self, worker):
+        worker.kill()
+        self._count("respawns")
+        self._idle.put(_Worker(self._context))
+
+    def run(self, code, tables=None):
+        """
+        Executing code with the DataFrames of {name: df} in scope (plus pd,
+        np, px and go), returning {"stdout", "outputs" (text, markdown and
+        tables in the order shown; see decode_table), "figures" (Plotly JSON
+        strings), "error" (None on success), "seconds"}.
+        """
+        with span("exec", tables=len(tables or {})) as s:
+            result = self._run(code, tables)
+            s.set(seconds=round(result["seconds"], 3), error=result["error"])
+            s.count("stdout_chars", len(result["stdout"]))
+            s.count("figures", len(result["figures"]))
+        return result
+
+    def _run(self, code, tables):
+        self.start()
+        tables = tables or {}
+        self._count("runs")
+        handles = self.shared_tables.acquire(tables)
+        worker = self._idle.get()
+        try:
+            worker.wait_ready(EXEC_STARTUP_SECONDS)
+            worker.conn.send({
+                "code": code, "handles": handles, "cpu_seconds": self.cpu_seconds,
+                "memory_bytes": self.memory_bytes, "max_stdout": EXEC_MAX_STDOUT_CHARS,
+                "max_table_rows": EXEC_MAX_TABLE_ROWS,
+            })
+            if not worker.conn.poll(self.wall_seconds):
+                self._count("timeouts")
+                self._replace(worker)
+                return self._failure(f"Code execution timed out after {self.wall_seconds}s")
+            result = worker.conn.recv()
+        except (EOFError, OSError, TimeoutError) as e:
+            # The worker died, e.g. killed by the OS for using too much memory
+            self._count("crashes")
+            self._replace(worker)
+            return self._failure(f"Code execution worker crashed ({str(e) or type(e).__name__})")
+        finally:
+            self.shared_tables.release(tables)
+        self._idle.put(worker)
+        if result["error"]:
+            self._count("errors")
+        return result
+
+    def _failure(self, message):
+        self._count("errors")
+        return {"stdout": "", "outputs": [], "figures": [], "error": message, "seconds": 0.0}
+
+    def close(self):
+        with self._lock:
+            self._started = False
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        self.shared_tables.clear()
+
+
+@shared_resource
+def get_code_executor():
+    executor = CodeExecutor()
+    atexit.register(executor.close)
+    return executor
+
+
+def start_code_executor():
+    return get_code_executor().start()
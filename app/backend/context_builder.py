@@ -0,0 +1,174 @@
+# backend/context_builder.py
+import re
+from collections import Counter
+
+from backend.chunker import count_tokens, truncate_to_tokens
+from backend.table_loader import table_preview
+from backend.table_profile import get_profile, format_profile
+
+# Tokens available to document text and DataFrame previews in one prompt
+CONTEXT_TOKEN_BUDGET = 6000
+# Largest share of the budget the DataFrame previews may take; the rest goes to text
+DATAFRAME_BUDGET_SHARE = 0.4
+# A short line found in this many chunks is treated as a page header/footer
+BOILERPLATE_MIN_REPEATS = 3
+BOILERPLATE_MAX_CHARS = 100
+# Chunks whose word shingles overlap this much with a kept chunk are dropped
+NEAR_DUPLICATE_JACCARD = 0.85
+# Smallest remainder worth filling with a truncated chunk
+MIN_TRUNCATED_TOKENS = 40
+
+PREVIEW_ROWS = 3
+PREVIEW_MAX_COLUMNS = 12
+PREVIEW_MAX_CELL_CHARS = 40
+# Columns described with statistics; the rest are listed by name under their dtype
+PROFILE_DETAIL_COLUMNS = 60
+
+
+def _shingles(text, size=5):
+    words = re.findall(r"\w+", text.lower())
+    return {" ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+
+
+def strip_boilerplate(texts, min_repeats=BOILERPLATE_MIN_REPEATS):
+    """
+    Removing page headers and footers: short lines that repeat across many
+    chunks, only where they open or close a chunk. The first chunk keeps
+    its copy, so a repeated line that answers the question is never lost.
+    """
+    line_counts = Counter()
+    for text in texts:
+        line_counts.update({line.strip() for line in text.splitlines() if line.strip()})
+    repeated = {
+        line for line, count in line_counts.items()
+        if count >= min_repeats and len(line) <= BOILERPLATE_MAX_CHARS
+    }
+    if not repeated:
+        return list(texts)
+
+    seen = set()
+    stripped = []
+    for text in texts:
+        lines = text.splitlines()
+        start, end = 0, len(lines)
+        while start < end and (not lines[start].strip() or lines[start].strip() in seen):
+            start += 1
+        while end > start and (not lines[end - 1].strip() or lines[end - 1].strip() in seen):
+            end -= 1
+        seen.update(line.strip() for line in lines if line.strip() in repeated)
+        stripped.append("\n".join(lines[start:end]))
+    return stripped
+
+
+def select_chunks(chunks, budget):
+    """
+    Filling `budget` tokens with (text, source, ...) chunks given in relevance
+    order, skipping near-duplicates and truncating the last chunk that only
+    partly fits. Returns (selected_texts, stats).
+    """
+    texts = strip_boilerplate([chunk[0] for chunk in chunks])
+
+    selected = []
+    kept_shingles = []
+    used = 0
+    stats = {"chunks_used": 0, "chunks_dropped": 0, "duplicates": 0, "truncated": 0}
+    for text in texts:
+        text = text.strip()
+        if not text:
+            stats["chunks_dropped"] += 1
+            continue
+
+        shingles = _shingles(text)
+        if any(len(shingles & kept) / len(shingles | kept) >= NEAR_DUPLICATE_JACCARD for kept in kept_shingles):
+            stats["duplicates"] += 1
+            continue
+
+        tokens = count_tokens(text)
+        remaining = budget - used
+        if tokens > remaining:
+            if remaining >= MIN_TRUNCATED_TOKENS:
+                text = truncate_to_tokens(text, remaining)
+                tokens = count_tokens(text)
+                stats["truncated"] += 1
+            else:
+                stats["chunks_dropped"] += 1
+                continue
+
+        selected.append(text)
+        kept_shingles.append(shingles)
+        used += tokens
+        stats["chunks_used"] += 1
+    stats["text_tokens"] = used
+    return selected, stats
+
+
+def _clip_cell(value, max_chars=PREVIEW_MAX_CELL_CHARS):
+    text = str(value)
+    return text if len(text) <= max_chars else text[:max_chars - 1] + "…"
+
+
+def summarize_dataframe(name, df, filename, rows=PREVIEW_ROWS, max_columns=PREVIEW_MAX_COLUMNS,
+                        detail_columns=PROFILE_DETAIL_COLUMNS):
+    """
+    Compact description of a DataFrame (or a table still loading): shape, a
+    profile line per column (dtype, nulls, distinct values, range or top
+    values) and a few clipped rows
+    """
+    profile = get_profile(df)
+    df, row_count, exact = table_preview(df)
+    columns = list(df.columns)
+    shown = columns[:max_columns]
+    lines = [
+        f"Dataset `{name}` from file '{filename}': {'' if exact else 'about '}{row_count} rows x {len(columns)} columns",
+        "Columns (dtype, nulls, distinct values, range or most common values):",
+    ]
+    lines.extend(format_profile(profile, detail_columns))
+    if profile.get("partial"):
+        lines.append(f"(statistics from the first {profile['rows']} rows; the file is still loading)")
+    elif profile.get("sampled"):
+        lines.append("(distinct and most common values estimated from a sample)")
+    if rows > 0:
+        sample = df[shown].head(rows).apply(lambda col: col.map(_clip_cell))
+        lines.append("Sample rows:")
+        lines.append(sample.to_markdown(index=False))
+        if len(shown) < len(columns):
+            lines.append(f"(sample shows the first {len(shown)} of {len(columns)} columns)")
+    return "\n".join(lines)
+
+
+def build_dataframe_section(named_dfs, budget):
+    """Descriptions of every DataFrame, dropping sample rows and then column statistics until they fit budget"""
+    if not named_dfs:
+        return "", 0
+
+    for rows, max_columns, detail_columns in (
+        (PREVIEW_ROWS, PREVIEW_MAX_COLUMNS, PROFILE_DETAIL_COLUMNS), (1, 8, 30), (0, 0, 15), (0, 0, 0)
+    ):
+        previews = [
+            summarize_dataframe(name, df, filename, rows=rows, max_columns=max_columns, detail_columns=detail_columns)
+            for name, (df, filename) in named_dfs.items()
+        ]
+        text = "\n\n".join(previews)
+        tokens = count_tokens(text)
+        if tokens <= budget:
+            return text, tokens
+
+    text = truncate_to_tokens(text, budget)
+    return text, count_tokens(text)
+
+
+def build_context(text_chunks, named_dfs=None, budget=CONTEXT_TOKEN_BUDGET):
+    """
+    Assembling the document and DataFrame context for one prompt within
+    `budget` tokens.
+
+    Returns (text_context, dataframe_context, report) where report counts
+    the tokens used by each section and how many chunks were kept.
+    """
+    df_budget = int(budget * DATAFRAME_BUDGET_SHARE) if named_dfs else 0
+    df_context, df_tokens = build_dataframe_section(named_dfs, df_budget)
+
+    # Text gets everything the DataFrame previews did not use
+    selected, stats = select_chunks(list(text_chunks), budget - df_tokens)
+    report = dict(stats, dataframe_tokens=df_tokens, budget=budget)
+    return "\n\n".join(selected), df_context, report
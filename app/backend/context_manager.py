@@ -1,8 +1,17 @@
 import json
 import os
 import datetime
+from backend.embedding_store import EmbeddingStore
+from backend import chat_store
+from backend.tracing import span
 
 DATA_DIR = "app/local"
+# Number of chunks embedded together while ingesting a document page by page
+INGEST_BATCH_CHUNKS = 256
+# Batches indexed between saves of the chat index; every save rewrites the whole store
+INGEST_SAVE_BATCHES = 8
+# Chunks retrieved per question; more than the prompt budget holds, so build_context picks the best that fit
+RETRIEVAL_TOP_K = 20
 DEFAULT_CHAT = {
     "title": "New Chat",
     "messages": [],
@@ -16,20 +25,8 @@ def save_user_data(email, name, chat_history):
     if not email:
         return
     
-    os.makedirs(DATA_DIR, exist_ok=True)
-    filepath = os.path.join(DATA_DIR, f"{email}.json")
-    
-    data = {
-        "version": "1.2",
-        "name": name,
-        "email": email,
-        "chat_history": chat_history,
-        "last_updated": str(datetime.datetime.now())
-    }
-    
     try:
-        with open(filepath, "w") as f:
-            json.dump(data, f, indent=2)
+        chat_store.save_chats(DATA_DIR, email, name, chat_history)
     except Exception as e:
         print(f"Error saving user data: {str(e)}")
 
@@ -37,17 +34,42 @@ def load_user_data(email):
     if not email:
         return {}
     
-    filepath = os.path.join(DATA_DIR, f"{email}.json")
-    if not os.path.exists(filepath):
-        return {}
-    
     try:
-        with open(filepath, "r") as f:
-            return json.load(f)
+        if not chat_store.has_store(DATA_DIR, email):
+            import_legacy_user_file(email)
+        return chat_store.load_user(DATA_DIR, email)
     except Exception as e:
         print(f"Error loading user data: {str(e)}")
         return {}
 
+def ensure_chat_loaded(email, chat_id, chat_history):
+    """Filling in a lazily loaded chat's messages and context the first time it is opened"""
+    chat = chat_history.get(chat_id)
+    if not email or not chat or chat.get("loaded") is not False:
+        return chat_history
+    
+    try:
+        chat_history[chat_id] = chat_store.load_chat(DATA_DIR, email, chat_id)
+    except Exception as e:
+        print(f"Error loading chat: {str(e)}")
+        chat_history[chat_id] = {
+            "title": chat.get("title", "New Chat"),
+            "messages": [],
+            "context": {"text_chunks": [], "sources": []}
+        }
+    return chat_history
+
+def import_legacy_user_file(email):
+    """Converting a single <email>.json file from older versions into the split store, migrating it once"""
+    filepath = os.path.join(DATA_DIR, f"{email}.json")
+    if not os.path.exists(filepath):
+        return
+    
+    with open(filepath, "r") as f:
+        data = json.load(f)
+    chat_history = migrate_chat_history(data.get("chat_history", {}))
+    chat_store.save_chats(DATA_DIR, email, data.get("name"), chat_history)
+
 def migrate_chat_history(chat_history):
     migrated = {}
     for cid, chat in chat_history.items():
@@ -79,7 +101,60 @@ def migrate_chat_history(chat_history):
                 }
     return migrated
 
-def update_chat_context(chat_id, text_chunks, sources, chat_history):
+def index_path(email, chat_id):
+    return os.path.join(DATA_DIR, "embeddings", email or "_anonymous", chat_id)
+
+def sync_chat_index(index, text_chunks, embeddings=None):
+    """
+    Indexing the chat chunks appended since the index was last saved,
+    returning how many were consumed. `embeddings` is an optional
+    EmbeddingStore of vectors known ahead of time, such as cached uploads.
+    """
+    if index.synced_chunks > len(text_chunks):
+        index.synced_chunks = 0
+    pending = text_chunks[index.synced_chunks:]
+    if not pending:
+        return 0
+
+    # Reusing vectors persisted by an older store so nothing is embedded twice
+    cache = EmbeddingStore.load(index.path, mmap=True) if len(index) == 0 and index.path else None
+    if embeddings is not None and len(embeddings):
+        cache = embeddings if cache is None or not len(cache) else EmbeddingStore.merged([cache, embeddings])
+    index.add(pending, cache=cache)
+    index.synced_chunks = len(text_chunks)
+    return len(pending)
+
+def get_chat_index(email, chat_id, chat_history):
+    """Returning the chat's index from the in-memory LRU, or loading the persisted one"""
+    from backend.semantic_search import ChatIndex, index_cache
+
+    key = (email, chat_id)
+    index = index_cache.get(key)
+    if index is None:
+        index = ChatIndex.load(index_path(email, chat_id))
+
+    chat = chat_history.get(chat_id, DEFAULT_CHAT)
+    text_chunks = chat.get("context", {}).get("text_chunks", [])
+    try:
+        if sync_chat_index(index, text_chunks):
+            index.save()
+    except Exception as e:
+        print(f"Error indexing chat context: {str(e)}")
+
+    index_cache.put(key, index)
+    return index
+
+def delete_chat_index(email, chat_id):
+    from backend.semantic_search import index_cache
+
+    index_cache.pop((email, chat_id))
+    path = index_path(email, chat_id)
+    for suffix in (".npy", ".codes.npy", ".scales.npy", ".ids.json", ".chunks.json"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+def update_chat_context(chat_id, text_chunks, sources, chat_history, email=None, index=None, embeddings=None,
+                        save=True):
     if chat_id not in chat_history:
         return chat_history
     
@@ -87,12 +162,70 @@ def update_chat_context(chat_id, text_chunks, sources, chat_history):
     chat["context"] = chat.get("context", DEFAULT_CHAT["context"].copy())
     chat["context"]["text_chunks"].extend(text_chunks)
     chat["context"]["sources"].extend(sources)
+
+    # Embedding the new chunks once at ingest so retrieval can reuse them
+    with span("index") as s:
+        s.count("chunks", len(text_chunks))
+        if index is None:
+            get_chat_index(email, chat_id, chat_history)
+        else:
+            try:
+                if sync_chat_index(index, chat["context"]["text_chunks"], embeddings=embeddings) and save:
+                    index.save(index.path or index_path(email, chat_id))
+            except Exception as e:
+                print(f"Error indexing chat context: {str(e)}")
     return chat_history
 
-def get_contextual_results(chat_id, query, chat_history, top_k=5):
-    from backend.semantic_search import model
-    import numpy as np
-    
+class IncrementalIndexer:
+    """
+    Indexing chunks into a chat as they arrive (e.g. each PDF page's chunks
+    while the rest of the file is still being parsed), in batches of
+    batch_size. Questions can be answered against the batches indexed so
+    far, and only one batch of un-embedded chunks is pending at a time.
+    The index is saved every save_every batches rather than after each one,
+    since a save rewrites the whole store; close() indexes whatever is left
+    and saves.
+    """
+
+    def __init__(self, chat_id, chat_history, email=None, index=None, batch_size=INGEST_BATCH_CHUNKS,
+                 save_every=INGEST_SAVE_BATCHES):
+        self.chat_id = chat_id
+        self.chat_history = chat_history
+        self.email = email
+        self.index = index
+        self.batch_size = batch_size
+        self.save_every = save_every
+        self.pending = []
+        self.indexed = 0
+        self.unsaved_batches = 0
+
+    def add(self, chunks):
+        self.pending.extend(chunks)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self, save=False):
+        if self.pending:
+            self.unsaved_batches += 1
+            save = save or self.unsaved_batches >= self.save_every
+            update_chat_context(
+                self.chat_id, self.pending, [], self.chat_history, email=self.email, index=self.index, save=save
+            )
+            self.indexed += len(self.pending)
+            self.pending = []
+        elif save and self.unsaved_batches and self.index is not None:
+            # Nothing pending, but earlier batches were only indexed in memory
+            try:
+                self.index.save(self.index.path or index_path(self.email, self.chat_id))
+            except Exception as e:
+                print(f"Error saving chat index: {str(e)}")
+        if save:
+            self.unsaved_batches = 0
+
+    def close(self):
+        self.flush(save=True)
+
+def get_contextual_results(chat_id, query, chat_history, top_k=RETRIEVAL_TOP_K, email=None, index=None, query_embedding=None):
     chat = chat_history.get(chat_id, DEFAULT_CHAT.copy())
     context = chat.get("context", DEFAULT_CHAT["context"].copy())
     text_chunks = context.get("text_chunks", [])
@@ -101,11 +234,15 @@ def get_contextual_results(chat_id, query, chat_history, top_k=5):
         return []
     
     try:
-        embeddings = model.encode([chunk[0] for chunk in text_chunks])
-        query_embedding = model.encode([query])
-        scores = np.dot(embeddings, query_embedding[0])
-        top_indices = scores.argsort()[-top_k:][::-1]
-        return [text_chunks[i] for i in top_indices]
+        if index is None:
+            index = get_chat_index(email, chat_id, chat_history)
+        with span("retrieve", top_k=top_k) as s:
+            # Fusing vector and BM25 rankings so exact part numbers and codes are not missed;
+            # an embedding the caller already computed for this question is reused
+            results = index.hybrid_search(query, top_k=top_k, query_embedding=query_embedding)
+            s.count("indexed_chunks", len(index))
+            s.count("chunks", len(results))
+        return [chunk for chunk, _ in results]
     except Exception as e:
         print(f"Error in semantic search: {str(e)}")
-        return []
\ No newline at end of file
+        return []
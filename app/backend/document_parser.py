@@ -1,37 +1,94 @@
 import fitz  # PyMuPDF
 import io
 from PIL import Image
-from backend.ocr_engine import ocr_image_bytes  
+from backend.ocr_engine import ocr_images_bytes, image_hash, MIN_IMAGE_SIZE
+from backend.table_loader import read_csv, downcast
+from backend.tracing import span
 from pptx import Presentation
 from io import BytesIO
 import os
+import threading
+
+# Number of pages whose images are OCR'd together before their text is yielded
+PAGE_WINDOW = 8
+
+# PyMuPDF is not thread-safe, so concurrent ingestion threads take turns on document access
+_fitz_lock = threading.Lock()
+
+
+def _extract_page(doc, page_num, min_image_size, seen_xrefs, seen_hashes, image_bytes):
+    """Text of one page plus (img_index, position) placeholders for its new images appended to image_bytes"""
+    page = doc[page_num]
+    # Extracting visible text from the current page
+    parts = []
+    page_text = page.get_text()
+    if page_text:
+        parts.append(f"Page {page_num+1} Text:\n{page_text}")
+
+    # Getting all images from the current page
+    img_list = page.get_images(full=True)
+
+    for img_index, img in enumerate(img_list):
+        xref, width, height = img[0], img[2], img[3]
+
+        # Skipping images reused across pages (logos, headers) and tiny decorative ones
+        if xref in seen_xrefs:
+            continue
+        seen_xrefs.add(xref)
+        if width < min_image_size or height < min_image_size:
+            continue
+
+        base_image = doc.extract_image(xref)
+        key = image_hash(base_image["image"])
+        if key in seen_hashes:
+            continue
+        seen_hashes.add(key)
+
+        # Leaving a placeholder so OCR text lands next to its page once the window is done
+        parts.append((img_index, len(image_bytes)))
+        image_bytes.append(base_image["image"])
+    return parts
+
+# Yielding (page_num, page_count, text) for each PDF page as soon as its window is extracted
+def iter_pdf_pages(file, min_image_size=MIN_IMAGE_SIZE, window=PAGE_WINDOW):
+    with _fitz_lock:
+        doc = fitz.open(stream=file.read(), filetype="pdf")
+        page_count = len(doc)
+    seen_xrefs = set()
+    seen_hashes = set()
+    pending_pages = []
+    image_bytes = []
+
+    try:
+        for page_num in range(page_count):
+            # Holding the PyMuPDF lock only while touching the document, not during OCR
+            with span("parse", page=page_num + 1), _fitz_lock:
+                parts = _extract_page(doc, page_num, min_image_size, seen_xrefs, seen_hashes, image_bytes)
+
+            pending_pages.append((page_num, parts))
+            if len(pending_pages) >= window or page_num == page_count - 1:
+                # Running OCR for the whole window at once so it is cached and parallelised
+                ocr_results = ocr_images_bytes(image_bytes)
+                for done_page, done_parts in pending_pages:
+                    text = "\n".join(
+                        f"\nPage {done_page+1} Image {part[0]+1} OCR:\n{ocr_results[part[1]]}"
+                        if isinstance(part, tuple) else part
+                        for part in done_parts
+                    )
+                    yield done_page, page_count, text
+                pending_pages = []
+                image_bytes = []
+    finally:
+        # Freeing the parsed document even when the caller stops reading pages early
+        with _fitz_lock:
+            doc.close()
 
 # Parsing a PDF file by extracting text and running OCR on images
-def parse_pdf(file):
+def parse_pdf(file, min_image_size=MIN_IMAGE_SIZE):
     try:
-        doc = fitz.open(stream=file.read(), filetype="pdf")
-        full_text = []
-        
-        for page_num, page in enumerate(doc):
-            # Extracting visible text from the current page
-            page_text = page.get_text()
-            if page_text:
-                full_text.append(f"Page {page_num+1} Text:\n{page_text}")
-            
-            # Getting all images from the current page
-            img_list = page.get_images(full=True)
-            
-            for img_index, img in enumerate(img_list):
-                xref = img[0]
-                base_image = doc.extract_image(xref)
-                
-                # Running OCR on each extracted image using a centralized function
-                ocr_result = ocr_image_bytes(base_image["image"])
-                
-                full_text.append(
-                    f"\nPage {page_num+1} Image {img_index+1} OCR:\n{ocr_result}"
-                )
-        
+        full_text = [
+            text for _, _, text in iter_pdf_pages(file, min_image_size=min_image_size) if text
+        ]
         return "\n".join(full_text)
     except Exception as e:
         return f"PDF Error: {str(e)}"
@@ -60,16 +117,14 @@ import pandas as pd
 # Reading a CSV into a DataFrame for structured analysis
 def parse_csv(file):
     try:
-        df = pd.read_csv(file)
-        return df
+        return read_csv(file)
     except Exception as e:
         return f"CSV Error: {str(e)}"
 
 # Reading an Excel file into a DataFrame
 def parse_xlsx(file):
     try:
-        df = pd.read_excel(file)
-        return df
+        return downcast(pd.read_excel(file))
     except Exception as e:
         return f"XLSX Error: {str(e)}"
 
@@ -0,0 +1,207 @@
+# backend/embedding_service.py
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+
+from backend.embedding_store import chunk_hash
+from backend.tracing import span
+
+# Most texts encoded in one model call
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "64"))
+# Longest the first request of a batch waits for others to join it
+EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS", "5"))
+# Embeddings of recently encoded texts kept by content hash (384 floats = 1.5KB each)
+EMBED_CACHE_ENTRIES = int(os.getenv("EMBED_CACHE_ENTRIES", "20000"))
+
+
+class _Request:
+    __slots__ = ("texts", "keys", "taken", "vectors", "future", "enqueued")
+
+    def __init__(self, texts, keys):
+        self.texts = texts
+        self.keys = keys
+        self.taken = 0
+        self.vectors = [None] * len(texts)
+        self.future = Future()
+        self.enqueued = time.monotonic()
+
+    @property
+    def remaining(self):
+        return len(self.texts) - self.taken
+
+
+class EmbeddingService:
+    """
+    Encoding texts for every session through one worker thread.
+
+    Requests are queued and gathered into batches of up to max_batch texts;
+    the first request of a batch waits at most max_wait_ms for others to
+    join. Smaller requests (questions) are served before the remainder of
+    large ones (file ingestion), which are encoded a batch at a time.
+    Embeddings of recently seen texts are reused by content hash.
+    Vectors are returned as the model gives them, not normalized.
+    """
+
+    def __init__(self, model_loader, max_batch=EMBED_MAX_BATCH, max_wait_ms=EMBED_MAX_WAIT_MS,
+                 cache_entries=EMBED_CACHE_ENTRIES):
+        self.model_loader = model_loader
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.cache_entries = cache_entries
+        self._cache = OrderedDict()  # chunk hash -> vector
+        self._cache_lock = threading.Lock()
+        self._pending = []
+        self._queued_texts = 0
+        self._condition = threading.Condition()
+        self._worker = None
+        self.stats = {
+            "requests": 0, "texts": 0, "cache_hits": 0, "batches": 0, "encoded": 0,
+            "largest_batch": 0, "queue_depth": 0, "peak_queue_depth": 0, "encode_seconds": 0.0,
+        }
+
+    def _cached(self, keys):
+        with self._cache_lock:
+            vectors = [self._cache.get(key) for key in keys]
+            for key, vector in zip(keys, vectors):
+                if vector is not None:
+                    self._cache.move_to_end(key)
+        return vectors
+
+    def _remember(self, keys, vectors):
+        if self.cache_entries <= 0:
+            return
+        with self._cache_lock:
+            for key, vector in zip(keys, vectors):
+                self._cache[key] = vector
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+
+    def encode(self, texts):
+        """Returning a (len(texts), dim) float32 array of embeddings, blocking until they are ready"""
+        texts = list(texts)
+        keys = [chunk_hash(text) for text in texts]
+        vectors = self._cached(keys)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+
+        with self._condition:
+            self.stats["requests"] += 1
+            self.stats["texts"] += len(texts)
+            self.stats["cache_hits"] += len(texts) - len(missing)
+
+        if missing:
+            # The span covers the wait in the queue as well as this request's share of the model calls
+            with span("embed") as s:
+                s.count("texts", len(missing))
+                s.count("queued_texts", self._queued_texts)
+                request = _Request([texts[i] for i in missing], [keys[i] for i in missing])
+                self._submit(request)
+                for i, vector in zip(missing, request.future.result()):
+                    vectors[i] = vector
+        if not vectors:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack(vectors)
+
+    def _submit(self, request):
+        with self._condition:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="embedding-service", daemon=True)
+                self._worker.start()
+            self._pending.append(request)
+            self._queued_texts += len(request.texts)
+            self.stats["queue_depth"] = self._queued_texts
+            self.stats["peak_queue_depth"] = max(self.stats["peak_queue_depth"], self._queued_texts)
+            self._condition.notify()
+
+    def _next_batch(self):
+        with self._condition:
+            while not self._pending:
+                self._condition.wait()
+            # Holding the batch open until it is full, the oldest request has waited max_wait,
+            # or requests stop arriving for a fifth of that
+            deadline = min(request.enqueued for request in self._pending) + self.max_wait
+            while self._queued_texts < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                queued = self._queued_texts
+                self._condition.wait(min(timeout, self.max_wait / 5))
+                if self._queued_texts == queued:
+                    break
+
+            self._pending.sort(key=lambda request: request.remaining)
+            batch = []  # (request, first, last) slices
+            room = self.max_batch
+            for request in self._pending:
+                if room == 0:
+                    break
+                take = min(room, request.remaining)
+                batch.append((request, request.taken, request.taken + take))
+                request.taken += take
+                room -= take
+            self._pending = [request for request in self._pending if request.remaining]
+            self._queued_texts -= self.max_batch - room
+            self.stats["queue_depth"] = self._queued_texts
+            return batch
+
+    def _run(self):
+        model = None
+        while True:
+            batch = self._next_batch()
+            # The same text asked for by several sessions is encoded once
+            unique = {}
+            for request, first, last in batch:
+                for text in request.texts[first:last]:
+                    unique.setdefault(text, len(unique))
+            texts = list(unique)
+
+            start = time.perf_counter()
+            try:
+                if model is None:
+                    model = self.model_loader()
+                encoded = np.asarray(
+                    model.encode(texts, convert_to_numpy=True, batch_size=len(texts)), dtype=np.float32
+                )
+            except Exception as e:
+                failed = {id(request) for request, _, _ in batch}
+                with self._condition:
+                    # Dropping what is left of the failed requests
+                    for request in self._pending:
+                        if id(request) in failed:
+                            self._queued_texts -= request.remaining
+                            request.taken = len(request.texts)
+                    self._pending = [request for request in self._pending if request.remaining]
+                    self.stats["queue_depth"] = self._queued_texts
+                for request, _, _ in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                continue
+            seconds = time.perf_counter() - start
+
+            with self._condition:
+                self.stats["batches"] += 1
+                self.stats["encoded"] += len(texts)
+                self.stats["largest_batch"] = max(self.stats["largest_batch"], len(texts))
+                self.stats["encode_seconds"] += seconds
+
+            for request, first, last in batch:
+                if request.future.done():
+                    continue
+                for i in range(first, last):
+                    request.vectors[i] = encoded[unique[request.texts[i]]]
+                self._remember(request.keys[first:last], request.vectors[first:last])
+                # Slices of a request are encoded in order, so its last slice completes it
+                if last == len(request.texts):
+                    request.future.set_result(request.vectors)
+
+    def metrics(self):
+        """A copy of stats with the mean batch size and cache hit rate"""
+        with self._condition:
+            stats = dict(self.stats)
+        stats["mean_batch"] = stats["encoded"] / stats["batches"] if stats["batches"] else 0.0
+        stats["cache_hit_rate"] = stats["cache_hits"] / stats["texts"] if stats["texts"] else 0.0
+        return stats
@@ -0,0 +1,210 @@
+# backend/embedding_store.py
+import hashlib
+import json
+import os
+
+import numpy as np
+
+# Precisions a store can keep its searchable vectors in; the float32 vectors stay available for rescoring
+DTYPES = ("float32", "float16", "int8")
+# Rows of quantized codes widened to float32 at a time while scoring, small enough to stay in CPU cache
+SCORE_BLOCK_ROWS = 1024
+
+
+def chunk_hash(text):
+    """Content hash used to key a chunk's embedding"""
+    return hashlib.sha1(text.encode("utf-8", errors="ignore")).hexdigest()
+
+
+def quantize(vectors, dtype):
+    """
+    Compact codes of float32 row vectors: (float16 codes, None), or for
+    int8 symmetric per-row scalar quantization, (codes, scales) with
+    row ~= codes * scale. Works through memory-mapped input in blocks.
+    """
+    dim = vectors.shape[1] if np.ndim(vectors) == 2 else 0
+    codes = np.empty((len(vectors), dim), dtype=np.float16 if dtype == "float16" else np.int8)
+    scales = None if dtype == "float16" else np.empty(len(vectors), dtype=np.float32)
+    for start in range(0, len(vectors), SCORE_BLOCK_ROWS):
+        block = np.asarray(vectors[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+        if scales is None:
+            codes[start:start + len(block)] = block
+            continue
+        block_scales = np.abs(block).max(axis=1) / 127
+        block_scales[block_scales == 0] = 1.0
+        codes[start:start + len(block)] = np.rint(block / block_scales[:, None])
+        scales[start:start + len(block)] = block_scales
+    return codes, scales
+
+
+def _resident_bytes(array):
+    # Memory-mapped arrays live in the page cache, not in the process
+    return 0 if array is None or isinstance(array, np.memmap) else int(array.nbytes)
+
+
+class EmbeddingStore:
+    """
+    Content-hash keyed embeddings held in one contiguous float32 matrix.
+
+    Vectors are persisted as `<path>.npy` and the parallel list of chunk
+    hashes as `<path>.ids.json`, so embeddings never end up inside the
+    user's chat JSON.
+
+    With dtype="float16" or "int8" the store also keeps quantized codes
+    (`<path>.codes.npy`, plus `<path>.scales.npy` for int8) that scores()
+    searches, and once saved or loaded the float32 vectors are only
+    memory-mapped, for rescoring a shortlist exactly.
+    """
+
+    def __init__(self, dim=None, dtype="float32"):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown embedding dtype: {dtype}")
+        self.dim = dim
+        self.dtype = dtype
+        self.ids = []
+        self.vectors = np.empty((0, dim or 0), dtype=np.float32)
+        self.codes = None
+        self.scales = None
+        self._positions = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, key):
+        return key in self._positions
+
+    @property
+    def quantized(self):
+        return self.dtype != "float32"
+
+    @property
+    def nbytes(self):
+        """Bytes held in memory, leaving out memory-mapped arrays"""
+        return _resident_bytes(self.vectors) + _resident_bytes(self.codes) + _resident_bytes(self.scales)
+
+    def add(self, keys, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or len(keys) != len(vectors):
+            raise ValueError("keys and vectors must have matching lengths")
+        if len(keys) == 0:
+            return 0
+
+        # Keeping only keys we have not stored yet
+        fresh = []
+        for row, key in enumerate(keys):
+            if key not in self._positions:
+                self._positions[key] = len(self.ids)
+                self.ids.append(key)
+                fresh.append(row)
+        if not fresh:
+            return 0
+
+        first = self.dim is None or len(self.vectors) == 0
+        if first:
+            self.dim = vectors.shape[1]
+            self.vectors = np.ascontiguousarray(vectors[fresh])
+        else:
+            self.vectors = np.concatenate([self.vectors, vectors[fresh]])
+        if self.quantized:
+            codes, scales = quantize(vectors[fresh], self.dtype)
+            self.codes = codes if first else np.concatenate([self.codes, codes])
+            if scales is not None:
+                self.scales = scales if first else np.concatenate([self.scales, scales])
+        return len(fresh)
+
+    @classmethod
+    def merged(cls, stores):
+        """A new store holding every vector of `stores`, first occurrence winning"""
+        merged = cls()
+        for store in stores:
+            if len(store):
+                merged.add(store.ids, store.vectors)
+        return merged
+
+    def positions(self, keys):
+        """Row position of each key, or -1 where the key is unknown"""
+        return np.fromiter(
+            (self._positions.get(key, -1) for key in keys), dtype=np.int64, count=len(keys)
+        )
+
+    def lookup(self, keys):
+        positions = self.positions(keys)
+        if (positions < 0).any():
+            raise KeyError("Some keys have no stored embedding")
+        return self.vectors[positions]
+
+    def scores(self, query_vectors):
+        """
+        (queries, rows) similarity of each query to every stored vector,
+        computed from the quantized codes when the store has them
+        """
+        query_vectors = np.asarray(query_vectors, dtype=np.float32)
+        if not self.quantized:
+            return query_vectors @ self.vectors.T
+        scores = np.empty((len(query_vectors), len(self.ids)), dtype=np.float32)
+        for start in range(0, len(self.ids), SCORE_BLOCK_ROWS):
+            block = np.asarray(self.codes[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+            block_scores = query_vectors @ block.T
+            if self.scales is not None:
+                block_scores *= self.scales[start:start + SCORE_BLOCK_ROWS]
+            scores[:, start:start + SCORE_BLOCK_ROWS] = block_scores
+        return scores
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # Writing to temporary files first so a crash never leaves a half-written store
+        arrays = {"npy": np.asarray(self.vectors, dtype=np.float32)}
+        if self.quantized:
+            if self.codes is None:
+                self.codes, self.scales = quantize(arrays["npy"], self.dtype)
+            arrays["codes.npy"] = self.codes
+            if self.scales is not None:
+                arrays["scales.npy"] = self.scales
+        for suffix, array in arrays.items():
+            with open(f"{path}.{suffix}.tmp", "wb") as f:
+                np.save(f, array, allow_pickle=False)
+        with open(f"{path}.ids.json.tmp", "w") as f:
+            json.dump({"dim": self.dim, "dtype": self.dtype, "ids": self.ids}, f)
+        for suffix in arrays:
+            os.replace(f"{path}.{suffix}.tmp", f"{path}.{suffix}")
+        os.replace(f"{path}.ids.json.tmp", f"{path}.ids.json")
+        if self.quantized and len(self.ids):
+            # Leaving the float32 vectors on disk now that they are only needed for rescoring
+            self.vectors = np.load(f"{path}.npy", mmap_mode="r", allow_pickle=False)
+
+    @classmethod
+    def load(cls, path, mmap=False, dtype=None):
+        """
+        Loading a saved store, in the dtype it was saved with unless dtype
+        is given (codes are then computed from the float32 vectors).
+        Quantized stores always memory-map their float32 vectors.
+        """
+        store = cls(dtype=dtype or "float32")
+        if not os.path.exists(f"{path}.npy") or not os.path.exists(f"{path}.ids.json"):
+            return store
+
+        with open(f"{path}.ids.json", "r") as f:
+            meta = json.load(f)
+        saved_dtype = meta.get("dtype", "float32")
+        store.dtype = dtype or saved_dtype
+        if store.dtype not in DTYPES:
+            return cls()
+        vectors = np.load(f"{path}.npy", mmap_mode="r" if mmap or store.quantized else None, allow_pickle=False)
+        if len(vectors) != len(meta["ids"]):
+            # Treating a mismatched pair of files as an empty store
+            return cls(dtype=store.dtype)
+
+        store.dim = meta.get("dim") or (vectors.shape[1] if vectors.ndim == 2 else None)
+        store.ids = list(meta["ids"])
+        store.vectors = vectors
+        store._positions = {key: i for i, key in enumerate(store.ids)}
+        if store.quantized:
+            files = [f"{path}.codes.npy"] + ([f"{path}.scales.npy"] if store.dtype == "int8" else [])
+            if store.dtype == saved_dtype and all(os.path.exists(name) for name in files):
+                store.codes = np.load(files[0], mmap_mode="r" if mmap else None, allow_pickle=False)
+                if store.dtype == "int8":
+                    store.scales = np.load(files[1], allow_pickle=False)
+            if store.codes is None or len(store.codes) != len(store.ids):
+                # Stores saved in another precision (or by older versions) are quantized once here
+                store.codes, store.scales = quantize(vectors, store.dtype)
+        return store
@@ -0,0 +1,214 @@
+# backend/ingest_cache.py
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+
+import pandas as pd
+
+from backend.chunker import CHUNK_TOKENS, CHUNK_OVERLAP
+from backend.embedding_store import EmbeddingStore, chunk_hash
+from backend.table_profile import get_profile, register_profile
+
+try:
+    import pyarrow  # noqa: F401  (needed by DataFrame.to_parquet)
+except ImportError:  # pyarrow is optional, DataFrames fall back to pickle
+    pyarrow = None
+
+INGEST_CACHE_DIR = "cache/ingest"
+# Total size of cached artifacts before the least recently used entries are evicted
+INGEST_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+# Bumping this invalidates every entry, e.g. when parsing or chunking output changes
+INGEST_CACHE_VERSION = f"3-{CHUNK_TOKENS}-{CHUNK_OVERLAP}"
+
+# Layout of one entry, under <INGEST_CACHE_DIR>/<key[:2]>/<key>/:
+#
+#   result.json            chunks, sources and links of the parsed file, and the profile of each table
+#   dataframe_<i>.parquet  the parsed tables (one per sheet) of CSV/XLSX/JSON uploads (.pkl without pyarrow)
+#   embeddings.npy / .ids.json   EmbeddingStore of the chunk vectors, added after indexing
+
+
+def file_key(file):
+    """Content hash of an upload (plus its extension and the cache version), leaving the file position unchanged"""
+    position = file.tell()
+    file.seek(0)
+    digest = hashlib.sha1()
+    for block in iter(lambda: file.read(1024 * 1024), b""):
+        digest.update(block)
+    file.seek(position)
+    ext = file.name.split('.')[-1].lower()
+    digest.update(f"|{ext}|{INGEST_CACHE_VERSION}".encode())
+    return digest.hexdigest()
+
+
+def _rename_source(source, old_name, new_name):
+    # Chunk sources start with the file name, e.g. "deck.pptx (image)"
+    if isinstance(source, str) and source.startswith(old_name):
+        return new_name + source[len(old_name):]
+    return source
+
+
+def _rename_chunk(chunk, old_name, new_name):
+    text, source = chunk[0], _rename_source(chunk[1], old_name, new_name)
+    if len(chunk) > 2 and isinstance(chunk[2], dict):
+        meta = dict(chunk[2], source=_rename_source(chunk[2].get("source"), old_name, new_name))
+        return (text, source, meta)
+    return (text, source)
+
+
+def _write_dataframe(df, directory, stem, label):
+    table = {"label": label, "profile": get_profile(df)}
+    if pyarrow is not None:
+        try:
+            df.to_parquet(os.path.join(directory, f"{stem}.parquet"))
+            return dict(table, file=f"{stem}.parquet", format="parquet")
+        except Exception:
+            # Mixed-type object columns cannot always be written as Parquet
+            pass
+    df.to_pickle(os.path.join(directory, f"{stem}.pkl"))
+    return dict(table, file=f"{stem}.pkl", format="pickle")
+
+
+class IngestCache:
+    """
+    Content-addressed cache of ingest artifacts: the chunks, links and
+    DataFrames parsed from an uploaded file, and the embeddings of its chunks.
+    Entries are evicted least recently used first once the cache exceeds
+    max_bytes.
+    """
+
+    def __init__(self, root=INGEST_CACHE_DIR, max_bytes=INGEST_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def get(self, key, name):
+        """
+        Returning the cached ingest result for key in the shape produced by
+        backend.ingestion, with chunk sources renamed to `name`, or None.
+        """
+        entry = self._entry_dir(key)
+        try:
+            with open(os.path.join(entry, "result.json"), "r", encoding="utf-8") as f:
+                saved = json.load(f)
+
+            dataframes = []
+            for table in saved.get("dataframes", []):
+                path = os.path.join(entry, table["file"])
+                df = pd.read_parquet(path) if table["format"] == "parquet" else pd.read_pickle(path)
+                if table.get("profile"):
+                    register_profile(df, table["profile"])
+                dataframes.append((df, table["label"]))
+        except (OSError, ValueError, ImportError) as e:
+            if not isinstance(e, FileNotFoundError):
+                print(f"Error reading ingest cache entry: {str(e)}")
+            return None
+
+        embeddings = EmbeddingStore.load(os.path.join(entry, "embeddings"), mmap=True)
+        # Marking the entry as recently used for eviction
+        os.utime(os.path.join(entry, "result.json"))
+
+        old_name = saved["name"]
+        return {
+            "name": name,
+            "chunks": [_rename_chunk(chunk, old_name, name) for chunk in saved["chunks"]],
+            "sources": [_rename_source(source, old_name, name) for source in saved["sources"]],
+            "links": saved["links"],
+            "dataframes": [(df, _rename_source(label, old_name, name)) for df, label in dataframes],
+            "error": None,
+            "cache_key": key,
+            "cached": True,
+            "embeddings": embeddings if len(embeddings) else None
+        }
+
+    def put(self, key, result):
+        """Storing a successful ingest result; results with errors are not cached"""
+        if result.get("error"):
+            return
+        entry = self._entry_dir(key)
+        tmp = f"{entry}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(tmp, exist_ok=True)
+            tables = [
+                _write_dataframe(df, tmp, f"dataframe_{i}", label)
+                for i, (df, label) in enumerate(result.get("dataframes", []))
+            ]
+
+            with open(os.path.join(tmp, "result.json"), "w", encoding="utf-8") as f:
+                json.dump({
+                    "name": result["name"],
+                    "chunks": [list(chunk) for chunk in result["chunks"]],
+                    "sources": result["sources"],
+                    "links": result["links"],
+                    "dataframes": tables,
+                    "created": time.time()
+                }, f)
+
+            # Publishing the finished entry in one step; a concurrent writer of the same file may win
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            if os.path.exists(entry):
+                shutil.rmtree(tmp, ignore_errors=True)
+            else:
+                os.replace(tmp, entry)
+        except Exception as e:
+            shutil.rmtree(tmp, ignore_errors=True)
+            print(f"Error writing ingest cache entry: {str(e)}")
+            return
+        self.evict()
+
+    def put_embeddings(self, key, chunks, store):
+        """Saving the vectors of an entry's chunks, taken from `store` (e.g. a chat index's EmbeddingStore)"""
+        entry = self._entry_dir(key)
+        if not os.path.isdir(entry) or os.path.exists(os.path.join(entry, "embeddings.npy")):
+            return
+        keys = list(dict.fromkeys(chunk_hash(chunk[0]) for chunk in chunks))
+        keys = [k for k in keys if k in store]
+        if not keys:
+            return
+        embeddings = EmbeddingStore()
+        embeddings.add(keys, store.lookup(keys))
+        try:
+            embeddings.save(os.path.join(entry, "embeddings"))
+        except OSError as e:
+            print(f"Error writing ingest cache embeddings: {str(e)}")
+            return
+        self.evict()
+
+    def _entries(self):
+        entries = []
+        if not os.path.isdir(self.root):
+            return entries
+        for prefix in os.listdir(self.root):
+            prefix_dir = os.path.join(self.root, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for key in os.listdir(prefix_dir):
+                entry = os.path.join(prefix_dir, key)
+                if key.endswith(".tmp") or not os.path.isdir(entry):
+                    continue
+                try:
+                    used = os.path.getmtime(os.path.join(entry, "result.json"))
+                    size = sum(e.stat().st_size for e in os.scandir(entry) if e.is_file())
+                except OSError:
+                    continue
+                entries.append((used, size, entry))
+        return entries
+
+    def evict(self):
+        """Removing least recently used entries until the cache fits in max_bytes"""
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, entry in entries:
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(entry, ignore_errors=True)
+                total -= size
+
+
+ingest_cache = IngestCache()
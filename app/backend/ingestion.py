@@ -0,0 +1,230 @@
+# backend/ingestion.py
+import queue
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from backend.chunker import chunk_text
+from backend.document_parser import parse_file, parse_pptx, iter_pdf_pages
+from backend.embedding_store import EmbeddingStore
+from backend.ingest_cache import ingest_cache, file_key
+from backend.ocr_engine import ocr_images_bytes
+from backend.table_loader import load_tables, resolve_table, BackgroundTable
+from backend.table_profile import profile_when_loaded
+from backend.tracing import in_current_span, span
+
+# Files ingested at once; OCR inside them is spread over the shared process pool
+INGEST_MAX_WORKERS = 8
+# How often the calling thread checks for progress while files are being ingested
+PROGRESS_POLL_SECONDS = 0.1
+
+IMAGE_TYPES = ("png", "jpg", "jpeg")
+
+
+def extract_links(text):
+    # Basic regex to find URLs
+    url_pattern = r'https?://[^\s]+'
+    return re.findall(url_pattern, text)
+
+
+def _new_result(name):
+    return {
+        "name": name, "chunks": [], "sources": [], "links": [], "dataframes": [], "error": None,
+        "cache_key": None, "cached": False, "embeddings": None
+    }
+
+
+def _tag_tables(result, key):
+    """Recording the upload's content key on each parsed DataFrame, so caches can tell a corrected re-upload apart"""
+    for i, (table, _) in enumerate(result["dataframes"]):
+        if isinstance(table, pd.DataFrame):
+            table.attrs["fingerprint"] = f"{key}:{i}"
+
+
+def _ingest_file(file, report, key=None):
+    """Parsing, OCR'ing and chunking one upload into a result dict; runs on a worker thread"""
+    name = file.name
+    ext = name.split('.')[-1].lower()
+    result = _new_result(name)
+
+    if ext in IMAGE_TYPES:
+        text = ocr_images_bytes([file.read()])[0]
+        result["links"] = extract_links(text)
+        result["chunks"] = chunk_text(text, name)
+        result["sources"].append(name)
+
+    elif ext == "pdf":
+        for page_num, page_count, text in iter_pdf_pages(file):
+            chunks = chunk_text(text, name, page=page_num + 1)
+            result["links"].extend(extract_links(text))
+            # Still collected: the ingest cache stores them so a re-upload skips parsing and OCR
+            result["chunks"].extend(chunks)
+            # Handing each page's chunks to the caller so it can index them before the file is finished
+            report(page=page_num + 1, page_count=page_count, chunks=chunks)
+        result["sources"].append(name)
+
+    elif ext == "txt":
+        text = parse_file(file, ext)
+        result["links"] = extract_links(text)
+        result["chunks"] = chunk_text(text, name)
+        result["sources"].append(name)
+
+    elif ext in ("csv", "xlsx"):
+        # Every sheet, with large files continuing to load in the background behind a preview
+        try:
+            key = key or file_key(file)
+            with span("parse"):
+                result["dataframes"] = load_tables(file, ext, fingerprint=key)
+        except Exception as e:
+            result["error"] = f"Failed to load {name}: {str(e)}"
+
+    elif ext == "json":
+        df = parse_file(file, ext)
+        if isinstance(df, pd.DataFrame):
+            result["dataframes"] = [(df, name)]
+        else:
+            result["error"] = f"Failed to load {name}: {df}"
+
+    elif ext == "pptx":
+        # Extracting slide images into a private directory so concurrent decks do not overwrite each other
+        with tempfile.TemporaryDirectory(prefix="pptx_images_") as image_dir:
+            with span("parse"):
+                parsed = parse_pptx(file, image_output_dir=image_dir)
+            if not isinstance(parsed, dict):
+                result["error"] = f"Failed to process {name}: {parsed}"
+                return result
+
+            text = parsed["text"]
+            result["links"] = extract_links(text)
+            result["chunks"] = chunk_text(text, name)
+
+            # OCR'ing every extracted image in one batch
+            images = []
+            for image_path in parsed["images"]:
+                with open(image_path, "rb") as f:
+                    images.append(f.read())
+            for image_text in ocr_images_bytes(images):
+                result["chunks"].extend(chunk_text(image_text, f"{name} (image)"))
+        result["sources"].append(name)
+
+    else:
+        result["error"] = f"Unsupported file type: {name}"
+
+    if result["dataframes"]:
+        _tag_tables(result, key or file_key(file))
+    # Profiling every table once at load so prompts can describe it without scanning it again
+    for table, _ in result["dataframes"]:
+        profile_when_loaded(table)
+    return result
+
+
+def _cache_result(key, result):
+    """Writing a result to the ingest cache, once any tables still loading in the background are complete"""
+    pending = [table for table, _ in result["dataframes"] if isinstance(table, BackgroundTable)]
+    if not pending:
+        ingest_cache.put(key, result)
+        return
+
+    remaining = [len(pending)]
+    lock = threading.Lock()
+
+    def on_loaded(table):
+        with lock:
+            remaining[0] -= 1
+            if remaining[0]:
+                return
+        try:
+            loaded = dict(result, dataframes=[(resolve_table(table), label) for table, label in result["dataframes"]])
+        except Exception as e:
+            print(f"Error loading table for the ingest cache: {str(e)}")
+            return
+        ingest_cache.put(key, loaded)
+
+    for table in pending:
+        table.add_done_callback(on_loaded)
+
+
+def ingest_uploads(files, on_progress=None, max_workers=INGEST_MAX_WORKERS, use_cache=True):
+    """
+    Ingesting uploaded files concurrently and returning one result dict per
+    file, in upload order: {"name", "chunks", "sources", "links",
+    "dataframes", "error", "cache_key", "cached", "embeddings"}, where
+    dataframes holds (DataFrame or BackgroundTable, label) pairs.
+
+    Files seen before (by content hash) come straight from the ingest cache,
+    with the embeddings of their chunks when those were stored. Each file
+    runs on its own thread; OCR work goes to the shared process pool.
+    on_progress(event) is called on the caller's thread (so it may update
+    Streamlit elements) with {"index", "name", "status"} events, where status
+    is "running", "page" (with "page", "page_count" and the page's "chunks",
+    for PDFs parsed afresh), "done" (with "cached") or "error" (with
+    "error"). The result of a PDF still holds all of its chunks, including
+    those already sent with its page events.
+    """
+    files = list(files)
+    if not files:
+        return []
+
+    events = queue.Queue()
+    results = [None] * len(files)
+
+    def run(index, file):
+        def report(**fields):
+            events.put(dict(fields, index=index, name=file.name, status="page"))
+
+        events.put({"index": index, "name": file.name, "status": "running"})
+        with span("ingest", file=file.name) as s:
+            try:
+                # Hashing the bytes first so a repeat upload skips parsing, OCR and chunking
+                key = file_key(file) if use_cache else None
+                result = ingest_cache.get(key, file.name) if key else None
+                if result is not None:
+                    _tag_tables(result, key)
+                else:
+                    result = _ingest_file(file, report, key)
+                    result["cache_key"] = key
+                    if key:
+                        _cache_result(key, result)
+            except Exception as e:
+                result = _new_result(file.name)
+                result["error"] = f"Error processing {file.name}: {str(e)}"
+            s.set(cached=result["cached"])
+            s.count("chunks", len(result["chunks"]))
+        results[index] = result
+        if result["error"]:
+            events.put({"index": index, "name": file.name, "status": "error", "error": result["error"]})
+        else:
+            events.put({"index": index, "name": file.name, "status": "done", "cached": result["cached"]})
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(files))) as executor:
+        # Spans of each file nest under the caller's span although they run on pool threads
+        futures = [executor.submit(in_current_span(run), index, file) for index, file in enumerate(files)]
+        # Relaying progress to the caller until every file has finished
+        while True:
+            pending = not all(future.done() for future in futures)
+            try:
+                event = events.get(timeout=PROGRESS_POLL_SECONDS if pending else 0)
+            except queue.Empty:
+                if not pending:
+                    break
+                continue
+            if on_progress is not None:
+                on_progress(event)
+
+    return results
+
+
+def cached_embeddings(results):
+    """One EmbeddingStore with the cached chunk vectors of every result, or None"""
+    stores = [result["embeddings"] for result in results if result.get("embeddings") is not None]
+    return EmbeddingStore.merged(stores) if stores else None
+
+
+def cache_embeddings(results, store):
+    """Saving the vectors of newly ingested files from `store` (a chat index's EmbeddingStore) into the ingest cache"""
+    for result in results:
+        if result.get("cache_key") and result["chunks"] and result.get("embeddings") is None:
+            ingest_cache.put_embeddings(result["cache_key"], result["chunks"], store)
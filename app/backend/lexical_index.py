@@ -0,0 +1,123 @@
+# backend/lexical_index.py
+import math
+import re
+import threading
+from array import array
+from collections import Counter
+
+import numpy as np
+
+# Words, numbers and codes joined by - _ . / (part numbers like BP-2041-X, versions like 2.4.1)
+TOKEN_PATTERN = re.compile(r"[^\W_]+(?:[-_./][^\W_]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how in is it its of on or that the this to was were what "
+    "when where which who why will with".split()
+)
+# Queries of at most this many terms that name an ID or code can be answered lexically alone
+KEYWORD_QUERY_MAX_TERMS = 3
+# Tokens that contain digits but are ordinary words: ordinals (1st, 22nd) and quarters/halves (q3, h1)
+NOT_AN_ID = re.compile(r"\d+(?:st|nd|rd|th)|[qh]\d")
+
+
+def tokenize(text):
+    """
+    Lowercased terms of text without stopwords. Codes are kept whole and
+    also split into their parts, so "BP-2041" matches "bp-2041", "bp" and
+    "2041".
+    """
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        terms.append(token)
+        if not token.isalnum():
+            terms.extend(part for part in re.split(r"[-_./]", token) if part and part not in STOPWORDS)
+    return terms
+
+
+def looks_like_id(token):
+    """Part numbers and codes: letters mixed with digits (mx4471, bp-2041-x) or hyphenated numbers (4471-22)"""
+    if not any(c.isdigit() for c in token) or NOT_AN_ID.fullmatch(token):
+        return False
+    return any(c.isalpha() for c in token) or "-" in token
+
+
+def is_keyword_query(query):
+    """
+    Short queries naming an ID or code, e.g. "BP-2041 torque", where exact
+    matches are what matters. Plain numbers such as years do not count:
+    "revenue in 2023" is a question for dense retrieval.
+    """
+    tokens = [token for token in TOKEN_PATTERN.findall(query.lower()) if token not in STOPWORDS]
+    return 0 < len(tokens) <= KEYWORD_QUERY_MAX_TERMS and any(looks_like_id(token) for token in tokens)
+
+
+class BM25Index:
+    """
+    Inverted index scoring documents with Okapi BM25. Documents are numbered
+    in the order they are added; postings are appended in place, so adding
+    chunks never rescans the ones already indexed.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        # term -> (doc ids, term frequencies), as compact arrays viewed by numpy at query time
+        self.postings = {}
+        self.doc_lengths = array("f")
+        self.total_length = 0.0
+        # The arrays cannot grow while numpy views of them exist, so adding waits for searches
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def add(self, texts):
+        with self._lock:
+            self._add(texts)
+
+    def _add(self, texts):
+        for text in texts:
+            doc_id = len(self.doc_lengths)
+            counts = Counter(tokenize(text))
+            for term, count in counts.items():
+                posting = self.postings.get(term)
+                if posting is None:
+                    posting = self.postings[term] = (array("i"), array("f"))
+                posting[0].append(doc_id)
+                posting[1].append(count)
+            length = sum(counts.values())
+            self.doc_lengths.append(length)
+            self.total_length += length
+
+    def search(self, query, top_k=5):
+        """Returning the top_k (doc id, score) pairs for query, best first; documents sharing no term are left out"""
+        terms = set(tokenize(query))
+        with self._lock:
+            return self._search(terms, top_k)
+
+    def _search(self, terms, top_k):
+        n = len(self.doc_lengths)
+        if not n or not terms:
+            return []
+
+        doc_lengths = np.frombuffer(self.doc_lengths, dtype=np.float32)
+        average_length = self.total_length / n or 1.0
+        norm = self.k1 * (1 - self.b + self.b * doc_lengths / average_length)
+        scores = np.zeros(n, dtype=np.float32)
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            ids = np.frombuffer(posting[0], dtype=np.int32)
+            tfs = np.frombuffer(posting[1], dtype=np.float32)
+            idf = math.log(1 + (n - len(ids) + 0.5) / (len(ids) + 0.5))
+            scores[ids] += idf * tfs * (self.k1 + 1) / (tfs + norm[ids])
+
+        matched = np.flatnonzero(scores)
+        if not len(matched):
+            return []
+        if top_k < len(matched):
+            matched = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(int(i), float(scores[i])) for i in matched]
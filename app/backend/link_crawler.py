@@ -1,39 +1,174 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
-from urllib.parse import urlparse
+from urllib.parse import urlparse, urldefrag
+
+from backend.tracing import in_current_span, span
+
+CRAWL_CACHE_DIR = "cache/links"
+# Extracted text younger than this is served from disk without contacting the server
+CACHE_TTL_SECONDS = 24 * 60 * 60
+# Limits shared by all links found in one upload
+CRAWL_MAX_WORKERS = 8
+CRAWL_TIME_BUDGET = 20
+CRAWL_BYTE_BUDGET = 20 * 1024 * 1024
+# Characters commonly captured after a URL by the link regex
+URL_TRAILING_PUNCTUATION = ".,;:!?)]}>'\""
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Returning the process-wide pooled session used for crawling"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=CRAWL_MAX_WORKERS, pool_maxsize=CRAWL_MAX_WORKERS)
+            _session.mount("http://", adapter)
+            _session.mount("https://", adapter)
+        return _session
+
+
+def normalize_url(url):
+    """Stripping trailing punctuation and fragments so the same page is crawled once"""
+    url = url.strip().rstrip(URL_TRAILING_PUNCTUATION)
+    return urldefrag(url)[0]
+
+
+def html_to_text(html):
+    # Parsing the HTML content of the page
+    soup = BeautifulSoup(html, "html.parser")
+
+    # Removing script and style elements to avoid non-visible or irrelevant content
+    for tag in soup(["script", "style"]):
+        tag.decompose()
+
+    # Extracting visible text and cleaning up extra whitespace
+    text = soup.get_text(separator="\n")
+    return "\n".join(line.strip() for line in text.splitlines() if line.strip())
+
+
+def _cache_path(url):
+    key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    return os.path.join(CRAWL_CACHE_DIR, key[:2], f"{key}.json")
+
+
+def _read_cache(url):
+    try:
+        with open(_cache_path(url), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cache(url, entry):
+    path = _cache_path(url)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(f"{path}.tmp", path)
+    except OSError as e:
+        print(f"Error caching crawled page: {str(e)}")
+
+
+class _ByteBudget:
+    """Thread-safe count of bytes still allowed to be downloaded"""
+
+    def __init__(self, limit):
+        self.remaining = limit
+        self._lock = threading.Lock()
+
+    def take(self, amount):
+        with self._lock:
+            granted = min(amount, self.remaining)
+            self.remaining -= granted
+            return granted
 
-def extract_text_from_url(url: str, timeout: int = 5) -> str:
+
+def extract_text_from_url(url: str, timeout: int = 5, session=None, use_cache: bool = True, budget=None) -> str:
     """
     Extracts visible text content from a given URL using BeautifulSoup.
 
     Parameters:
     - url (str): The URL to fetch and parse.
     - timeout (int): Timeout duration for the request in seconds.
+    - session (requests.Session): Session to send the request on, defaults to the shared pooled one.
+    - use_cache (bool): Whether to serve and store the extracted text in the on-disk cache.
+    - budget (_ByteBudget): Shared download allowance; the body is truncated once it is used up.
 
     Returns:
-    - str: Cleaned text content from the webpage, or an error message if failed.
+    - str: Cleaned text content from the webpage, an error message if failed, or an
+      empty string if the byte budget was already exhausted.
     """
     # Validating the URL format before making any network request
     parsed_url = urlparse(url)
     if not parsed_url.scheme or not parsed_url.netloc:
         return f"[Invalid URL format: {url}]"
 
+    # Serving fresh cache entries directly and revalidating stale ones with their validators
+    cached = _read_cache(url) if use_cache else None
+    headers = {}
+    if cached:
+        if time.time() - cached.get("fetched_at", 0) < CACHE_TTL_SECONDS:
+            return cached["text"]
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    # Skipping the request entirely once the shared download allowance is spent
+    if budget is not None and budget.remaining <= 0:
+        return ""
+
     try:
-        # Sending an HTTP GET request with a timeout
-        response = requests.get(url, timeout=timeout)
-        # Raising an error if the response contains an HTTP error status code
-        response.raise_for_status()
+        # Sending an HTTP GET request with a timeout over the pooled session
+        session = session or get_session()
+        with session.get(url, timeout=timeout, headers=headers, stream=True) as response:
+            if cached and response.status_code == 304:
+                cached["fetched_at"] = time.time()
+                _write_cache(url, cached)
+                return cached["text"]
 
-        # Parsing the HTML content of the page
-        soup = BeautifulSoup(response.text, "html.parser")
+            # Raising an error if the response contains an HTTP error status code
+            response.raise_for_status()
 
-        # Removing script and style elements to avoid non-visible or irrelevant content
-        for tag in soup(["script", "style"]):
-            tag.decompose()
+            # Reading the body in pieces so the upload's byte budget is honoured
+            body = []
+            truncated = False
+            for piece in response.iter_content(chunk_size=64 * 1024):
+                if budget is not None:
+                    granted = budget.take(len(piece))
+                    body.append(piece[:granted])
+                    if granted < len(piece):
+                        truncated = True
+                        break
+                else:
+                    body.append(piece)
+            encoding = response.encoding or "utf-8"
+            html = b"".join(body).decode(encoding, errors="replace")
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
 
-        # Extracting visible text and cleaning up extra whitespace
-        text = soup.get_text(separator="\n")
-        cleaned_text = "\n".join(line.strip() for line in text.splitlines() if line.strip())
+        cleaned_text = html_to_text(html)
+        # Caching only complete pages so a truncated body is fetched again next time
+        if use_cache and cleaned_text and not truncated:
+            _write_cache(url, {
+                "url": url,
+                "text": cleaned_text,
+                "etag": etag,
+                "last_modified": last_modified,
+                "fetched_at": time.time()
+            })
 
         # Returning cleaned text or fallback message if no visible content is found
         return cleaned_text if cleaned_text else f"[No visible content extracted from {url}]"
@@ -44,3 +179,44 @@ def extract_text_from_url(url: str, timeout: int = 5) -> str:
         return f"[Failed to retrieve content from {url}: {e}]"
     except Exception as e:
         return f"[Unexpected error while processing {url}: {e}]"
+
+
+def crawl_urls(urls, timeout=5, max_workers=CRAWL_MAX_WORKERS, time_budget=CRAWL_TIME_BUDGET,
+               byte_budget=CRAWL_BYTE_BUDGET, session=None, use_cache=True):
+    """
+    Fetches many URLs concurrently over one pooled session.
+
+    URLs are normalized and deduplicated, and the whole batch shares a wall
+    clock `time_budget` (seconds) and a download `byte_budget`. URLs that do
+    not finish within the time budget are left out of the result.
+
+    Returns:
+    - dict: url -> extracted text (or error message), in first-seen order.
+    """
+    unique_urls = list(dict.fromkeys(normalize_url(url) for url in urls if url))
+    if not unique_urls:
+        return {}
+
+    budget = _ByteBudget(byte_budget)
+    session = session or get_session()
+
+    def fetch(url):
+        with span("fetch", url=url) as s:
+            text = extract_text_from_url(url, timeout, session, use_cache, budget)
+            s.count("chars", len(text))
+            return text
+
+    with span("crawl") as s:
+        s.count("urls", len(unique_urls))
+        fetch = in_current_span(fetch)
+        executor = ThreadPoolExecutor(max_workers=min(max_workers, len(unique_urls)))
+        try:
+            futures = {executor.submit(fetch, url): url for url in unique_urls}
+            done, _ = wait(futures, timeout=time_budget)
+        finally:
+            # Not waiting for stragglers once the budget is spent
+            executor.shutdown(wait=False, cancel_futures=True)
+        s.count("timed_out", len(futures) - len(done))
+
+    results = {futures[future]: future.result() for future in done}
+    return {url: results[url] for url in unique_urls if url in results}
@@ -0,0 +1,229 @@
+# backend/llm_backends.py
+import base64
+import io
+import os
+import random
+import threading
+import time
+
+import streamlit as st
+from dotenv import load_dotenv
+
+from backend.resources import shared_resource
+
+# Loading environment variables from .env file
+load_dotenv()
+
+# Selecting the backend with LLM_BACKEND=gemini|openai|local (USE_FAKE_LLM=1 still means local)
+DEFAULT_BACKEND = "local" if os.getenv("USE_FAKE_LLM") == "1" else os.getenv("LLM_BACKEND", "gemini")
+GEMINI_MODEL = "gemini-2.5-pro-exp-03-25"
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+
+# Reply used by the local backend when none is given; contains a code block so the execution path is exercised too
+DEFAULT_REPLY = """Here is a quick look at the data you asked about.
+
+```python
+import plotly.express as px
+fig = px.bar(x=["a", "b", "c"], y=[3, 1, 2], title="Example chart")
+```
+
+The chart above shows the example values. This answer was produced by the local test backend."""
+
+
+class TransientLLMError(Exception):
+    """A provider failure worth retrying, such as a rate limit or an overloaded server"""
+
+
+def get_api_key(name):
+    # Retrieving an API key from Streamlit secrets, falling back to the environment
+    try:
+        api_key = st.secrets[name]
+    except Exception:
+        api_key = os.getenv(name)
+
+    # Raising error if API key is missing
+    if not api_key:
+        raise ValueError(f"Missing {name} in .env")
+    return api_key
+
+
+def get_gemini_api_key():
+    return get_api_key("GEMINI_API_KEY")
+
+
+@shared_resource
+def get_genai():
+    # Importing and configuring the Gemini SDK on first use rather than at app startup
+    import google.generativeai as genai
+    genai.configure(api_key=get_gemini_api_key())
+    return genai
+
+
+class LLMBackend:
+    """
+    Interface of a text generation provider. `images` are PIL images sent
+    along with the prompt; stream yields the answer in pieces as they arrive.
+    Subclasses implement generate, stream or both; each defaults to the other.
+    """
+
+    name = "base"
+    label = "LLM"
+
+    def load(self):
+        """Creating the client ahead of the first request, for warm-up"""
+        return self
+
+    def generate(self, prompt, images=None):
+        return "".join(self.stream(prompt, images))
+
+    def stream(self, prompt, images=None):
+        # Providers without streaming answer in one piece
+        yield self.generate(prompt, images)
+
+
+class GeminiBackend(LLMBackend):
+    name = "gemini"
+    label = "Gemini"
+
+    def __init__(self, model_name=GEMINI_MODEL):
+        self.model_name = model_name
+        self._model = None
+
+    @property
+    def model(self):
+        # Creating the GenerativeModel on first request, shared for text and vision
+        if self._model is None:
+            self._model = get_genai().GenerativeModel(self.model_name)
+        return self._model
+
+    def load(self):
+        return self.model
+
+    def generate(self, prompt, images=None):
+        response = self.model.generate_content([prompt] + list(images) if images else prompt)
+        return response.text
+
+    def stream(self, prompt, images=None):
+        response = self.model.generate_content([prompt] + list(images) if images else prompt, stream=True)
+        for chunk in response:
+            # Skipping pieces without text, such as safety or metadata-only chunks
+            try:
+                text = chunk.text
+            except ValueError:
+                continue
+            if text:
+                yield text
+
+
+class OpenAIBackend(LLMBackend):
+    name = "openai"
+    label = "OpenAI"
+
+    def __init__(self, model_name=OPENAI_MODEL):
+        self.model_name = model_name
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from openai import OpenAI
+            self._client = OpenAI(api_key=get_api_key("OPENAI_API_KEY"))
+        return self._client
+
+    def load(self):
+        return self.client
+
+    @staticmethod
+    def _messages(prompt, images):
+        if not images:
+            return [{"role": "user", "content": prompt}]
+        content = [{"type": "text", "text": prompt}]
+        for image in images:
+            buffer = io.BytesIO()
+            image.convert("RGB").save(buffer, format="PNG")
+            data = base64.b64encode(buffer.getvalue()).decode("ascii")
+            content.append({"type": "image_url", "image_url": {"url": f"data:image/png;base64,{data}"}})
+        return [{"role": "user", "content": content}]
+
+    def generate(self, prompt, images=None):
+        response = self.client.chat.completions.create(
+            model=self.model_name, messages=self._messages(prompt, images)
+        )
+        return response.choices[0].message.content or ""
+
+    def stream(self, prompt, images=None):
+        response = self.client.chat.completions.create(
+            model=self.model_name, messages=self._messages(prompt, images), stream=True
+        )
+        for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+class LocalBackend(LLMBackend):
+    """
+    Deterministic offline stand-in. Answers with `reply` (a string, or a
+    function of the prompt) in pieces of chunk_chars characters, one every
+    `interval` seconds after `first_token_delay`. With failure_rate set, that
+    fraction of requests raise TransientLLMError before producing output.
+    """
+
+    name = "local"
+    label = "Local"
+
+    def __init__(self, reply=DEFAULT_REPLY, chunk_chars=16, interval=0.05, first_token_delay=0.3,
+                 failure_rate=0.0, seed=0):
+        self.reply = reply
+        self.chunk_chars = chunk_chars
+        self.interval = interval
+        self.first_token_delay = first_token_delay
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+
+    def _reply_for(self, prompt):
+        return self.reply(prompt) if callable(self.reply) else self.reply
+
+    def _maybe_fail(self):
+        with self._rng_lock:
+            failed = self._rng.random() < self.failure_rate
+        if failed:
+            raise TransientLLMError("simulated rate limit from the local backend")
+
+    def generate(self, prompt, images=None):
+        reply = self._reply_for(prompt)
+        time.sleep(self.first_token_delay)
+        self._maybe_fail()
+        time.sleep(self.interval * max(0, (len(reply) - 1) // self.chunk_chars))
+        return reply
+
+    def stream(self, prompt, images=None):
+        reply = self._reply_for(prompt)
+        time.sleep(self.first_token_delay)
+        self._maybe_fail()
+        for start in range(0, len(reply), self.chunk_chars):
+            if start:
+                time.sleep(self.interval)
+            yield reply[start:start + self.chunk_chars]
+
+
+BACKENDS = {
+    GeminiBackend.name: GeminiBackend,
+    OpenAIBackend.name: OpenAIBackend,
+    LocalBackend.name: LocalBackend,
+}
+
+
+def create_backend(name=DEFAULT_BACKEND, **kwargs):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend '{name}', expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name](**kwargs)
+
+
+@shared_resource
+def get_llm_backend():
+    return create_backend(DEFAULT_BACKEND)
+
+
+def load_llm_backend():
+    return get_llm_backend().load()
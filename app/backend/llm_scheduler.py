@@ -0,0 +1,248 @@
+# backend/llm_scheduler.py
+import os
+import queue
+import random
+import threading
+import time
+
+from backend.llm_backends import TransientLLMError, get_llm_backend
+from backend.resources import shared_resource
+
+# Requests in flight to the provider at once, across all sessions
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+# Retrying transient failures with exponential backoff and jitter
+LLM_MAX_RETRIES = 3
+LLM_RETRY_BASE_DELAY = 1.0
+LLM_RETRY_MAX_DELAY = 20.0
+# Per-user allowance: a burst of USER_BURST requests, refilled at USER_REQUESTS_PER_MINUTE
+USER_REQUESTS_PER_MINUTE = int(os.getenv("LLM_USER_REQUESTS_PER_MINUTE", "10"))
+USER_BURST = 5
+# Longest a request waits for its user's allowance before being refused
+USER_MAX_WAIT_SECONDS = 30.0
+# Longest a stream may hold a slot without producing a piece before it is given up
+LLM_STREAM_IDLE_SECONDS = float(os.getenv("LLM_STREAM_IDLE_SECONDS", "60"))
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+# Exception class names the Gemini and OpenAI SDKs use for transient failures
+RETRYABLE_ERROR_NAMES = {
+    "ResourceExhausted", "ServiceUnavailable", "DeadlineExceeded", "InternalServerError",
+    "TooManyRequests", "RateLimitError", "APITimeoutError", "APIConnectionError",
+}
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a user has to wait longer than the scheduler allows for their next request"""
+
+
+class StreamStalled(Exception):
+    """Raised when a streaming backend holds its slot without producing anything for too long"""
+
+
+class _StreamSlot:
+    """A concurrency slot held by a stream's reader, given back exactly once: by the reader, or by a caller that gave up"""
+
+    def __init__(self, semaphore):
+        self._semaphore = semaphore
+        self._lock = threading.Lock()
+        self.held_since = None
+
+    def acquire(self):
+        self._semaphore.acquire()
+        with self._lock:
+            self.held_since = time.monotonic()
+
+    def release(self):
+        with self._lock:
+            if self.held_since is None:
+                return False
+            self.held_since = None
+        self._semaphore.release()
+        return True
+
+    def stalled(self, seconds):
+        with self._lock:
+            return self.held_since is not None and time.monotonic() - self.held_since >= seconds
+
+
+def is_retryable(error):
+    if isinstance(error, (TransientLLMError, TimeoutError, ConnectionError)):
+        return True
+    if type(error).__name__ in RETRYABLE_ERROR_NAMES:
+        return True
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    return status in RETRYABLE_STATUS_CODES
+
+
+class TokenBucket:
+    """Thread-safe token bucket allowing `capacity` requests at once, refilled at `rate` per second"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Taking one token, returning how many seconds the caller must wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def refund(self):
+        with self._lock:
+            self.tokens = min(self.capacity, self.tokens + 1)
+
+
+class LLMScheduler:
+    """
+    Sending requests to an LLM backend with at most max_concurrency in
+    flight, retrying transient failures with exponential backoff, and
+    limiting each user to a token-bucket request rate.
+    """
+
+    def __init__(self, backend, max_concurrency=LLM_MAX_CONCURRENCY, max_retries=LLM_MAX_RETRIES,
+                 base_delay=LLM_RETRY_BASE_DELAY, max_delay=LLM_RETRY_MAX_DELAY,
+                 user_rate_per_minute=USER_REQUESTS_PER_MINUTE, user_burst=USER_BURST,
+                 user_max_wait=USER_MAX_WAIT_SECONDS, stream_idle_seconds=LLM_STREAM_IDLE_SECONDS):
+        self.backend = backend
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.user_rate = user_rate_per_minute / 60.0
+        self.user_burst = user_burst
+        self.user_max_wait = user_max_wait
+        self.stream_idle_seconds = stream_idle_seconds
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "retries": 0, "failures": 0, "throttled": 0, "in_flight": 0, "peak_in_flight": 0}
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+            if key == "in_flight":
+                self.stats["peak_in_flight"] = max(self.stats["peak_in_flight"], self.stats["in_flight"])
+
+    def _wait_for_user(self, user):
+        if user is None or self.user_rate <= 0:
+            return
+        with self._lock:
+            bucket = self._buckets.setdefault(user, TokenBucket(self.user_rate, self.user_burst))
+        wait = bucket.reserve()
+        if wait > self.user_max_wait:
+            bucket.refund()
+            raise RateLimitExceeded(f"Too many questions, please wait {wait:.0f}s before asking again")
+        if wait > 0:
+            self._count("throttled")
+            time.sleep(wait)
+
+    def _backoff(self, attempt):
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+        # Full jitter so sessions that failed together do not retry together
+        time.sleep(random.uniform(0, delay))
+
+    def generate(self, prompt, images=None, user=None):
+        """Returning the full answer text for prompt"""
+        self._wait_for_user(user)
+        self._count("requests")
+        for attempt in range(self.max_retries + 1):
+            with self._slots:
+                self._count("in_flight")
+                try:
+                    return self.backend.generate(prompt, images)
+                except Exception as e:
+                    if attempt >= self.max_retries or not is_retryable(e):
+                        self._count("failures")
+                        raise
+                finally:
+                    self._count("in_flight", -1)
+            self._count("retries")
+            self._backoff(attempt)
+
+    def stream(self, prompt, images=None, user=None):
+        """
+        Yielding the answer in pieces. A transient failure is only retried
+        before the first piece arrives, since the caller may already have
+        shown partial output.
+
+        The backend is read on its own thread, which holds a concurrency
+        slot only while the provider is producing; pieces are buffered for
+        the caller. A caller that is slow between pieces (running a
+        generated code block) or abandons the stream (a Streamlit rerun)
+        therefore does not keep the slot from other sessions. A provider that
+        holds the slot for stream_idle_seconds without sending anything is
+        given up on: the slot is released and StreamStalled is raised.
+        """
+        self._wait_for_user(user)
+        self._count("requests")
+        pieces = queue.Queue()
+        cancelled = threading.Event()
+        slot = _StreamSlot(self._slots)
+        reader = threading.Thread(
+            target=self._read_stream, args=(prompt, images, pieces, cancelled, slot), name="llm-stream", daemon=True
+        )
+        reader.start()
+        try:
+            while True:
+                try:
+                    kind, value = pieces.get(timeout=self.stream_idle_seconds)
+                except queue.Empty:
+                    # Waiting for a slot or backing off is not a stall, only silence while holding one
+                    if not slot.stalled(self.stream_idle_seconds):
+                        continue
+                    cancelled.set()
+                    if slot.release():
+                        self._count("in_flight", -1)
+                    self._count("failures")
+                    raise StreamStalled(f"No response from the model for {self.stream_idle_seconds:.0f}s")
+                if kind == "piece":
+                    yield value
+                elif kind == "error":
+                    raise value
+                else:
+                    return
+        finally:
+            # Stopping the reader if the caller stopped reading
+            cancelled.set()
+
+    def _read_stream(self, prompt, images, pieces, cancelled, slot):
+        for attempt in range(self.max_retries + 1):
+            started = False
+            slot.acquire()
+            self._count("in_flight")
+            try:
+                stream = self.backend.stream(prompt, images)
+                try:
+                    for piece in stream:
+                        started = True
+                        pieces.put(("piece", piece))
+                        if cancelled.is_set():
+                            break
+                finally:
+                    # Closing the provider's response early when the caller has gone
+                    if hasattr(stream, "close"):
+                        stream.close()
+                pieces.put(("done", None))
+                return
+            except Exception as e:
+                if started or attempt >= self.max_retries or not is_retryable(e) or cancelled.is_set():
+                    self._count("failures")
+                    pieces.put(("error", e))
+                    return
+            finally:
+                # A caller that gave up on a stalled stream has already given the slot back
+                if slot.release():
+                    self._count("in_flight", -1)
+            if cancelled.is_set():
+                return
+            self._count("retries")
+            self._backoff(attempt)
+
+
+@shared_resource
+def get_scheduler():
+    return LLMScheduler(get_llm_backend())
@@ -1,14 +1,161 @@
 import pytesseract
-from PIL import Image
+from PIL import Image, ImageOps
 import io
+import os
+import hashlib
+import threading
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 
+from backend.tracing import span
+
+try:
+    import cv2
+    # One OpenCV thread per OCR worker process; the pool already spreads images over the cores
+    cv2.setNumThreads(1)
+except ImportError:  # without OpenCV images are only downscaled and converted to grayscale
+    cv2 = None
+
+OCR_CACHE_DIR = "cache/ocr"
+# Running the preprocessing pipeline below instead of plain image_to_string on the upload. Opt-in until
+# benchmarks/bench_ocr_preprocessing.py has shown its character error rate is no worse on real scans
+OCR_PREPROCESS = os.getenv("OCR_PREPROCESS", "").lower() in ("1", "true", "yes")
+# Images with a side below this many pixels are treated as decorative and skipped
+MIN_IMAGE_SIZE = 48
+# Longer side images are downscaled to before OCR; phone photos are often 4000px and more
+OCR_MAX_SIDE = 2000
+# Tesseract language(s) and page segmentation mode (3 = automatic layout, 6 = one text block, 11 = sparse text)
+OCR_LANG = os.getenv("OCR_LANG", "eng")
+OCR_PSM = int(os.getenv("OCR_PSM", "3"))
+# Words tesseract is less confident about than this (0-100) are dropped
+OCR_MIN_CONFIDENCE = 50
+# Skew angles (degrees) outside this range are left alone, since they are more likely layout than tilt
+DESKEW_MIN_ANGLE = 0.3
+DESKEW_MAX_ANGLE = 15
+# Part of the cache key, so changing the pipeline does not serve text from the old one
+OCR_CONFIG = f"v2-{OCR_LANG}-{OCR_PSM}-{OCR_MIN_CONFIDENCE}-{OCR_MAX_SIDE}" if OCR_PREPROCESS else "raw"
+
+_ocr_pool = None
+_ocr_pool_lock = threading.Lock()
+
+
+def downscale(image, max_side=OCR_MAX_SIDE):
+    """Shrinking a PIL image so its longer side is at most max_side, honouring EXIF rotation"""
+    image = ImageOps.exif_transpose(image)
+    if max(image.size) > max_side:
+        image = image.copy()
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+    return image
+
+
+def _skew_angle(binary):
+    # Angle of the minimum-area rectangle around the ink pixels, as in classic deskewing
+    coords = np.column_stack(np.where(binary > 0))
+    if len(coords) < 100:
+        return 0.0
+    angle = cv2.minAreaRect(coords[:, ::-1].astype(np.float32))[-1]
+    # OpenCV versions report the angle in different ranges; mapping it to the smallest rotation either way
+    return (angle + 45) % 90 - 45
+
+
+def has_text_regions(gray, min_regions=1):
+    """
+    Cheap check for text-like regions (short, wide blobs of strong edges) in
+    a grayscale array, run on a small copy. Photos and charts without
+    lettering fail it and skip tesseract. One region is enough by default,
+    since a short label or part number may be the only text in an image.
+    """
+    if cv2 is None:
+        return True
+    scale = 800 / max(gray.shape)
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else gray
+    gradient = cv2.morphologyEx(small, cv2.MORPH_GRADIENT, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)))
+    _, edges = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    # Joining the letters of a word or line into one blob
+    joined = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (9, 1)))
+    contours, _ = cv2.findContours(joined, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+    regions = 0
+    for contour in contours:
+        # Measuring the blob along its own axis so slightly rotated lines still count
+        (_, _), (rect_w, rect_h), _ = cv2.minAreaRect(contour)
+        short, long = sorted((rect_w, rect_h))
+        # Bounding the blob height by the longer side, as a label's one line fills most of its height
+        if not (4 <= short <= max(max(small.shape) * 0.2, MIN_IMAGE_SIZE) and long >= 1.5 * short):
+            continue
+        # Text blobs are dense with edges; smooth shapes and gradients are not
+        x, y, w, h = cv2.boundingRect(contour)
+        if cv2.countNonZero(edges[y:y + h, x:x + w]) >= 0.25 * short * long:
+            regions += 1
+            if regions >= min_regions:
+                return True
+    return False
+
+
+def preprocess_image(image, max_side=OCR_MAX_SIDE):
+    """
+    Preparing a PIL image for tesseract: downscaled, grayscale, deskewed and
+    binarized with an adaptive threshold (which copes with the uneven light
+    of phone photos). Returns a uint8 array, or None when the image has no
+    text-like regions.
+    """
+    gray = np.asarray(downscale(image, max_side).convert("L"))
+    if cv2 is None:
+        return gray
+    if not has_text_regions(gray):
+        return None
+
+    denoised = cv2.medianBlur(gray, 3)
+    binary = cv2.adaptiveThreshold(
+        denoised, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 15
+    )
+    angle = _skew_angle(255 - binary)
+    if DESKEW_MIN_ANGLE <= abs(angle) <= DESKEW_MAX_ANGLE:
+        height, width = binary.shape
+        rotation = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+        binary = cv2.warpAffine(
+            binary, rotation, (width, height), flags=cv2.INTER_NEAREST, borderValue=255
+        )
+    return binary
+
+
+def recognize(pixels, lang=OCR_LANG, psm=OCR_PSM, min_confidence=OCR_MIN_CONFIDENCE):
+    """Text of a preprocessed image from tesseract's word boxes, keeping words of at least min_confidence"""
+    data = pytesseract.image_to_data(
+        pixels, lang=lang, config=f"--psm {psm}", output_type=pytesseract.Output.DICT
+    )
+    lines = {}
+    for i, word in enumerate(data["text"]):
+        if not word.strip() or float(data["conf"][i]) < min_confidence:
+            continue
+        line = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        lines.setdefault(line, []).append(word)
+
+    # Keeping tesseract's reading order, with a blank line between paragraphs
+    text = []
+    previous = None
+    for (block, par, _), words in lines.items():
+        if previous is not None and previous != (block, par):
+            text.append("")
+        text.append(" ".join(words))
+        previous = (block, par)
+    return "\n".join(text)
+
+
+def ocr_pil_image(image, preprocess=None):
+    if not (OCR_PREPROCESS if preprocess is None else preprocess):
+        return pytesseract.image_to_string(image)
+    pixels = preprocess_image(image)
+    if pixels is None:
+        return ""
+    return recognize(pixels)
 
 
 def ocr_image(file):
     """For direct image uploads"""
     try:
         image = Image.open(file)
-        return pytesseract.image_to_string(image)
+        return ocr_pil_image(image)
     except Exception as e:
         return f"OCR Error: {str(e)}"
 
@@ -16,6 +163,90 @@ def ocr_image_bytes(image_bytes):
     """For images extracted from PDFs"""
     try:
         image = Image.open(io.BytesIO(image_bytes))
-        return pytesseract.image_to_string(image)
+        return ocr_pil_image(image)
     except Exception as e:
-        return f"OCR Error: {str(e)}"
\ No newline at end of file
+        return f"OCR Error: {str(e)}"
+
+def image_hash(image_bytes):
+    return hashlib.sha1(image_bytes).hexdigest()
+
+def _cache_path(key):
+    return os.path.join(OCR_CACHE_DIR, OCR_CONFIG, key[:2], f"{key}.txt")
+
+def _read_cached(key):
+    try:
+        with open(_cache_path(key), "r", encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return None
+
+def _write_cached(key, text):
+    # OCR errors are not cached so a later upload can retry them
+    if text.startswith("OCR Error:"):
+        return
+    path = _cache_path(key)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Naming the temp file per thread since concurrent uploads may OCR the same image
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Error caching OCR result: {str(e)}")
+
+def _get_ocr_pool():
+    # Sharing one pool sized to the cores across uploads to avoid re-spawning workers
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is None:
+            _ocr_pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1)
+        return _ocr_pool
+
+def ocr_images_bytes(images):
+    """
+    OCR for a batch of image bytes, returning the text of each image in order.
+
+    Identical images are recognised once, results are cached on disk by
+    content hash, and cache misses run across a process pool.
+    """
+    global _ocr_pool
+    if not images:
+        return []
+    keys = [image_hash(image_bytes) for image_bytes in images]
+    results = {}
+    pending = {}
+    for key, image_bytes in zip(keys, images):
+        if key in results or key in pending:
+            continue
+        cached = _read_cached(key)
+        if cached is not None:
+            results[key] = cached
+        else:
+            pending[key] = image_bytes
+
+    with span("ocr") as s:
+        s.count("images", len(images))
+        s.count("cached", len(results))
+        s.count("bytes", sum(len(image_bytes) for image_bytes in pending.values()))
+        if len(pending) == 1:
+            # Skipping the pool round-trip for a single image
+            key, image_bytes = next(iter(pending.items()))
+            results[key] = ocr_image_bytes(image_bytes)
+            _write_cached(key, results[key])
+        elif pending:
+            try:
+                texts = _get_ocr_pool().map(ocr_image_bytes, pending.values())
+                for key, text in zip(pending, texts):
+                    results[key] = text
+                    _write_cached(key, text)
+            except Exception as e:
+                # Falling back to serial OCR if the pool is unavailable or broken
+                print(f"OCR pool error, running serially: {str(e)}")
+                _ocr_pool = None
+                for key, image_bytes in pending.items():
+                    if key not in results:
+                        results[key] = ocr_image_bytes(image_bytes)
+                        _write_cached(key, results[key])
+
+    return [results[key] for key in keys]
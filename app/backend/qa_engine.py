@@ -1,40 +1,43 @@
-import os
-from dotenv import load_dotenv
-import google.generativeai as genai
+import re
+import time
 from PIL import Image
-import streamlit as st
-
-# Loading environment variables from .env file
-load_dotenv()
-
-# Retrieving Gemini API key from Streamlit secrets
-GEMINI_API_KEY = st.secrets["GEMINI_API_KEY"]
-
-# Raising error if API key is missing
-if not GEMINI_API_KEY:
-    raise ValueError("Missing GEMINI_API_KEY in .env")
-
-# Configuring Gemini with the provided API key
-genai.configure(api_key=GEMINI_API_KEY)
-
-# Initializing Gemini models for text and vision processing
-text_model = genai.GenerativeModel("gemini-2.5-pro-exp-03-25")
-vision_model = genai.GenerativeModel("gemini-2.5-pro-exp-03-25")
-
-
-def answer_question(question, text_chunks, named_dfs=None, image_files=None):
-    # Merging all text chunks into a single context string
-    text_context = "\n\n".join([text for text, _ in text_chunks])
+from backend.context_builder import build_context, CONTEXT_TOKEN_BUDGET
+from backend.chunker import count_tokens
+from backend.llm_scheduler import get_scheduler
+from backend.tracing import span
+
+CODE_BLOCK = re.compile(r"```(?:python)?\s*([\s\S]*?)```")
+
+
+def split_answer(text):
+    """
+    Splitting a (possibly partial) answer into the prose to display and the
+    ```python blocks that are already closed. An unclosed block at the end is
+    held back until its closing fence arrives.
+    """
+    code_blocks = CODE_BLOCK.findall(text)
+    display = CODE_BLOCK.sub("", text)
+    open_fence = display.find("```")
+    if open_fence != -1:
+        display = display[:open_fence]
+    return display.strip(), code_blocks
+
+
+def build_prompt(question, text_chunks, named_dfs=None, token_budget=CONTEXT_TOKEN_BUDGET, report=None):
+    # Assembling relevant, deduplicated text and compact DataFrame previews within the token budget
+    with span("build_prompt") as s:
+        text_context, df_context, context_report = build_context(text_chunks, named_dfs, budget=token_budget)
+        context_report["question_tokens"] = count_tokens(question)
+        for key in ("text_tokens", "dataframe_tokens", "question_tokens", "chunks_used"):
+            s.count(key, context_report.get(key, 0))
+    if report is not None:
+        report.update(context_report)
 
     # Building structured data description if DataFrames are available
     if named_dfs:
-        df_info = "\n".join([
-            f"- `{name}` (from file '{filename}'): columns = {list(df.columns)}"
-            for name, (df, filename) in named_dfs.items()
-        ])
         df_section = f"""
 You are having access to the following DataFrames (from uploaded files):
-{df_info}
+{df_context}
 """
     else:
         df_section = ""
@@ -68,19 +71,52 @@ Context:
 Question:
 {question}
 """
+    return prompt
+
+
+def _error_message(scheduler, error):
+    # Handling any exceptions from the LLM provider
+    return f"⚠️ {scheduler.backend.label} API Error: {str(error)}"
+
+
+def answer_question(question, text_chunks, named_dfs=None, image_files=None,
+                    token_budget=CONTEXT_TOKEN_BUDGET, report=None, user=None):
+    prompt = build_prompt(question, text_chunks, named_dfs, token_budget=token_budget, report=report)
+    scheduler = get_scheduler()
 
     try:
-        # Generating response using the vision model if images are provided
-        if image_files:
-            images = [Image.open(img) for img in image_files]
-            response = vision_model.generate_content([prompt] + images)
-        else:
-            # Generating response using text-only model
-            response = text_model.generate_content(prompt)
+        images = [Image.open(img) for img in image_files] if image_files else None
+        with span("llm", backend=scheduler.backend.label) as s:
+            answer = scheduler.generate(prompt, images, user=user)
+            s.count("chars", len(answer))
 
         # Returning clean response text
-        return response.text.strip()
+        return answer.strip()
+
+    except Exception as e:
+        return _error_message(scheduler, e)
+
+
+def stream_answer(question, text_chunks, named_dfs=None, image_files=None,
+                  token_budget=CONTEXT_TOKEN_BUDGET, report=None, user=None):
+    """
+    Like answer_question, but yielding the answer text piece by piece as the
+    model produces it. An API failure is yielded as the usual error message.
+    """
+    prompt = build_prompt(question, text_chunks, named_dfs, token_budget=token_budget, report=report)
+    scheduler = get_scheduler()
+
+    try:
+        images = [Image.open(img) for img in image_files] if image_files else None
+        # Code blocks run by the caller while the answer streams show up inside this span
+        with span("llm", backend=scheduler.backend.label) as s:
+            started = time.perf_counter()
+            for n, piece in enumerate(scheduler.stream(prompt, images, user=user)):
+                if n == 0:
+                    s.set(first_piece_ms=round((time.perf_counter() - started) * 1000, 1))
+                s.count("pieces")
+                s.count("chars", len(piece))
+                yield piece
 
     except Exception as e:
-        # Handling any exceptions from the Gemini API
-        return f"⚠️ Gemini API Error: {str(e)}"
+        yield _error_message(scheduler, e)
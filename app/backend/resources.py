@@ -0,0 +1,46 @@
+# backend/resources.py
+import functools
+import threading
+
+_warm_up_started = False
+_warm_up_lock = threading.Lock()
+
+
+def shared_resource(loader):
+    """
+    Turning a zero-argument loader into a process-wide lazy singleton, in the
+    spirit of st.cache_resource: the first caller loads it (once, even under
+    concurrent sessions) and everyone after gets the same object.
+    """
+    lock = threading.Lock()
+    state = {}
+
+    @functools.wraps(loader)
+    def get():
+        if "value" not in state:
+            with lock:
+                if "value" not in state:
+                    state["value"] = loader()
+        return state["value"]
+
+    get.is_loaded = lambda: "value" in state
+    return get
+
+
+def warm_up(*getters):
+    """Loading shared resources in a background thread, once per process"""
+    global _warm_up_started
+    with _warm_up_lock:
+        if _warm_up_started:
+            return
+        _warm_up_started = True
+
+    def run():
+        for getter in getters:
+            try:
+                getter()
+            except Exception as e:
+                # The resource will be loaded (and the error surfaced) on first real use
+                print(f"Error warming up {getattr(getter, '__name__', getter)}: {str(e)}")
+
+    threading.Thread(target=run, name="resource-warm-up", daemon=True).start()
@@ -1,29 +1,392 @@
 # backend/semantic_search.py
-from sentence_transformers import SentenceTransformer
+import json
+import os
+import threading
+from collections import OrderedDict
+
 import numpy as np
 
-model = SentenceTransformer('all-MiniLM-L6-v2')
-index = []
-
-def clear_index():
-    global index
-    index = []
-
-def add_to_index(chunks):
-    global index
-    embeddings = model.encode([chunk[0] for chunk in chunks])
-    for chunk, embedding in zip(chunks, embeddings):
-        index.append((chunk, embedding))
-
-def search(query, top_k=5):
-    if not index:
-        return []
-    
-    query_embedding = model.encode([query])[0]
-    similarities = []
-    
-    for chunk, embedding in index:
-        similarity = np.dot(embedding, query_embedding)
-        similarities.append((chunk, similarity))
-    
-    return sorted(similarities, key=lambda x: x[1], reverse=True)[:top_k]
\ No newline at end of file
+from backend.embedding_service import EmbeddingService
+from backend.embedding_store import DTYPES, EmbeddingStore, chunk_hash
+from backend.lexical_index import BM25Index, is_keyword_query
+from backend.resources import shared_resource
+
+try:
+    import faiss
+except ImportError:  # faiss-cpu is optional, the numpy backend covers every case
+    faiss = None
+
+EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+
+BACKENDS = ("numpy", "flat", "ivf", "hnsw")
+# IVF needs enough vectors to train its coarse quantizer
+IVF_MIN_TRAIN = 4096
+# Persisted indexes larger than this are memory-mapped instead of read into RAM
+MMAP_THRESHOLD_BYTES = 64 * 1024 * 1024
+# Total size of the chat indexes kept in memory across sessions
+INDEX_CACHE_BYTES = 512 * 1024 * 1024
+# Precision chat indexes search in: exact "float32", or opt-in "float16" / "int8" codes rescored with
+# float32 vectors for very large chats
+EMBEDDING_DTYPE = os.getenv("EMBEDDING_DTYPE", "float32")
+# Quantized searches rescore this many times top_k approximate best chunks (at least RESCORE_MIN) exactly
+RESCORE_FACTOR = 4
+RESCORE_MIN = 50
+# Candidates taken from each of the vector and BM25 rankings before fusing them
+HYBRID_CANDIDATES = 50
+# Share of the fused score that comes from vector similarity; the rest comes from BM25
+HYBRID_DENSE_WEIGHT = 0.5
+# BM25 hits scoring below this share of the best hit (matching only common words) are not fused
+LEXICAL_MIN_SCORE_RATIO = 0.1
+
+
+@shared_resource
+def get_model():
+    # Importing here keeps torch and the model off the app's startup path
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBEDDING_MODEL)
+
+
+@shared_resource
+def get_embedding_service():
+    # One queue for every session, so concurrent questions share model calls
+    return EmbeddingService(get_model)
+
+
+def embed_query(text):
+    """Normalized embedding of one query string"""
+    return normalize(get_embedding_service().encode([text]))[0]
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class ChatIndex:
+    """
+    Vector index for the chunks of a single chat.
+
+    Embeddings live in one contiguous, L2-normalized float32 matrix (an
+    EmbeddingStore keyed by chunk content hash) with the chunks kept in a
+    parallel list, so scoring a query is one matrix product. Passing
+    backend="flat" / "ivf" / "hnsw" searches through FAISS when it is
+    installed; the numpy matrix remains the source of truth either way.
+    With dtype="float16" or "int8" the numpy backend scores the store's
+    quantized codes, keeping the float32 vectors memory-mapped once saved,
+    and rescores a shortlist of RESCORE_FACTOR * top_k chunks exactly.
+    A BM25 inverted index over the same chunks (built on first use, then
+    extended as chunks are added) supplies exact term matches for
+    hybrid_search.
+
+    One index can be shared by several sessions of the same chat, so
+    mutations and the lazy FAISS / BM25 builds hold the index's lock;
+    embedding happens outside it.
+    """
+
+    def __init__(self, backend="numpy", nlist=256, nprobe=16, hnsw_m=32, dtype=EMBEDDING_DTYPE):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown index backend: {backend}")
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown embedding dtype: {dtype}")
+        if backend != "numpy" and faiss is None:
+            backend = "numpy"
+        self.backend = backend
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.hnsw_m = hnsw_m
+        self.store = EmbeddingStore(dtype=dtype)
+        self.chunks = []
+        self.path = None
+        # Number of chat context chunks already consumed into this index
+        self.synced_chunks = 0
+        self._faiss_index = None
+        self._lexical = None
+        # Reentrant, since hybrid_search runs search and builds the lexical index under it
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def __contains__(self, chunk):
+        return chunk_hash(chunk[0]) in self.store
+
+    @property
+    def nbytes(self):
+        return self.store.nbytes
+
+    def add(self, chunks, embeddings=None, cache=None):
+        """
+        Adding chunks that are not indexed yet and returning how many were added.
+
+        Vectors come from `embeddings` when given, then from the `cache`
+        EmbeddingStore, and only the remaining chunks are encoded.
+        """
+        keys = [chunk_hash(chunk[0]) for chunk in chunks]
+        new_rows = {}
+        with self._lock:
+            for row, key in enumerate(keys):
+                if key not in self.store and key not in new_rows:
+                    new_rows[key] = row
+        if not new_rows:
+            return 0
+
+        rows = list(new_rows.values())
+        new_keys = list(new_rows)
+        if embeddings is not None:
+            vectors = np.asarray(embeddings, dtype=np.float32)[rows]
+        else:
+            positions = cache.positions(new_keys) if cache is not None and len(cache) else None
+            to_encode = [i for i in range(len(rows)) if positions is None or positions[i] < 0]
+            encoded = get_embedding_service().encode([chunks[rows[i]][0] for i in to_encode]) if to_encode else None
+            dim = encoded.shape[1] if encoded is not None else cache.vectors.shape[1]
+            vectors = np.empty((len(rows), dim), dtype=np.float32)
+            if encoded is not None:
+                vectors[to_encode] = encoded
+            if positions is not None:
+                cached = np.flatnonzero(positions >= 0)
+                vectors[cached] = cache.vectors[positions[cached]]
+
+        vectors = normalize(vectors)
+        with self._lock:
+            # Another session may have added some of these chunks while they were being embedded
+            fresh = [n for n, key in enumerate(new_keys) if key not in self.store]
+            if not fresh:
+                return 0
+            if len(fresh) < len(new_keys):
+                rows = [rows[n] for n in fresh]
+                new_keys = [new_keys[n] for n in fresh]
+                vectors = vectors[fresh]
+            self.store.add(new_keys, vectors)
+            self.chunks.extend(tuple(chunks[row]) for row in rows)
+            if self._lexical is not None:
+                self._lexical.add(chunks[row][0] for row in rows)
+
+            # Growing the FAISS index in place when it supports it, otherwise rebuilding lazily
+            if self._faiss_index is not None:
+                if self.backend == "ivf" and not self._faiss_index.is_trained:
+                    self._faiss_index = None
+                else:
+                    self._faiss_index.add(vectors)
+        return len(rows)
+
+    def search(self, queries, top_k=5):
+        """
+        Returning the top_k (chunk, score) pairs for a query string, or one
+        such list per query when given a list of strings or a 2-D array of
+        query embeddings.
+        """
+        single = isinstance(queries, str)
+        if single:
+            queries = [queries]
+        if len(self) == 0 or len(queries) == 0:
+            return [] if single else [[] for _ in queries]
+
+        if isinstance(queries, np.ndarray):
+            query_vectors = normalize(queries)
+        else:
+            query_vectors = normalize(get_embedding_service().encode(queries))
+
+        with self._lock:
+            if len(self) == 0:
+                return [] if single else [[] for _ in queries]
+            top_k = min(top_k, len(self))
+            faiss_index = self._get_faiss_index()
+            if faiss_index is not None:
+                scores, indices = faiss_index.search(query_vectors, top_k)
+            else:
+                scores, indices = self._search_matrix(query_vectors, top_k)
+
+            results = [
+                [(self.chunks[i], float(score)) for i, score in zip(row_indices, row_scores) if i >= 0]
+                for row_indices, row_scores in zip(indices, scores)
+            ]
+        return results[0] if single else results
+
+    @property
+    def lexical(self):
+        with self._lock:
+            if self._lexical is None:
+                lexical = BM25Index()
+                lexical.add(chunk[0] for chunk in self.chunks)
+                self._lexical = lexical
+            return self._lexical
+
+    def lexical_search(self, query, top_k=5):
+        """Returning the top_k (chunk, BM25 score) pairs for a query string"""
+        with self._lock:
+            return [(self.chunks[i], score) for i, score in self.lexical.search(query, top_k)]
+
+    def hybrid_search(self, query, top_k=5, query_embedding=None, candidates=HYBRID_CANDIDATES,
+                      dense_weight=HYBRID_DENSE_WEIGHT):
+        """
+        Returning the top_k (chunk, fused score) pairs for a query string.
+        The best `candidates` chunks by vector similarity and by BM25 are
+        pooled, both scores are scaled to 0..1 over the pool, and chunks
+        are ranked by dense_weight * vector + (1 - dense_weight) * BM25.
+
+        Short keyword queries naming a code or number (see
+        is_keyword_query) are answered from BM25 alone when it finds
+        matches, without embedding the query.
+        """
+        if len(self) == 0:
+            return []
+        with self._lock:
+            lexical = self.lexical.search(query, max(top_k, candidates))
+            if lexical and is_keyword_query(query):
+                return [(self.chunks[i], score) for i, score in lexical[:top_k]]
+
+        if query_embedding is None:
+            query_embedding = get_embedding_service().encode([query])[0]
+        query_vector = normalize(np.asarray(query_embedding).reshape(1, -1))
+        # Chunks are only ever appended, so the BM25 positions stay valid while the query is embedded
+        with self._lock:
+            return self._fuse(query_vector, lexical, top_k, candidates, dense_weight)
+
+    def _fuse(self, query_vector, lexical, top_k, candidates, dense_weight):
+        lexical = [(i, score) for i, score in lexical if score >= lexical[0][1] * LEXICAL_MIN_SCORE_RATIO]
+        dense = self.search(query_vector, top_k=candidates)[0]
+        if not lexical:
+            return dense[:top_k]
+
+        # Scoring the pooled chunks exactly against the query, including BM25 hits the vector search missed
+        pool = list(dict.fromkeys(
+            [int(p) for p in self.store.positions([chunk_hash(chunk[0]) for chunk, _ in dense])] + [i for i, _ in lexical]
+        ))
+        dense_scores = self.store.vectors[pool] @ query_vector[0]
+        lexical_scores = np.zeros(len(pool), dtype=np.float32)
+        slot = {position: n for n, position in enumerate(pool)}
+        for i, score in lexical:
+            lexical_scores[slot[i]] = score
+
+        def scaled(scores):
+            low, high = scores.min(), scores.max()
+            return (scores - low) / (high - low) if high > low else np.ones_like(scores)
+
+        fused = dense_weight * scaled(dense_scores) + (1 - dense_weight) * scaled(lexical_scores)
+        order = np.argsort(-fused, kind="stable")[:top_k]
+        return [(self.chunks[pool[n]], float(fused[n])) for n in order]
+
+    def _search_matrix(self, query_vectors, top_k):
+        scores = self.store.scores(query_vectors)
+        if not self.store.quantized:
+            return self._top_k(scores, top_k)
+
+        # Rescoring the approximate best with the float32 vectors
+        shortlist = min(len(self), max(top_k * RESCORE_FACTOR, RESCORE_MIN))
+        _, candidates = self._top_k(scores, shortlist)
+        exact = np.einsum("qkd,qd->qk", self.store.vectors[candidates], query_vectors)
+        top_scores, order = self._top_k(exact, top_k)
+        return top_scores, np.take_along_axis(candidates, order, axis=1)
+
+    @staticmethod
+    def _top_k(scores, top_k):
+        # Partial selection of the top_k columns, then sorting only those
+        if top_k < scores.shape[1]:
+            indices = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+        else:
+            indices = np.tile(np.arange(scores.shape[1]), (len(scores), 1))
+        top_scores = np.take_along_axis(scores, indices, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        return np.take_along_axis(top_scores, order, axis=1), np.take_along_axis(indices, order, axis=1)
+
+    def _get_faiss_index(self):
+        if self.backend == "numpy":
+            return None
+        if self._faiss_index is not None:
+            return self._faiss_index
+
+        vectors = np.ascontiguousarray(self.store.vectors, dtype=np.float32)
+        dim = vectors.shape[1]
+        if self.backend == "flat":
+            index = faiss.IndexFlatIP(dim)
+        elif self.backend == "hnsw":
+            index = faiss.IndexHNSWFlat(dim, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        else:
+            if len(vectors) < IVF_MIN_TRAIN:
+                return None
+            quantizer = faiss.IndexFlatIP(dim)
+            index = faiss.IndexIVFFlat(quantizer, dim, self.nlist, faiss.METRIC_INNER_PRODUCT)
+            index.train(vectors)
+            index.nprobe = self.nprobe
+        index.add(vectors)
+        self._faiss_index = index
+        return index
+
+    def save(self, path=None):
+        path = path or self.path
+        with self._lock:
+            self.store.save(path)
+            with open(f"{path}.chunks.json.tmp", "w") as f:
+                json.dump({"backend": self.backend, "synced_chunks": self.synced_chunks, "chunks": self.chunks}, f)
+            os.replace(f"{path}.chunks.json.tmp", f"{path}.chunks.json")
+            self.path = path
+
+    @classmethod
+    def load(cls, path, mmap=None, backend=None, dtype=EMBEDDING_DTYPE):
+        """
+        Loading a saved index, memory-mapping the vectors when mmap is True
+        or the file is large, and quantizing them to dtype if saved otherwise
+        """
+        if mmap is None:
+            mmap = os.path.exists(f"{path}.npy") and os.path.getsize(f"{path}.npy") >= MMAP_THRESHOLD_BYTES
+        chunks_path = f"{path}.chunks.json"
+        meta = {}
+        if os.path.exists(chunks_path):
+            with open(chunks_path, "r") as f:
+                meta = json.load(f)
+
+        index = cls(backend=backend or meta.get("backend", "numpy"), dtype=dtype)
+        index.path = path
+        store = EmbeddingStore.load(path, mmap=mmap, dtype=dtype)
+        chunks = [tuple(chunk) for chunk in meta.get("chunks", [])]
+        # A store without matching chunks cannot be searched, so it starts empty
+        if len(store) == len(chunks):
+            index.store = store
+            index.chunks = chunks
+            index.synced_chunks = meta.get("synced_chunks", 0)
+        return index
+
+
+class IndexCache:
+    """LRU of recently active chat indexes, bounded by their total vector bytes"""
+
+    def __init__(self, max_bytes=INDEX_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._indexes)
+
+    @property
+    def nbytes(self):
+        return sum(index.nbytes for index in self._indexes.values())
+
+    def get(self, key):
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes.move_to_end(key)
+            return index
+
+    def put(self, key, index):
+        with self._lock:
+            self._indexes[key] = index
+            self._indexes.move_to_end(key)
+            self._evict()
+
+    def pop(self, key):
+        with self._lock:
+            return self._indexes.pop(key, None)
+
+    def _evict(self):
+        # Always keeping the most recent index, even when it alone exceeds the budget
+        total = sum(index.nbytes for index in self._indexes.values())
+        while total > self.max_bytes and len(self._indexes) > 1:
+            _, evicted = self._indexes.popitem(last=False)
+            total -= evicted.nbytes
+
+
+index_cache = IndexCache()
@@ -0,0 +1,263 @@
+# backend/table_loader.py
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+try:
+    import pyarrow
+    import pyarrow.csv
+except ImportError:  # pyarrow is optional, pandas' chunked reader covers every case
+    pyarrow = None
+from pandas.api.types import (
+    union_categoricals, is_integer_dtype, is_float_dtype, is_object_dtype, is_string_dtype, is_bool_dtype
+)
+
+# Rows parsed per CSV chunk, so peak memory is one chunk of raw strings rather than the whole file
+CSV_CHUNK_ROWS = 200_000
+# Bytes per record batch when streaming a CSV through pyarrow
+ARROW_BLOCK_BYTES = 32 * 1024 * 1024
+# Text columns with at most this share of distinct values become categoricals
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+# Rows read up front for the prompt preview of a table that is still loading
+PREVIEW_ROWS = 1000
+# Uploads at least this large are loaded in the background behind a preview
+BACKGROUND_LOAD_BYTES = 32 * 1024 * 1024
+TABLE_LOADER_WORKERS = 2
+
+_loader_pool = None
+_loader_pool_lock = threading.Lock()
+
+
+def _get_loader_pool():
+    global _loader_pool
+    with _loader_pool_lock:
+        if _loader_pool is None:
+            _loader_pool = ThreadPoolExecutor(max_workers=TABLE_LOADER_WORKERS, thread_name_prefix="table-loader")
+        return _loader_pool
+
+
+def downcast(df, category_ratio=CATEGORY_MAX_UNIQUE_RATIO, lossy_floats=False):
+    """
+    Shrinking dtypes in place: float32 where it represents every value
+    exactly (or always with lossy_floats), and low-cardinality text as
+    categorical. Integer columns stay int64, since arithmetic in generated
+    analysis code (differences, products, sums) would silently wrap around
+    in a narrower or unsigned type.
+    """
+    for column in df.columns:
+        series = df[column]
+        if is_bool_dtype(series.dtype) or is_integer_dtype(series.dtype):
+            continue
+        if is_float_dtype(series.dtype):
+            smaller = pd.to_numeric(series, downcast="float")
+            if smaller.dtype != series.dtype and (
+                lossy_floats or ((smaller.astype(series.dtype) == series) | series.isna()).all()
+            ):
+                df[column] = smaller
+        elif is_object_dtype(series.dtype) or is_string_dtype(series.dtype):
+            # Factorizing once and keeping the result only if the column is repetitive enough
+            categorical = series.astype("category")
+            if len(series) and len(categorical.cat.categories) <= len(series) * category_ratio:
+                df[column] = categorical
+    return df
+
+
+def _concat_chunks(chunks):
+    """Concatenating downcast chunks, merging per-chunk categoricals instead of falling back to object"""
+    if len(chunks) == 1:
+        return chunks[0]
+    columns = {}
+    for column in chunks[0].columns:
+        parts = [chunk[column] for chunk in chunks]
+        if all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            columns[column] = pd.Series(union_categoricals(parts, ignore_order=True), name=column)
+        else:
+            if any(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+                # A column only categorical in some chunks is kept as plain values
+                parts = [part.astype(object) if isinstance(part.dtype, pd.CategoricalDtype) else part for part in parts]
+            columns[column] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(columns)
+
+
+def _read_csv_arrow(source, block_size=ARROW_BLOCK_BYTES):
+    # Streaming record batches through pyarrow's multithreaded parser; empty strings become nulls as in pandas
+    reader = pyarrow.csv.open_csv(
+        source,
+        read_options=pyarrow.csv.ReadOptions(block_size=block_size),
+        convert_options=pyarrow.csv.ConvertOptions(strings_can_be_null=True)
+    )
+    return [downcast(batch.to_pandas(date_as_object=False)) for batch in reader]
+
+
+def read_csv(source, chunksize=CSV_CHUNK_ROWS):
+    """
+    Reading a CSV in chunks, downcasting each chunk before the next one is
+    parsed. Uses pyarrow's streaming reader when installed, falling back to
+    pandas' chunked reader if it is missing or cannot parse the file (e.g. a
+    column whose type changes after the first block).
+    """
+    chunks = None
+    if pyarrow is not None:
+        try:
+            chunks = _read_csv_arrow(source)
+        except (pyarrow.ArrowException, ValueError) as e:
+            print(f"Arrow CSV reader failed, using pandas: {str(e)}")
+            if hasattr(source, "seek"):
+                source.seek(0)
+    if chunks is None:
+        chunks = [downcast(chunk) for chunk in pd.read_csv(source, chunksize=chunksize, low_memory=False)]
+    if not chunks:
+        return pd.DataFrame()
+    return _concat_chunks(chunks)
+
+
+def read_csv_preview(source, rows=PREVIEW_ROWS):
+    return downcast(pd.read_csv(source, nrows=rows))
+
+
+class ExcelWorkbook:
+    """
+    The sheets of an XLSX upload. Every sheet is parsed (and downcast) in a
+    single pass over the workbook the first time any sheet is requested,
+    since opening it again per sheet would re-read the shared strings and
+    styles each time; previews of every sheet likewise take one pass.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self._sheets = None
+        self._lock = threading.Lock()
+
+    def sheets(self):
+        """{sheet name: DataFrame} for every sheet, in workbook order"""
+        with self._lock:
+            if self._sheets is None:
+                self.source.seek(0)
+                sheets = pd.read_excel(self.source, sheet_name=None)
+                self._sheets = {name: downcast(df) for name, df in sheets.items()}
+            return self._sheets
+
+    def sheet(self, name):
+        return self.sheets()[name]
+
+    def previews(self, rows=PREVIEW_ROWS):
+        """{sheet name: first rows} for every sheet, without parsing the rest of the workbook"""
+        with self._lock:
+            if self._sheets is not None:
+                return {name: df.head(rows) for name, df in self._sheets.items()}
+            self.source.seek(0)
+            previews = pd.read_excel(self.source, sheet_name=None, nrows=rows)
+            return {name: downcast(df) for name, df in previews.items()}
+
+
+class BackgroundTable:
+    """
+    A table whose full DataFrame is still loading on the loader pool, with
+    a preview of its first rows available immediately for the prompt.
+    `fingerprint` identifies the underlying file for caches.
+    """
+
+    def __init__(self, load, preview, row_estimate=None, fingerprint=None):
+        self.preview = preview
+        self.row_estimate = row_estimate
+        self.fingerprint = fingerprint
+        self._future = _get_loader_pool().submit(load)
+
+    @property
+    def columns(self):
+        return self.preview.columns
+
+    def done(self):
+        return self._future.done()
+
+    def result(self, timeout=None):
+        return self._future.result(timeout=timeout)
+
+    def add_done_callback(self, callback):
+        self._future.add_done_callback(lambda future: callback(self))
+
+
+def resolve_table(table, timeout=None):
+    """The full DataFrame of a DataFrame or BackgroundTable"""
+    return table.result(timeout=timeout) if isinstance(table, BackgroundTable) else table
+
+
+def table_preview(table):
+    """(DataFrame to preview, total row count or an estimate, whether the count is exact)"""
+    if isinstance(table, BackgroundTable):
+        if table.done():
+            full = table.result()
+            return full, len(full), True
+        return table.preview, table.row_estimate or len(table.preview), False
+    return table, len(table), True
+
+
+def _file_size(file):
+    position = file.tell()
+    file.seek(0, os.SEEK_END)
+    size = file.tell()
+    file.seek(position)
+    return size
+
+
+def _estimate_csv_rows(file, size, sample_bytes=1024 * 1024):
+    # Extrapolating from the line density of the first megabyte
+    file.seek(0)
+    sample = file.read(sample_bytes)
+    file.seek(0)
+    lines = sample.count(b"\n")
+    if not sample or not lines:
+        return None
+    return max(0, int(size * lines / len(sample)) - 1)
+
+
+def load_tables(file, ext, fingerprint=None, background_bytes=None):
+    """
+    Loading a CSV or XLSX upload into a list of (table, label) pairs, one per
+    non-empty sheet, where table is a DataFrame or, for uploads of at least
+    background_bytes (default BACKGROUND_LOAD_BYTES), a BackgroundTable.
+    Labels are the file name, with the sheet name appended for workbooks
+    with more than one sheet.
+    """
+    name = file.name
+    size = _file_size(file)
+    background = size >= (BACKGROUND_LOAD_BYTES if background_bytes is None else background_bytes)
+
+    if ext == "csv":
+        if not background:
+            file.seek(0)
+            return [(read_csv(file), name)]
+        file.seek(0)
+        preview = read_csv_preview(file)
+        row_estimate = _estimate_csv_rows(file, size)
+
+        def load():
+            file.seek(0)
+            return read_csv(file)
+        return [(BackgroundTable(load, preview, row_estimate, fingerprint), name)]
+
+    if ext == "xlsx":
+        workbook = ExcelWorkbook(file)
+
+        def label(sheet_name, sheet_names):
+            return name if len(sheet_names) == 1 else f"{name} [{sheet_name}]"
+
+        if not background:
+            sheets = workbook.sheets()
+            return [(df, label(sheet_name, sheets)) for sheet_name, df in sheets.items() if not df.empty]
+
+        # Reading every preview before the full load starts, since they share the workbook;
+        # the first sheet to be resolved loads all of them in one pass
+        previews = workbook.previews()
+        return [
+            (BackgroundTable(
+                lambda sheet_name=sheet_name: workbook.sheet(sheet_name),
+                preview,
+                fingerprint=f"{fingerprint}:{sheet_name}" if fingerprint else None
+            ), label(sheet_name, previews))
+            for sheet_name, preview in previews.items()
+            if len(preview.columns)
+        ]
+
+    raise ValueError(f"Unsupported table type: {ext}")
@@ -0,0 +1,232 @@
+# backend/table_profile.py
+import re
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_datetime64_any_dtype, is_numeric_dtype
+
+from backend.table_loader import BackgroundTable
+
+# Distinct counts and top values of larger tables are estimated from a sample of this many rows
+PROFILE_SAMPLE_ROWS = 1_000_000
+# Most frequent values listed for low-cardinality columns
+PROFILE_TOP_VALUES = 3
+# Columns with more distinct values than this get no top values
+PROFILE_TOP_MAX_UNIQUE = 1000
+PROFILE_MAX_VALUE_CHARS = 30
+
+_profiles = {}  # id(df) -> (weakref to df, profile)
+_profiles_lock = threading.Lock()
+
+
+def _plain(value):
+    # JSON-safe scalars, so profiles can be stored in the ingest cache
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return None if pd.isna(value) else str(pd.Timestamp(value))
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    if isinstance(value, (bool, int, float)):
+        return value
+    text = str(value)
+    return text if len(text) <= PROFILE_MAX_VALUE_CHARS else text[:PROFILE_MAX_VALUE_CHARS - 1] + "…"
+
+
+def _distinct_counts(df):
+    try:
+        return df.nunique(dropna=True)
+    except TypeError:
+        # Columns holding lists or dicts (e.g. from JSON) cannot be hashed
+        counts = {}
+        for column in df.columns:
+            try:
+                counts[column] = df[column].nunique(dropna=True)
+            except TypeError:
+                counts[column] = None
+        return pd.Series(counts, dtype=object)
+
+
+def profile_dataframe(df, sample_rows=PROFILE_SAMPLE_ROWS):
+    """
+    Column statistics of a DataFrame, computed column-wise in one pass each:
+    dtype, null count, distinct count, min/max of numeric and datetime
+    columns, and the most frequent values of low-cardinality columns.
+    """
+    rows = len(df)
+    sampled = rows > sample_rows
+    sample = df.sample(n=sample_rows, random_state=0) if sampled else df
+
+    nulls = df.isna().sum()
+    distinct = _distinct_counts(sample)
+    ordered = [
+        column for column in df.columns
+        if (is_numeric_dtype(df[column].dtype) and not is_bool_dtype(df[column].dtype))
+        or is_datetime64_any_dtype(df[column].dtype)
+    ]
+    bounds = df[ordered].agg(["min", "max"]) if ordered and rows else None
+
+    columns = []
+    for position, column in enumerate(df.columns):
+        series = sample.iloc[:, position]
+        # Categoricals are counted over the whole table, which only touches their integer codes
+        exact = not sampled or isinstance(series.dtype, pd.CategoricalDtype)
+        if exact and sampled:
+            series = df.iloc[:, position]
+            counts = series.value_counts(dropna=True)
+            count = int((counts > 0).sum())
+        else:
+            counts = None
+            count = distinct.iloc[position]
+        entry = {
+            "name": str(column),
+            "dtype": str(series.dtype),
+            "nulls": int(nulls.iloc[position]),
+            "distinct": None if count is None else int(count),
+            "exact": exact,
+        }
+        entry["unique"] = bool(entry["distinct"] is not None and 0 < entry["distinct"] == series.count())
+        if bounds is not None and column in bounds.columns:
+            entry["min"] = _plain(bounds.at["min", column])
+            entry["max"] = _plain(bounds.at["max", column])
+        elif entry["distinct"] is not None and 0 < entry["distinct"] <= PROFILE_TOP_MAX_UNIQUE:
+            if counts is None:
+                counts = series.value_counts(dropna=True)
+            entry["top"] = [
+                [_plain(value), round(int(count) / len(series), 3)]
+                for value, count in counts.head(PROFILE_TOP_VALUES).items()
+            ]
+        columns.append(entry)
+    return {"rows": rows, "sampled": sampled, "columns": columns}
+
+
+def register_profile(df, profile):
+    """Remembering an already computed profile (e.g. from the ingest cache) for df"""
+    key = id(df)
+
+    def forget(_):
+        with _profiles_lock:
+            if key in _profiles and _profiles[key][0]() is None:
+                del _profiles[key]
+
+    with _profiles_lock:
+        _profiles[key] = (weakref.ref(df, forget), profile)
+
+
+def get_profile(table):
+    """
+    The profile of a DataFrame, computed on first request and then cached
+    for the frame's lifetime. For a table still loading in the background,
+    the profile of its preview, marked "partial".
+    """
+    if isinstance(table, BackgroundTable):
+        if not table.done():
+            return dict(get_profile(table.preview), partial=True)
+        table = table.result()
+
+    with _profiles_lock:
+        cached = _profiles.get(id(table))
+    if cached is not None and cached[0]() is table:
+        return cached[1]
+    profile = profile_dataframe(table)
+    register_profile(table, profile)
+    return profile
+
+
+def profile_when_loaded(table):
+    """Profiling a table at load time: now for a DataFrame, on the loader thread for a BackgroundTable"""
+    if not isinstance(table, BackgroundTable):
+        get_profile(table)
+        return
+
+    def on_loaded(loaded):
+        try:
+            get_profile(loaded.result())
+        except Exception as e:
+            print(f"Error profiling table: {str(e)}")
+    table.add_done_callback(on_loaded)
+
+
+def _format_number(value):
+    if isinstance(value, float):
+        return f"{value:.4g}"
+    return str(value)
+
+
+def _format_share(share):
+    return f"{share:.0%}" if share >= 0.01 else "<1%"
+
+
+def format_column(entry, rows, estimated=False):
+    """One line describing a profiled column, e.g. `- region (category, 6 distinct): Seoul 21%, Busan 20%`"""
+    details = [entry["dtype"]]
+    if entry["nulls"]:
+        details.append(f"{max(entry['nulls'] / rows, 0.01):.0%} null" if rows else "all null")
+    estimated = estimated and not entry.get("exact")
+    if entry.get("unique"):
+        details.append("unique in a sample" if estimated else "unique")
+    elif entry["distinct"] is not None:
+        details.append(f"{'~' if estimated else ''}{entry['distinct']} distinct")
+
+    line = f"- {entry['name']} ({', '.join(details)})"
+    if entry.get("min") is not None:
+        line += f": {_format_number(entry['min'])} .. {_format_number(entry['max'])}"
+    elif entry.get("top"):
+        line += ": " + ", ".join(f"{value} {_format_share(share)}" for value, share in entry["top"])
+    return line
+
+
+def _format_run(prefix, suffix, width, first, last):
+    if first == last:
+        return f"{prefix}{first:0{width}d}{suffix}"
+    return f"{prefix}{{{first:0{width}d}..{last:0{width}d}}}{suffix}"
+
+
+def compress_names(names):
+    """Collapsing numbered runs of column names, e.g. sensor_001 .. sensor_120 into `sensor_{001..120}`"""
+    out = []
+    run = None  # [prefix, suffix, width, first, last]
+    for name in names:
+        match = re.fullmatch(r"(.*?)(\d+)(\D*)", name)
+        if match:
+            prefix, digits, suffix = match.groups()
+            number = int(digits)
+            if run and run[:3] == [prefix, suffix, len(digits)] and number == run[4] + 1:
+                run[4] = number
+                continue
+        if run:
+            out.append(_format_run(*run))
+            run = None
+        if match:
+            run = [prefix, suffix, len(digits), number, number]
+        else:
+            out.append(name)
+    if run:
+        out.append(_format_run(*run))
+    return out
+
+
+def format_profile(profile, detail_columns):
+    """
+    Profile lines for the first detail_columns columns, then the remaining
+    column names grouped by dtype with numbered runs collapsed.
+    """
+    rows = profile["rows"]
+    columns = profile["columns"]
+    # Statistics of a sample or of a preview are estimates for the whole table
+    estimated = profile.get("sampled") or profile.get("partial")
+    lines = [format_column(entry, rows, estimated) for entry in columns[:detail_columns]]
+
+    rest = columns[detail_columns:]
+    if rest:
+        by_dtype = {}
+        for entry in rest:
+            by_dtype.setdefault(entry["dtype"], []).append(entry["name"])
+        lines.append(f"Other {len(rest)} columns:")
+        for dtype, names in by_dtype.items():
+            lines.append(f"- {dtype}: {', '.join(compress_names(names))}")
+    return lines
@@ -0,0 +1,203 @@
+# backend/tracing.py
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+# Tracing every Q&A turn, not only those of sessions that turned on the performance panel
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "").lower() in ("1", "true", "yes")
+# Finished traces are appended here, one span per line, when set (e.g. app/local/traces.jsonl, git-ignored)
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "")
+
+# The span new spans nest under; None outside a trace, which makes span() a no-op
+_current_span = contextvars.ContextVar("current_span", default=None)
+_export_lock = threading.Lock()
+
+
+class _NullSpan:
+    """What span() returns outside a trace: entering, counting and tagging do nothing"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def count(self, name, amount=1):
+        pass
+
+    def set(self, **attributes):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """One timed stage of a trace, with attributes and additive counters (chunks, tokens, bytes...)"""
+
+    def __init__(self, trace, name, parent_id, attributes):
+        self.trace = trace
+        self.name = name
+        self.id = trace._next_id()
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.counters = {}
+        self.thread = threading.current_thread().name
+        self.start = None
+        self.end = None
+        self._token = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end = time.perf_counter()
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            # A generator closed from another context (e.g. garbage collected); nothing to restore there
+            pass
+        if exc_type is not None:
+            self.attributes["error"] = f"{exc_type.__name__}: {exc}"
+        self.trace._spans.append(self)
+        return False
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self):
+        origin = self.trace.root.start
+        return {
+            "trace_id": self.trace.id,
+            "span_id": self.id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "thread": self.thread,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round(((self.end or time.perf_counter()) - self.start) * 1000, 3),
+            "attributes": self.attributes,
+            "counters": self.counters,
+        }
+
+
+class Trace:
+    """
+    The spans of one Q&A turn. Entering the trace opens its root span;
+    span() calls anywhere below it (including threads started through
+    in_current_span) nest under whichever span is open.
+    """
+
+    def __init__(self, name, **attributes):
+        self.id = uuid.uuid4().hex
+        self.started_at = datetime.now(timezone.utc).isoformat()
+        self._ids = itertools.count()
+        self._spans = []  # list.append is atomic, so worker threads can finish spans concurrently
+        self.root = Span(self, name, None, attributes)
+
+    def _next_id(self):
+        return next(self._ids)
+
+    def __enter__(self):
+        self.root.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.root.__exit__(exc_type, exc, tb)
+        return False
+
+    @property
+    def duration_ms(self):
+        return ((self.root.end or time.perf_counter()) - self.root.start) * 1000
+
+    def records(self):
+        """Every finished span as a dict, in start order"""
+        spans = sorted(self._spans, key=lambda span: span.start)
+        return [dict(span.to_dict(), started_at=self.started_at) for span in spans]
+
+
+def span(name, **attributes):
+    """
+    A context manager timing one stage under the current span, e.g.
+    `with span("embed", model=name) as s: s.count("texts", n)`.
+    Outside a trace it is a shared no-op object, so instrumented code
+    costs one context variable lookup when tracing is off.
+    """
+    parent = _current_span.get()
+    if parent is None:
+        return _NULL_SPAN
+    return Span(parent.trace, name, parent.id, attributes)
+
+
+def in_current_span(fn):
+    """Wrapping fn so that, run on another thread, its spans nest under the span open here"""
+    parent = _current_span.get()
+    if parent is None:
+        return fn
+
+    def run(*args, **kwargs):
+        token = _current_span.set(parent)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current_span.reset(token)
+    return run
+
+
+def export_trace(trace, path=TRACE_EXPORT_PATH):
+    """Appending the spans of a finished trace to a JSONL file for offline analysis"""
+    if not path:
+        return
+    try:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        lines = "".join(json.dumps(record, default=str) + "\n" for record in trace.records())
+        with _export_lock, open(path, "a", encoding="utf-8") as f:
+            f.write(lines)
+    except OSError as e:
+        print(f"Error exporting trace: {str(e)}")
+
+
+def waterfall(records):
+    """
+    Rows for a waterfall view of a trace's span records: depth-first, with
+    repeated sibling spans of the same name (e.g. chunking every page)
+    merged into one row spanning them, with summed durations ("busy_ms")
+    and counters.
+    """
+    children = {}
+    for record in records:
+        children.setdefault(record["parent_id"], []).append(record)
+
+    rows = []
+
+    def visit(parent_ids, depth):
+        groups = {}
+        for parent_id in parent_ids:
+            for record in children.get(parent_id, []):
+                groups.setdefault(record["name"], []).append(record)
+        for name, group in groups.items():
+            start = min(record["start_ms"] for record in group)
+            end = max(record["start_ms"] + record["duration_ms"] for record in group)
+            counters = {}
+            for record in group:
+                for key, value in record["counters"].items():
+                    counters[key] = counters.get(key, 0) + value
+            rows.append({
+                "name": name, "depth": depth, "calls": len(group), "start_ms": start,
+                "end_ms": end, "busy_ms": sum(record["duration_ms"] for record in group),
+                "counters": counters, "attributes": group[0]["attributes"] if len(group) == 1 else {},
+            })
+            # Children of merged siblings are merged in turn
+            visit([record["span_id"] for record in group], depth + 1)
+
+    visit([None], 0)
+    return rows
@@ -3,23 +3,31 @@ import json
 import datetime
 from PIL import Image
 from streamlit_lottie import st_lottie
-from backend.document_parser import parse_file
-from backend.ocr_engine import ocr_image
-from backend.semantic_search import add_to_index, search, clear_index
-from backend.qa_engine import answer_question
+from backend.chunker import chunk_text
+from backend.qa_engine import stream_answer, split_answer
+from backend.llm_backends import load_llm_backend
+from backend.semantic_search import get_model, get_embedding_service, embed_query
+from backend.lexical_index import is_keyword_query
+from backend.answer_cache import answer_cache
+from backend.resources import warm_up
+from backend.tracing import Trace, TRACE_ENABLED, export_trace, waterfall
 from backend.context_manager import (
     save_user_data,
     load_user_data,
-    migrate_chat_history,
+    ensure_chat_loaded,
     update_chat_context,
-    get_contextual_results
+    get_contextual_results,
+    get_chat_index,
+    delete_chat_index,
+    IncrementalIndexer
 )
-import pandas as pd
-import contextlib
-import io
-import re
+import plotly.io as pio
 import plotly.graph_objects as go
-from backend.link_crawler import extract_text_from_url
+from contextlib import nullcontext
+from backend.link_crawler import crawl_urls
+from backend.ingestion import ingest_uploads, cached_embeddings, cache_embeddings
+from backend.table_loader import resolve_table
+from backend.code_executor import decode_table, get_code_executor, start_code_executor
 
 # --------- CONFIG ---------
 st.set_page_config(
@@ -33,11 +41,6 @@ def load_lottiefile(filepath: str):
     with open(filepath, "r") as f:
         return json.load(f)
 
-def extract_links(text):
-    # Basic regex to find URLs
-    url_pattern = r'https?://[^\s]+'
-    return re.findall(url_pattern, text)
-
 logo = Image.open("app/assets/mando.png")
 rocket_lottie = load_lottiefile("app/assets/animation.json")
 
@@ -67,9 +70,8 @@ def show_home():
             user_data = load_user_data(st.session_state.user_email)
             
             st.session_state.user_name = name.strip()
-            st.session_state.chat_history = migrate_chat_history(
-                user_data.get("chat_history", {})
-            )
+            # Only chat titles are loaded here; a chat's content is read when it is opened
+            st.session_state.chat_history = user_data.get("chat_history", {})
             
             if not st.session_state.chat_history:
                 new_id = f"chat_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}"
@@ -89,6 +91,9 @@ def show_home():
         else:
             st.warning("⚠️ Please enter both name and email.")
 
+    # Loading the embedding model, the LLM client and the code workers while the user fills in the form
+    warm_up(get_model, load_llm_backend, start_code_executor)
+
 # --------- SIDEBAR ---------
 def show_sidebar():
     st.sidebar.title(f" Hey, {st.session_state.user_name}")
@@ -101,7 +106,6 @@ def show_sidebar():
             "context": {"text_chunks": [], "sources": []}
         }
         st.session_state.current_chat_id = new_id
-        clear_index()
 
     for cid, chat in st.session_state.chat_history.items():
         title = chat.get("title", "New Chat")
@@ -128,6 +132,7 @@ def show_sidebar():
     if st.sidebar.button("🗑 Delete Current Chat"):
         if st.session_state.current_chat_id:
             del st.session_state.chat_history[st.session_state.current_chat_id]
+            delete_chat_index(st.session_state.user_email, st.session_state.current_chat_id)
             if st.session_state.chat_history:
                 st.session_state.current_chat_id = next(
                     iter(st.session_state.chat_history), 
@@ -135,15 +140,101 @@ def show_sidebar():
                 )
             else:
                 st.session_state.current_chat_id = None
-            clear_index()
+            save_user_data(
+                st.session_state.user_email,
+                st.session_state.user_name,
+                st.session_state.chat_history
+            )
+
+    cache_stats = answer_cache.stats()
+    if cache_stats["hits"] or cache_stats["misses"]:
+        st.sidebar.caption(
+            f"Answer cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+            f"({cache_stats['hit_rate']:.0%})"
+        )
+    if get_embedding_service.is_loaded():
+        embed_stats = get_embedding_service().metrics()
+        if embed_stats["batches"]:
+            st.sidebar.caption(
+                f"Embeddings: {embed_stats['batches']} batches of {embed_stats['mean_batch']:.1f} texts on average, "
+                f"{embed_stats['queue_depth']} queued (peak {embed_stats['peak_queue_depth']}), "
+                f"{embed_stats['cache_hit_rate']:.0%} reused"
+            )
+
+    st.sidebar.checkbox("⏱ Performance panel", key="show_performance", help="Time each stage of your next questions")
+    return st.sidebar.empty()
+
+
+def show_performance_panel(slot):
+    """Waterfall of the stages of the last traced turn, drawn into a sidebar placeholder"""
+    records = st.session_state.get("last_trace")
+    if not st.session_state.get("show_performance") or not records:
+        return
+    rows = waterfall(records)
+    labels = [
+        "· " * row["depth"] + row["name"] + (f" ×{row['calls']}" if row["calls"] > 1 else "")
+        for row in rows
+    ]
+    details = [
+        f"{row['busy_ms']:.0f} ms" + "".join(f", {key} {value}" for key, value in row["counters"].items())
+        for row in rows
+    ]
+    figure = go.Figure(go.Bar(
+        y=list(range(len(rows))),
+        x=[row["end_ms"] - row["start_ms"] for row in rows],
+        base=[row["start_ms"] for row in rows],
+        orientation="h",
+        hovertext=[f"{label}: {detail}" for label, detail in zip(labels, details)],
+        hoverinfo="text",
+    ))
+    figure.update_yaxes(tickvals=list(range(len(rows))), ticktext=labels, autorange="reversed")
+    figure.update_layout(height=60 + 22 * len(rows), margin=dict(l=0, r=0, t=0, b=0), xaxis_title="ms")
+
+    with slot.container():
+        with st.expander(f"⏱ Last turn: {rows[0]['end_ms'] / 1000:.2f}s", expanded=True):
+            st.plotly_chart(figure, use_container_width=True, key="performance_waterfall")
+            for label, detail in zip(labels, details):
+                st.caption(f"{label}: {detail}")
+
+
+def run_code_block(code, named_dfs, block_idx):
+    """Running one generated code block in the sandboxed executor and showing its output and figures"""
+    # Passing the DataFrames in, waiting for any still loading in the background
+    tables = {df_name: resolve_table(df) for df_name, (df, filename) in named_dfs.items()}
+    result = get_code_executor().run(code, tables)
+
+    for output in result["outputs"]:
+        if output["kind"] == "table":
+            table = decode_table(output)
+            st.dataframe(table, use_container_width=True)
+            if output["rows"] > len(table):
+                st.caption(f"Showing the first {len(table):,} of {output['rows']:,} rows")
+        elif output["kind"] == "markdown":
+            st.markdown(output["value"])
+        elif output["value"].strip():
+            st.text(output["value"])
+    if result["error"]:
+        st.error(f"Error in code execution: {result['error']}")
+
+    # Show any figures
+    for idx, figure_json in enumerate(result["figures"]):
+        st.plotly_chart(pio.from_json(figure_json), use_container_width=True, key=f"plot_{block_idx}_{idx}")
+
 # --------- QA PAGE ---------
 def show_qa_page():
-    show_sidebar()
+    performance_slot = show_sidebar()
     st.image(logo, width=120)
     st.title("📚 Mando AI Document Q&A Assistant")
     
     chat_container = st.container()
     
+    # Loading the opened chat's messages and context on first access
+    ensure_chat_loaded(
+        st.session_state.user_email,
+        st.session_state.current_chat_id,
+        st.session_state.chat_history
+    )
+
     # Get or create current chat
     current_chat = st.session_state.chat_history.setdefault(
         st.session_state.current_chat_id,
@@ -158,13 +249,12 @@ def show_qa_page():
     )
     messages = current_chat.get("messages", [])
 
-    # Re-index when switching chats
-    if st.session_state.get('last_indexed_chat_id') != st.session_state.current_chat_id:
-        clear_index()
-        context_chunks = current_chat.get("context", {}).get("text_chunks", [])
-        if context_chunks:
-            add_to_index(context_chunks)
-        st.session_state.last_indexed_chat_id = st.session_state.current_chat_id
+    # Fetching this chat's index from the shared LRU, loading the persisted one on a miss
+    chat_index = get_chat_index(
+        st.session_state.user_email,
+        st.session_state.current_chat_id,
+        st.session_state.chat_history
+    )
 
     # Display chat history
     with chat_container:
@@ -188,187 +278,193 @@ def show_qa_page():
         submitted = st.form_submit_button("Send")
 
     if submitted and question.strip():
-        new_text_chunks = []
-        new_sources = []
+        # Timing every stage of this turn for the performance panel and the JSONL export
+        trace = Trace("turn", chat=st.session_state.current_chat_id) if (
+            TRACE_ENABLED or st.session_state.get("show_performance")
+        ) else None
+        with trace or nullcontext():
+            new_text_chunks = []
+            new_sources = []
         
-             # Set chat title from first question
-        if len(current_chat["messages"]) == 0:
-            clean_question = ' '.join(question.strip().split())
-            shortened_title = (clean_question[:50] + "...") if len(clean_question) > 50 else clean_question
-            current_chat["title"] = shortened_title or "Untitled Chat"
+                 # Set chat title from first question
+            if len(current_chat["messages"]) == 0:
+                clean_question = ' '.join(question.strip().split())
+                shortened_title = (clean_question[:50] + "...") if len(clean_question) > 50 else clean_question
+                current_chat["title"] = shortened_title or "Untitled Chat"
             
-            # Immediately save after setting title
-            save_user_data(
-                st.session_state.user_email,
-                st.session_state.user_name,
-                st.session_state.chat_history
-            )
+                # Immediately save after setting title
+                save_user_data(
+                    st.session_state.user_email,
+                    st.session_state.user_name,
+                    st.session_state.chat_history
+                )
         
-        def get_df_sample_with_columns(df, filename, max_rows=5):
-            sample = df.head(max_rows).to_markdown(index=False)  # For a readable format
-            return f"Sample from '{filename}':\n{sample}\n"
-        named_dfs = {}  # key: df name (e.g., df1), value: (df, filename)
-        df_samples_text = "" 
-        if uploaded_files:
-            with st.spinner("Processing documents..."):
+            named_dfs = {}  # key: df name (e.g., df1), value: (df, filename)
+            if uploaded_files:
+                # Ingesting every file concurrently with one progress bar per file
+                progress_bars = [st.progress(0.0, text=f"Waiting: {file.name}") for file in uploaded_files]
+                # Indexing PDF pages as they are parsed, so memory stays bounded and early pages are searchable
+                page_indexer = IncrementalIndexer(
+                    st.session_state.current_chat_id,
+                    st.session_state.chat_history,
+                    email=st.session_state.user_email,
+                    index=chat_index
+                )
+                streamed = set()  # Files whose chunks were indexed page by page
+
+                def show_progress(event):
+                    bar = progress_bars[event["index"]]
+                    if event.get("chunks") is not None:
+                        streamed.add(event["index"])
+                        page_indexer.add(event["chunks"])
+                    if event["status"] == "running":
+                        bar.progress(0.0, text=f"Reading {event['name']}...")
+                    elif event["status"] == "page":
+                        bar.progress(
+                            event["page"] / event["page_count"],
+                            text=f"Read page {event['page']}/{event['page_count']} of {event['name']}"
+                        )
+                    elif event["status"] == "done":
+                        bar.progress(1.0, text=f"{'Reused' if event['cached'] else 'Processed'} {event['name']}")
+                    else:
+                        bar.progress(1.0, text=f"Failed: {event['name']}")
+
+                results = ingest_uploads(uploaded_files, on_progress=show_progress)
+                page_indexer.close()
+                for bar in progress_bars:
+                    bar.empty()
+
+                # Merging results in upload order so chunk order does not depend on which file finished first;
+                # PDF pages parsed afresh are already in the chat, in the order they were read
                 structured_dfs = []  # Store structured DataFrames
-                for file in uploaded_files:
-                    ext = file.name.split('.')[-1].lower()
-                    try:
-                        if ext in ["png", "jpg", "jpeg"]:
-                            text = ocr_image(file)
-                            links = extract_links(text)
-                            for link in links:
-                                link_content = extract_text_from_url(link)
-                                if link_content.strip():
-                                    link_chunks = [(link_content[i:i+500], f"Link: {link}") for i in range(0, len(link_content), 500)]
-                                    new_text_chunks.extend(link_chunks)
-                                    new_sources.append(link)
-                            chunks = [(text[i:i+500], file.name) for i in range(0, len(text), 500)]
-                            new_text_chunks.extend(chunks)
-                            new_sources.append(file.name)
-
-                        elif ext in ["pdf", "txt"]:
-                            text = parse_file(file, ext)
-                            links = extract_links(text)
-                            for link in links:
-                                link_content = extract_text_from_url(link)
-                                if link_content.strip():
-                                    link_chunks = [(link_content[i:i+500], f"Link: {link}") for i in range(0, len(link_content), 500)]
-                                    new_text_chunks.extend(link_chunks)
-                                    new_sources.append(link)
-                            chunks = [(text[i:i+500], file.name) for i in range(0, len(text), 500)]
-                            new_text_chunks.extend(chunks)
-                            new_sources.append(file.name)
-
-                        elif ext in ["csv", "xlsx", "json"]:
-                            df = parse_file(file, ext)
-                            if isinstance(df, pd.DataFrame):
-                                structured_dfs.append((df, file.name))
-                            else:
-                                st.error(f"Failed to load {file.name}: {df}")
-
-                        elif ext == "pptx":
-                            result = parse_file(file,ext)  # returns dict with "text" and "images"
-                            if isinstance(result, dict):
-                                # Process text
-                                text = result["text"]
-                                links = extract_links(text)
-                                for link in links:
-                                    link_content = extract_text_from_url(link)
-                                    if link_content.strip():
-                                        link_chunks = [(link_content[i:i+500], f"Link: {link}") for i in range(0, len(link_content), 500)]
-                                        new_text_chunks.extend(link_chunks)
-                                        new_sources.append(link)
-                                chunks = [(text[i:i+500], file.name) for i in range(0, len(text), 500)]
-                                new_text_chunks.extend(chunks)
-
-                                # Optionally OCR each extracted image
-                                for image_path in result["images"]:
-                                    image_text = ocr_image(image_path)
-                                    img_chunks = [(image_text[i:i+500], f"{file.name} (image)") for i in range(0, len(image_text), 500)]
-                                    new_text_chunks.extend(img_chunks)
-
-                                new_sources.append(file.name)
-                            else:
-                                st.error(f"Failed to process {file.name}: {result}")
-                    except Exception as e:
-                        st.error(f"Error processing {file.name}: {e}")
-
-
-                    except Exception as e:
-                        st.error(f"Error processing {file.name}: {str(e)}")
-                        continue
+                found_links = []  # Links from every uploaded file, crawled together below
+                for file_index, result in enumerate(results):
+                    if result["error"]:
+                        st.error(result["error"])
+                    if file_index not in streamed:
+                        new_text_chunks.extend(result["chunks"])
+                    new_sources.extend(result["sources"])
+                    found_links.extend(result["links"])
+                    structured_dfs.extend(result["dataframes"])
+
+                with st.spinner("Reading linked pages..."):
+                    # Crawling all links of this upload concurrently, deduplicated and within one budget
+                    for link, link_content in crawl_urls(found_links).items():
+                        if link_content.strip():
+                            link_chunks = chunk_text(link_content, f"Link: {link}")
+                            new_text_chunks.extend(link_chunks)
+                            new_sources.append(link)
 
                 named_dfs = {}  # key: df name (e.g., df1), value: (df, filename)
-                df_samples_text = ""
-
-                if structured_dfs:
-                    for i, (df, filename) in enumerate(structured_dfs):
-                        df_name = f"df{i+1}"
-                        named_dfs[df_name] = (df, filename)
-
-                        # Create sample preview
-                        sample = df.head(5).to_markdown()
-                        columns = list(df.columns)
-                        df_samples_text += f"Dataset `{df_name}` from file '{filename}':\nColumns: {columns}\nSample rows:\n{sample}\n\n"
-
-
-
-                if new_text_chunks:
-                    st.session_state.chat_history = update_chat_context(
-                        st.session_state.current_chat_id,
-                        new_text_chunks,
-                        new_sources,
-                        st.session_state.chat_history
-                    )
-                    add_to_index(new_text_chunks)
-     
-
-        context_results = get_contextual_results(
-            st.session_state.current_chat_id,
-            question,
-            st.session_state.chat_history
-        )
-
-        combined_text_chunks = [(df_samples_text, "structured_dfs_summary")] + context_results
-        
-
-        with st.spinner("Analyzing your question..."):
-            try:
-                answer = answer_question(question, combined_text_chunks, named_dfs=named_dfs)
-
-                code_blocks = re.findall(r"```(?:python)?\s*([\s\S]*?)```", answer)
-
-                for code in code_blocks:
-                    local_vars = {}
-                    exec_globals = globals().copy()
-
-                    # Inject dataframes
-                    for df_name, (df, filename) in named_dfs.items():
-                        exec_globals[df_name] = df
-
-                    # ✅ Replace print() with st.write() before running the whole block
-                    code = code.replace("print(", "st.write(")
 
-                    code = code.replace("fig.show()", "")
-
-                    buffer = io.StringIO()
-                    with contextlib.redirect_stdout(buffer):
-                        try:
-                            exec(code, exec_globals, local_vars)
-                        except Exception as e:
-                            st.error(f"Error in code execution: {e}")
-
-                    # Show any figures
-                    for idx, var in enumerate(local_vars.values()):
-                        if isinstance(var, go.Figure):
-                            st.plotly_chart(var, use_container_width=True, key=f"plot_{idx}")
+                # Profiles of these DataFrames (computed at load) are fitted into the prompt budget by stream_answer
+                for i, (df, filename) in enumerate(structured_dfs):
+                    named_dfs[f"df{i+1}"] = (df, filename)
+
+                if new_text_chunks or new_sources:
+                    # Embedding every new chunk of this upload in a single batch, reusing cached vectors
+                    with st.spinner("Indexing documents..."):
+                        st.session_state.chat_history = update_chat_context(
+                            st.session_state.current_chat_id,
+                            new_text_chunks,
+                            new_sources,
+                            st.session_state.chat_history,
+                            email=st.session_state.user_email,
+                            index=chat_index,
+                            embeddings=cached_embeddings(results)
+                        )
+                        cache_embeddings(results, chat_index.store)
+
+            # Embedding the question once for both retrieval and the answer cache; a lookup of a part
+            # number or code is answered from BM25 without it unless semantic answer matching is on
+            question_embedding = None
+            if answer_cache.similarity_threshold is not None or not is_keyword_query(question):
+                question_embedding = embed_query(question)
+            context_results = get_contextual_results(
+                st.session_state.current_chat_id,
+                question,
+                st.session_state.chat_history,
+                email=st.session_state.user_email,
+                index=chat_index,
+                query_embedding=question_embedding
+            )
+            cached_answer = answer_cache.get(
+                question, context_results, named_dfs, question_embedding=question_embedding
+            )
 
-                # Show final answer (without code block, clean if needed)
-                cleaned_answer = re.sub(r"```(?:python)?\s*([\s\S]*?)```", "", answer).strip()
-                if cleaned_answer:
-                    st.markdown(cleaned_answer)
 
-            except Exception as e:
-                st.error(f"Sorry, I encountered an error: {str(e)}")
+            with chat_container:
+                with st.chat_message("user"):
+                    st.markdown(question)
 
+                with st.chat_message("assistant"):
+                    answer_placeholder = st.empty()
+                    context_report = {}
+                    cleaned_answer = ""
+                    try:
+                        if cached_answer is not None:
+                            answer = cached_answer
+                            cleaned_answer, code_blocks = split_answer(answer)
+                            answer_placeholder.markdown(cleaned_answer)
+                            for block_idx, code in enumerate(code_blocks):
+                                run_code_block(code, named_dfs, block_idx)
+                        else:
+                            answer_placeholder.markdown("_Analyzing your question..._")
+                            # Rendering the answer as it streams in and running each code block once it is closed
+                            answer = ""
+                            executed = 0
+                            for piece in stream_answer(
+                                question, context_results, named_dfs=named_dfs, report=context_report,
+                                user=st.session_state.user_email
+                            ):
+                                answer += piece
+                                cleaned_answer, code_blocks = split_answer(answer)
+                                answer_placeholder.markdown(cleaned_answer + " ▌")
+                                for code in code_blocks[executed:]:
+                                    run_code_block(code, named_dfs, executed)
+                                    executed += 1
+                            answer = answer.strip()
+                            answer_placeholder.markdown(cleaned_answer)
+
+                            # Not caching API failures so the question is retried next time
+                            if answer and "⚠️" not in answer:
+                                answer_cache.put(
+                                    question, context_results, answer, named_dfs, question_embedding=question_embedding
+                                )
+
+                        if cached_answer is not None:
+                            st.caption("⚡ Answered from cache")
+                        if context_report:
+                            st.caption(
+                                f"Context: {context_report['text_tokens']} text + "
+                                f"{context_report['dataframe_tokens']} data tokens from "
+                                f"{context_report['chunks_used']} chunks "
+                                f"({context_report['duplicates']} duplicates skipped)"
+                            )
 
+                    except Exception as e:
+                        st.error(f"Sorry, I encountered an error: {str(e)}")
 
-        # Update chat history
-        current_chat.setdefault("messages", []).extend([
-            {"role": "user", "content": question, "sources": new_sources},
-            {"role": "assistant", "content": cleaned_answer, "sources": new_sources}
-        ])
+            # Update chat history
+            current_chat.setdefault("messages", []).extend([
+                {"role": "user", "content": question, "sources": new_sources},
+                {"role": "assistant", "content": cleaned_answer, "sources": new_sources}
+            ])
         
-        save_user_data(
-            st.session_state.user_email,
-            st.session_state.user_name,
-            st.session_state.chat_history
-        )
+            save_user_data(
+                st.session_state.user_email,
+                st.session_state.user_name,
+                st.session_state.chat_history
+            )
+        if trace is not None:
+            export_trace(trace)
+            st.session_state.last_trace = trace.records()
         if st.button("Ask another question"):
             st.rerun()
 
+    # Drawn last so a turn that just finished shows its own waterfall
+    show_performance_panel(performance_slot)
+
 
 if "page" not in st.session_state:
     st.session_state.page = "home"
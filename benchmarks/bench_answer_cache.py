@@ -0,0 +1,66 @@
+"""
+Hit rate and latency of the answer cache on a stream of repeated questions.
+
+A workload of --questions questions is drawn from a small pool of distinct
+questions, each asked with a few wording variants (case, whitespace,
+punctuation). The LLM is modelled as a fixed per-call latency; cache hits
+cost only the SQLite lookup. Matching by question embedding is off, as in
+the app, unless --semantic-threshold is given.
+
+Usage:
+    python benchmarks/bench_answer_cache.py [--questions 500] [--distinct 50] [--llm-ms 1500] [--semantic-threshold 0.95]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from common import install_encoder, make_chunks
+from backend.answer_cache import AnswerCache
+from backend.semantic_search import embed_query
+
+
+def variants(question):
+    return [question, question.lower(), f"  {question}  ", question.rstrip("?") + " ?", question.upper()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=500)
+    parser.add_argument("--distinct", type=int, default=50)
+    parser.add_argument("--llm-ms", type=float, default=1500.0)
+    parser.add_argument("--semantic-threshold", type=float, default=None)
+    parser.add_argument("--real-model", action="store_true", help="embed questions with the real SentenceTransformer")
+    args = parser.parse_args()
+
+    install_encoder(args.real_model)
+    rng = np.random.default_rng(0)
+    chunks = make_chunks(5)
+    pool = [f"What is the total for item {i}?" for i in range(args.distinct)]
+    workload = [rng.choice(variants(pool[rng.integers(len(pool))])) for _ in range(args.questions)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = AnswerCache(path=os.path.join(tmp, "answers.db"), similarity_threshold=args.semantic_threshold)
+        lookup_seconds = 0.0
+        for question in workload:
+            embedding = embed_query(question)
+            start = time.perf_counter()
+            answer = cache.get(question, chunks, question_embedding=embedding)
+            lookup_seconds += time.perf_counter() - start
+            if answer is None:
+                cache.put(question, chunks, f"answer to {question}", question_embedding=embedding)
+        stats = cache.stats()
+
+    before = args.questions * args.llm_ms / 1000
+    after = stats["misses"] * args.llm_ms / 1000 + lookup_seconds
+    print(f"questions: {args.questions} ({args.distinct} distinct, 5 wordings each)")
+    print(f"hits: {stats['hits']} ({stats['semantic_hits']} by embedding)  misses: {stats['misses']}  "
+          f"hit rate: {stats['hit_rate']:.1%}")
+    print(f"mean lookup: {lookup_seconds / args.questions * 1000:.2f} ms")
+    print(f"simulated total latency: {before:.1f}s without cache -> {after:.1f}s with cache")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Cost of saving one new message for a heavy user, and of logging in: the old
+single <email>.json (full rewrite, full json.load + migrate_chat_history)
+versus the split, append-only chat store with lazily loaded chats.
+
+Usage:
+    python benchmarks/bench_chat_store.py [--chats 100] [--context-mb 50]
+"""
+import argparse
+import datetime
+import json
+import os
+import tempfile
+import time
+
+from common import APP_DIR  # noqa: F401  (puts app/ on sys.path)
+from backend import context_manager
+
+
+def make_history(chats, context_mb):
+    chunk_text = "x" * 1000
+    chunks_per_chat = max(1, context_mb * 1024 * 1024 // (1000 * chats))
+    return {
+        f"chat_2025010100{i:04d}": {
+            "title": f"Chat {i}",
+            "messages": [{"role": "user", "content": f"question {j}", "sources": []} for j in range(20)],
+            "context": {
+                "text_chunks": [[chunk_text, f"doc{i}.pdf"] for _ in range(chunks_per_chat)],
+                "sources": [f"doc{i}.pdf"]
+            }
+        }
+        for i in range(chats)
+    }
+
+
+def old_save(path, email, name, chat_history):
+    data = {
+        "version": "1.2",
+        "name": name,
+        "email": email,
+        "chat_history": chat_history,
+        "last_updated": str(datetime.datetime.now())
+    }
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chats", type=int, default=100)
+    parser.add_argument("--context-mb", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=5)
+    args = parser.parse_args()
+
+    history = make_history(args.chats, args.context_mb)
+    email = "bench@example.com"
+    with tempfile.TemporaryDirectory() as tmp:
+        context_manager.DATA_DIR = tmp
+        context_manager.save_user_data(email, "Bench", history)
+        chat = history[next(iter(history))]
+
+        old_times, new_times = [], []
+        for turn in range(args.turns):
+            chat["messages"].append({"role": "user", "content": f"turn {turn}", "sources": []})
+            start = time.perf_counter()
+            old_save(os.path.join(tmp, "legacy.json"), email, "Bench", history)
+            old_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            context_manager.save_user_data(email, "Bench", history)
+            new_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        with open(os.path.join(tmp, "legacy.json"), "r") as f:
+            context_manager.migrate_chat_history(json.load(f)["chat_history"])
+        old_login = time.perf_counter() - start
+
+        start = time.perf_counter()
+        context_manager.load_user_data(email)
+        new_login = time.perf_counter() - start
+
+    old_ms = 1000 * sum(old_times) / len(old_times)
+    new_ms = 1000 * sum(new_times) / len(new_times)
+    print(f"chats={args.chats} context={args.context_mb}MB")
+    print(f"full rewrite:  {old_ms:9.2f} ms per save")
+    print(f"split store:   {new_ms:9.2f} ms per save  ({old_ms / new_ms:.0f}x)")
+    print(f"login, full file:   {old_login * 1000:9.2f} ms")
+    print(f"login, chat list:   {new_login * 1000:9.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
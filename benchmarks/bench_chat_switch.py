@@ -0,0 +1,49 @@
+"""
+Latency of switching to a chat, before and after persisted per-chat indexes.
+
+"re-embed" is the old clear_index() + add_to_index(all chunks) path; "cold"
+loads the persisted index from disk (memory-mapped above the size
+threshold); "warm" is an LRU hit in the shared index cache.
+
+Usage:
+    python benchmarks/bench_chat_switch.py [--sizes 1000 10000 100000] [--real-model]
+"""
+import argparse
+import tempfile
+
+from common import install_encoder, make_chunks, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--real-model", action="store_true")
+    args = parser.parse_args()
+
+    model = install_encoder(args.real_model)
+    from backend import context_manager
+    from backend.semantic_search import index_cache
+
+    print(f"{'chunks':>8} {'re-embed (ms)':>14} {'cold (ms)':>10} {'warm (ms)':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        context_manager.DATA_DIR = tmp
+        for n in args.sizes:
+            chunks = make_chunks(n)
+            chat_id = f"chat_bench{n}"
+            history = {chat_id: {"title": "bench", "messages": [], "context": {"text_chunks": [], "sources": []}}}
+            context_manager.update_chat_context(chat_id, chunks, [], history, email="bench")
+
+            reembed = timed(lambda: model.encode([chunk[0] for chunk in chunks]), args.repeats)
+
+            def cold():
+                index_cache.pop(("bench", chat_id))
+                context_manager.get_chat_index("bench", chat_id, history)
+
+            cold_time = timed(cold, args.repeats)
+            warm_time = timed(lambda: context_manager.get_chat_index("bench", chat_id, history), args.repeats)
+            print(f"{n:>8} {reembed * 1000:>14.1f} {cold_time * 1000:>10.1f} {warm_time * 1000:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Chunk count, chunking throughput and top-k hit rate of the structure-aware
+chunker versus the old fixed 500-character slicing.
+
+Each synthetic document hides one "fact" sentence per paragraph; a query is a
+hit when a retrieved chunk contains its fact sentence intact. Retrieval uses a
+hashed bag-of-words encoder by default (so it runs offline) or MiniLM with
+--real-model.
+
+Usage:
+    python benchmarks/bench_chunker.py [--docs 50] [--top-k 3] [--real-model]
+"""
+import argparse
+import re
+import time
+import zlib
+
+import numpy as np
+
+from common import install_encoder
+from backend.chunker import chunk_text
+
+FILLER = [
+    "The quarterly review covered supplier performance across all regions.",
+    "Maintenance intervals were aligned with the updated service manual.",
+    "Several teams reported delays caused by logistics constraints.",
+    "The committee agreed to revisit the budget in the next cycle.",
+    "Quality audits found no critical deviations this period.",
+    "Training sessions were scheduled for the new assembly line staff.",
+]
+
+
+class BagOfWordsEncoder:
+    """Hashed term-frequency vectors, a lexical stand-in for a sentence encoder"""
+
+    def __init__(self, dim=2048):
+        self.dim = dim
+
+    def encode(self, texts, **kwargs):
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for word in re.findall(r"[a-z0-9-]+", text.lower()):
+                out[i, zlib.crc32(word.encode()) % self.dim] += 1.0
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return out / norms
+
+
+def make_document(doc_id, rng, paragraphs=12):
+    facts = []
+    parts = []
+    for p in range(paragraphs):
+        sentences = list(rng.choice(FILLER, size=rng.integers(3, 7)))
+        fact = f"Component KX-{doc_id:03d}-{p:02d} has a rated torque of {rng.integers(10, 999)} newton metres."
+        sentences.insert(int(rng.integers(0, len(sentences))), fact)
+        facts.append(fact)
+        parts.append(" ".join(sentences))
+    return "\n\n".join(parts), facts
+
+
+def fixed_chunks(text, source):
+    return [(text[i:i+500], source) for i in range(0, len(text), 500)]
+
+
+def evaluate(name, chunker, docs, encoder, top_k):
+    chunker("Warm up the tokenizer.", "warmup")
+    start = time.perf_counter()
+    chunks = [chunk for i, (text, _) in enumerate(docs) for chunk in chunker(text, f"doc{i}")]
+    elapsed = time.perf_counter() - start
+
+    vectors = encoder.encode([chunk[0] for chunk in chunks])
+    hits = total = 0
+    for i, (_, facts) in enumerate(docs):
+        rows = [r for r, chunk in enumerate(chunks) if chunk[1] == f"doc{i}"]
+        queries = [re.sub(r" of \d+.*", "", fact).replace("has a rated torque", "rated torque") for fact in facts]
+        scores = encoder.encode(queries) @ vectors[rows].T
+        for fact, row_scores in zip(facts, scores):
+            best = np.argsort(-row_scores)[:top_k]
+            hits += any(fact in chunks[rows[b]][0] for b in best)
+            total += 1
+
+    chars = sum(len(text) for text, _ in docs)
+    print(
+        f"{name:<12} {len(chunks):>7} {len(chunks) / len(docs):>10.1f} "
+        f"{chars / elapsed / 1e6:>10.2f} {hits / total:>10.1%}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--real-model", action="store_true")
+    args = parser.parse_args()
+
+    encoder = install_encoder(True) if args.real_model else BagOfWordsEncoder()
+    rng = np.random.default_rng(0)
+    docs = [make_document(i, rng) for i in range(args.docs)]
+
+    print(f"{'chunker':<12} {'chunks':>7} {'per doc':>10} {'MB/s':>10} {'hit@' + str(args.top_k):>10}")
+    evaluate("fixed-500", fixed_chunks, docs, encoder, args.top_k)
+    evaluate("structured", chunk_text, docs, encoder, args.top_k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Overhead and isolation of running generated code in backend.code_executor
+versus exec() inside the server process.
+
+Measures, on a --rows row sales DataFrame:
+- a typical groupby block run in-process (the old path) and in a warm worker
+- the first call of a table (exporting it to shared memory) and later calls
+- what pickling the table for every call would cost instead
+- how long a runaway `while True` block and a memory bomb take to be
+  stopped, and the longest stall of a server-side heartbeat thread meanwhile
+
+Usage:
+    python benchmarks/bench_code_executor.py [--rows 2000000] [--repeats 10]
+"""
+import argparse
+import contextlib
+import io
+import pickle
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import common  # noqa: F401  (puts app/ on sys.path)
+from backend.code_executor import CodeExecutor
+
+BLOCK = """
+summary = df1.groupby("region", observed=True)["amount"].agg(["sum", "mean", "count"])
+print(summary)
+fig = px.bar(summary.reset_index(), x="region", y="sum", title="Sales by region")
+"""
+
+
+def make_frame(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    regions = np.array(["Seoul", "Busan", "Incheon", "Daegu", "Ulsan"])
+    return pd.DataFrame({
+        "order_id": np.arange(rows, dtype=np.uint32),
+        "region": pd.Categorical(regions[rng.integers(0, len(regions), rows)]),
+        "quantity": rng.integers(1, 50, rows).astype(np.uint8),
+        "amount": rng.random(rows) * 1000,
+    })
+
+
+def run_in_process(df):
+    import plotly.express as px
+    namespace = {"pd": pd, "np": np, "px": px, "df1": df}
+    with contextlib.redirect_stdout(io.StringIO()):
+        exec(BLOCK, namespace)
+
+
+def median_seconds(fn, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return float(np.median(samples))
+
+
+def heartbeat_stall(fn, interval=0.01):
+    """Running fn() while a thread ticks every `interval`, returning (fn seconds, fn result, longest tick gap)"""
+    gaps = []
+    stop = threading.Event()
+
+    def tick():
+        last = time.perf_counter()
+        while not stop.is_set():
+            time.sleep(interval)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+
+    thread = threading.Thread(target=tick)
+    thread.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    thread.join()
+    return elapsed, result, max(gaps) if gaps else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--repeats", type=int, default=10)
+    args = parser.parse_args()
+
+    df = make_frame(args.rows)
+    print(f"table: {args.rows} rows, {df.memory_usage(deep=True).sum() / 1e6:.0f} MB")
+
+    executor = CodeExecutor(workers=2, cpu_seconds=5, memory_mb=512, wall_seconds=15)
+    start = time.perf_counter()
+    executor.start()
+    executor.run("pass")
+    print(f"worker start (spawn + imports): {time.perf_counter() - start:.2f}s")
+
+    in_process = median_seconds(lambda: run_in_process(df), args.repeats)
+
+    start = time.perf_counter()
+    result = executor.run(BLOCK, {"df1": df})
+    first_call = time.perf_counter() - start
+    assert result["error"] is None, result["error"]
+    # Both workers map the table after one call each
+    executor.run(BLOCK, {"df1": df})
+    warm = median_seconds(lambda: executor.run(BLOCK, {"df1": df}), args.repeats)
+    empty = median_seconds(lambda: executor.run("x = len(df1)", {"df1": df}), args.repeats)
+    pickled = median_seconds(lambda: pickle.loads(pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL)), args.repeats)
+
+    print(f"{'path':<38}{'seconds':>10}")
+    print(f"{'exec() in the server process':<38}{in_process:>10.3f}")
+    print(f"{'worker, first call (exports table)':<38}{first_call:>10.3f}")
+    print(f"{'worker, warm call':<38}{warm:>10.3f}")
+    print(f"{'worker, warm call with trivial code':<38}{empty:>10.3f}")
+    print(f"{'pickle round trip of the table':<38}{pickled:>10.3f}")
+    print(f"figures returned: {len(result['figures'])}, stdout lines: {len(result['stdout'].splitlines())}")
+
+    print(f"\n{'runaway block':<24}{'stopped after s':>16}{'heartbeat gap s':>17}  error")
+    for label, code in [("while True: pass", "while True: pass"),
+                        ("memory bomb", "x = np.ones((4 * 10**9,))"),
+                        ("sleep", "import time\ntime.sleep(60)")]:
+        elapsed, result, gap = heartbeat_stall(lambda: executor.run(code, {"df1": df}))
+        print(f"{label:<24}{elapsed:>16.2f}{gap:>17.3f}  {result['error']}")
+
+    result = executor.run("print(len(df1))", {"df1": df})
+    print(f"\nnext block after the runaways: {result['stdout'].strip()} rows, error={result['error']}")
+    print(f"stats: {executor.stats}")
+    executor.close()
+
+
+if __name__ == "__main__":
+    main()
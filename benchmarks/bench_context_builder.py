@@ -0,0 +1,87 @@
+"""
+Prompt size and simulated end-to-end latency of answer_question's context,
+before (every chunk joined plus full df.head(5) markdown) and after the
+token-budgeted context builder.
+
+Documents carry a repeated page header and overlapping near-duplicate
+chunks; the DataFrame is wide (--columns). Latency uses a simple model of
+an LLM call: a fixed overhead plus a per-input-token cost.
+
+Usage:
+    python benchmarks/bench_context_builder.py [--chunks 40] [--columns 300]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from common import APP_DIR  # noqa: F401  (puts app/ on sys.path)
+from backend.chunker import count_tokens
+from backend.context_builder import build_context
+
+HEADER = "ACME Brake Systems - Confidential - Service Report 2024"
+
+
+def make_chunks(n, rng):
+    chunks = []
+    for i in range(n):
+        body = " ".join(f"Observation {i}.{j}: caliper wear measured at {rng.integers(1, 9)} mm." for j in range(12))
+        chunks.append((f"{HEADER}\nPage {i // 2 + 1}\n{body}", "report.pdf"))
+        # Retrieval frequently returns the same passage from a re-uploaded copy
+        if i % 4 == 0:
+            chunks.append((f"{HEADER}\nPage {i // 2 + 1}\n{body}", "report (1).pdf"))
+    return chunks
+
+
+def make_dataframe(rows, columns, rng):
+    data = {f"sensor_{c:03d}_reading_value": rng.normal(size=rows).round(4) for c in range(columns)}
+    data["notes"] = ["long free-text maintenance note " * 4] * rows
+    return pd.DataFrame(data)
+
+
+def old_context(chunks, named_dfs):
+    df_text = ""
+    for name, (df, filename) in named_dfs.items():
+        df_text += f"Dataset `{name}` from file '{filename}':\nColumns: {list(df.columns)}\nSample rows:\n{df.head(5).to_markdown()}\n\n"
+    df_info = "\n".join(f"- `{name}` (from file '{filename}'): columns = {list(df.columns)}" for name, (df, filename) in named_dfs.items())
+    return "\n\n".join([df_text] + [text for text, _ in chunks]) + df_info
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=40)
+    parser.add_argument("--columns", type=int, default=300)
+    parser.add_argument("--overhead-ms", type=float, default=400.0)
+    parser.add_argument("--ms-per-token", type=float, default=0.15)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    chunks = make_chunks(args.chunks, rng)
+    named_dfs = {"df1": (make_dataframe(1000, args.columns, rng), "sensors.xlsx")}
+
+    start = time.perf_counter()
+    before = count_tokens(old_context(chunks, named_dfs))
+    before_build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    text, df_text, report = build_context(chunks, named_dfs)
+    after = count_tokens(text) + count_tokens(df_text)
+    after_build = time.perf_counter() - start
+
+    def latency(tokens, build):
+        return args.overhead_ms + tokens * args.ms_per_token + build * 1000
+
+    print(f"chunks={len(chunks)} dataframe columns={args.columns}")
+    print(f"{'':<8} {'tokens':>8} {'build (ms)':>11} {'est. e2e (ms)':>14}")
+    print(f"{'before':<8} {before:>8} {before_build * 1000:>11.1f} {latency(before, before_build):>14.0f}")
+    print(f"{'after':<8} {after:>8} {after_build * 1000:>11.1f} {latency(after, after_build):>14.0f}")
+    print(
+        f"sections: text={report['text_tokens']} dataframes={report['dataframe_tokens']} "
+        f"chunks used={report['chunks_used']} duplicates={report['duplicates']} "
+        f"dropped={report['chunks_dropped']} truncated={report['truncated']}"
+    )
+
+
+if __name__ == "__main__":
+    main()
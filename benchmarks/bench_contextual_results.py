@@ -0,0 +1,70 @@
+"""
+Per-question latency of get_contextual_results, before and after persisting
+chunk embeddings.
+
+"before" re-encodes every chunk of the chat for each question (the old
+behaviour); "after" goes through get_chat_index and only encodes the query;
+"in memory" passes an already fetched ChatIndex as the app does.
+
+Usage:
+    python benchmarks/bench_contextual_results.py [--sizes 1000 10000 100000] [--real-model]
+
+By default a deterministic hash-based encoder stands in for MiniLM so the
+benchmark runs without downloading the model; pass --real-model to use
+SentenceTransformer('all-MiniLM-L6-v2').
+"""
+import argparse
+import tempfile
+
+import numpy as np
+
+from common import install_encoder, make_chunks, timed
+
+
+def old_contextual_results(model, query, text_chunks, top_k=5):
+    embeddings = model.encode([chunk[0] for chunk in text_chunks])
+    query_embedding = model.encode([query])
+    scores = np.dot(embeddings, query_embedding[0])
+    top_indices = scores.argsort()[-top_k:][::-1]
+    return [text_chunks[i] for i in top_indices]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--real-model", action="store_true")
+    args = parser.parse_args()
+
+    model = install_encoder(args.real_model)
+    from backend import context_manager
+
+    query = "what is the total on the invoice"
+    print(f"{'chunks':>8} {'before (ms)':>12} {'after (ms)':>12} {'in memory (ms)':>15} {'speedup':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        context_manager.DATA_DIR = tmp
+        for n in args.sizes:
+            chunks = make_chunks(n)
+            chat_id = f"chat_bench{n}"
+            history = {chat_id: {"title": "bench", "messages": [], "context": {"text_chunks": [], "sources": []}}}
+            # Ingest once, which is where embeddings are now computed
+            context_manager.update_chat_context(chat_id, chunks, [], history, email="bench")
+            index = context_manager.get_chat_index("bench", chat_id, history)
+
+            before = timed(lambda: old_contextual_results(model, query, chunks), args.repeats)
+            after = timed(
+                lambda: context_manager.get_contextual_results(chat_id, query, history, email="bench"),
+                args.repeats,
+            )
+            in_memory = timed(
+                lambda: context_manager.get_contextual_results(chat_id, query, history, index=index),
+                args.repeats,
+            )
+            print(
+                f"{n:>8} {before * 1000:>12.1f} {after * 1000:>12.1f} "
+                f"{in_memory * 1000:>15.2f} {before / in_memory:>8.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
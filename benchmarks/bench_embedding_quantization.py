@@ -0,0 +1,95 @@
+"""
+Memory, load time, search latency and recall@k of ChatIndex stores in
+float32 versus float16 and int8 codes, with and without rescoring the
+shortlist against the float32 vectors.
+
+The corpus is --chunks vectors drawn around --topics centres (so that, as
+with real embeddings, many chunks are close to each other), saved once
+and then loaded as each dtype, the way a chat index comes back from disk.
+Recall@k is the share of the exact float32 top k that a variant returns.
+Resident MB counts what the store holds in memory; memory-mapped float32
+vectors stay in the page cache.
+
+Usage:
+    python benchmarks/bench_embedding_quantization.py [--chunks 1000000] [--queries 50] [--top-k 10]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from common import APP_DIR  # noqa: F401  (puts app/ on sys.path)
+from backend.embedding_store import EmbeddingStore
+from backend.semantic_search import ChatIndex, normalize
+
+
+def make_vectors(n, dim, topics, seed=0, block=100_000):
+    rng = np.random.default_rng(seed)
+    centres = normalize(rng.standard_normal((topics, dim)))
+    vectors = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, block):
+        count = min(block, n - start)
+        noise = rng.standard_normal((count, dim), dtype=np.float32) * 0.06
+        vectors[start:start + count] = normalize(centres[rng.integers(0, topics, count)] + noise)
+    return vectors
+
+
+def search_ids(index, queries, top_k, rescore):
+    if rescore or not index.store.quantized:
+        return index._search_matrix(queries, top_k)[1]
+    return index._top_k(index.store.scores(queries), top_k)[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--topics", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    vectors = make_vectors(args.chunks, args.dim, args.topics)
+    rng = np.random.default_rng(1)
+    picked = rng.choice(args.chunks, args.queries, replace=False)
+    queries = normalize(vectors[picked] + rng.standard_normal((args.queries, args.dim), dtype=np.float32) * 0.05)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "chat")
+        store = EmbeddingStore()
+        store.add([str(i) for i in range(args.chunks)], vectors)
+        store.save(path)
+        truth = ChatIndex._top_k(queries @ vectors.T, args.top_k)[1]
+        del store, vectors
+
+        print(f"{args.chunks} chunks x {args.dim} dims, {args.queries} queries\n")
+        print(f"{'variant':<22}{'resident MB':>12}{'load s':>8}{'ms/query':>10}{'recall@' + str(args.top_k):>11}")
+        variants = [("float32", False), ("float16", False), ("float16", True), ("int8", False), ("int8", True)]
+        for dtype, rescore in variants:
+            start = time.perf_counter()
+            index = ChatIndex(dtype=dtype)
+            index.store = EmbeddingStore.load(path, dtype=dtype)
+            load_seconds = time.perf_counter() - start
+            index.chunks = [None] * len(index.store)
+            # Saving the freshly quantized codes, as the app does after its first load, then timing a reload
+            if dtype != "float32":
+                index.store.save(path + f".{dtype}")
+                start = time.perf_counter()
+                index.store = EmbeddingStore.load(path + f".{dtype}")
+                load_seconds = time.perf_counter() - start
+
+            search_ids(index, queries[:2], args.top_k, rescore)
+            start = time.perf_counter()
+            found = np.concatenate([search_ids(index, queries[i:i + 1], args.top_k, rescore) for i in range(args.queries)])
+            ms = (time.perf_counter() - start) / args.queries * 1000
+            recall = np.mean([len(set(a) & set(b)) / args.top_k for a, b in zip(found, truth)])
+
+            label = dtype + (" + rescore" if rescore else "")
+            print(f"{label:<22}{index.store.nbytes / 2**20:>12.0f}{load_seconds:>8.2f}{ms:>10.1f}{recall:>11.3f}")
+            del index
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Question embedding throughput and latency under concurrent sessions: every
+session calling model.encode itself, as semantic_search used to, versus the
+shared micro-batching EmbeddingService.
+
+Each simulated user embeds --questions questions one at a time. The
+stand-in encoder does the work of a small transformer in numpy (token
+embedding lookup, a feed-forward block over every token, mean pooling) plus
+a fixed per-call cost for tokenizer and framework overhead, which is what
+batching amortizes. Pass --real-model to use all-MiniLM-L6-v2 when
+sentence-transformers is installed.
+
+Usage:
+    python benchmarks/bench_embedding_service.py [--users 20] [--questions 25] [--real-model]
+"""
+import argparse
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from common import install_encoder
+from backend.embedding_service import EmbeddingService
+
+WORDS = ["brake", "pad", "wear", "torque", "limit", "caliper", "report", "invoice", "total", "march",
+         "sensor", "module", "replace", "interval", "service", "warranty", "engine", "mileage"]
+
+
+class NumpyMiniEncoder:
+    """A MiniLM-sized stand-in: 384-wide token embeddings through one 384x1536x384 feed-forward block"""
+
+    def __init__(self, dim=384, hidden=1536, vocab=30522, call_overhead_ms=2.0):
+        rng = np.random.default_rng(0)
+        self.embeddings = rng.standard_normal((vocab, dim)).astype(np.float32)
+        self.w1 = (rng.standard_normal((dim, hidden)) / np.sqrt(dim)).astype(np.float32)
+        self.w2 = (rng.standard_normal((hidden, dim)) / np.sqrt(hidden)).astype(np.float32)
+        self.vocab = vocab
+        self.call_overhead = call_overhead_ms / 1000
+
+    def encode(self, texts, convert_to_numpy=True, **kwargs):
+        # Python-side per-call work (tokenizer setup, tensor conversion), holding the GIL
+        deadline = time.perf_counter() + self.call_overhead
+        while time.perf_counter() < deadline:
+            pass
+        ids = [[zlib.crc32(word.encode()) % self.vocab for word in text.split()] for text in texts]
+        width = max(len(row) for row in ids)
+        padded = np.zeros((len(texts), width), dtype=np.int64)
+        mask = np.zeros((len(texts), width, 1), dtype=np.float32)
+        for i, row in enumerate(ids):
+            padded[i, :len(row)] = row
+            mask[i, :len(row)] = 1
+        tokens = self.embeddings[padded]
+        hidden = np.maximum(tokens @ self.w1, 0) @ self.w2 + tokens
+        return (hidden * mask).sum(axis=1) / mask.sum(axis=1)
+
+
+def make_questions(users, per_user, repeat_share, seed=0):
+    rng = np.random.default_rng(seed)
+    common_questions = [" ".join(rng.choice(WORDS, size=12)) + "?" for _ in range(10)]
+    return [
+        [
+            common_questions[rng.integers(len(common_questions))] if rng.random() < repeat_share
+            else f"user {u} question {q}: " + " ".join(rng.choice(WORDS, size=int(rng.integers(8, 24))))
+            for q in range(per_user)
+        ]
+        for u in range(users)
+    ]
+
+
+def run_users(embed, questions):
+    latencies = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(len(questions))
+
+    def user(texts):
+        barrier.wait()
+        for text in texts:
+            start = time.perf_counter()
+            embed(text)
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=user, args=(texts,)) for texts in questions]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+    latencies = np.array(latencies) * 1000
+    return len(latencies) / seconds, np.percentile(latencies, 50), np.percentile(latencies, 95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--questions", type=int, default=25, help="questions per user")
+    parser.add_argument("--repeat-share", type=float, default=0.3, help="share of questions asked by several users")
+    parser.add_argument("--call-overhead-ms", type=float, default=2.0)
+    parser.add_argument("--real-model", action="store_true")
+    args = parser.parse_args()
+
+    model = install_encoder(True) if args.real_model else NumpyMiniEncoder(call_overhead_ms=args.call_overhead_ms)
+    model.encode(["warm up"])
+    unique = make_questions(args.users, args.questions, 0.0)
+    repeated = make_questions(args.users, args.questions, args.repeat_share, seed=1)
+
+    print(f"{args.users} users x {args.questions} questions\n")
+    print(f"{'path':<28}{'questions':>10}{'per s':>9}{'p50 ms':>9}{'p95 ms':>9}{'mean batch':>12}")
+    rows = [
+        ("per-call encode", unique, None),
+        ("service, no cache", unique, 0),
+        ("per-call encode", repeated, None),
+        ("service with cache", repeated, 10000),
+    ]
+    for label, questions, cache_entries in rows:
+        kind = "unique" if questions is unique else f"{args.repeat_share:.0%} rep."
+        if cache_entries is None:
+            per_second, p50, p95 = run_users(lambda text: model.encode([text], convert_to_numpy=True), questions)
+            batch = "1.0"
+        else:
+            service = EmbeddingService(lambda: model, cache_entries=cache_entries)
+            per_second, p50, p95 = run_users(lambda text: service.encode([text]), questions)
+            metrics = service.metrics()
+            batch = f"{metrics['mean_batch']:.1f}"
+            if cache_entries:
+                label += f" ({metrics['cache_hit_rate']:.0%} hits)"
+        print(f"{label:<28}{kind:>10}{per_second:>9.0f}{p50:>9.1f}{p95:>9.1f}{batch:>12}")
+
+
+if __name__ == "__main__":
+    main()
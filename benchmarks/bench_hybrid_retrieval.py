@@ -0,0 +1,152 @@
+"""
+Recall and latency of dense-only retrieval versus BM25 and hybrid
+(weighted score fusion) retrieval in ChatIndex, on a synthetic corpus of
+maintenance notes that each mention a part number.
+
+The stand-in encoder behaves like a sentence embedding in the ways that
+matter here: synonyms ("wear" / "abrasion") land close together, while part
+numbers and other codes carry almost no signal. Three query sets:
+- keyword:    just a part number, e.g. "BP-2041-K"
+- question:   a sentence mentioning the part number
+- paraphrase: the note's topic in synonyms, no part number
+
+Recall@k is the share of queries whose source note is among the k chunks
+returned.
+
+Usage:
+    python benchmarks/bench_hybrid_retrieval.py [--chunks 20000] [--queries 300] [--top-k 5]
+"""
+import argparse
+import hashlib
+import re
+import time
+
+import numpy as np
+
+import common  # noqa: F401  (puts app/ on sys.path)
+import backend.semantic_search as semantic_search
+from backend.semantic_search import ChatIndex, normalize
+
+# Each group is one meaning; notes use the first word, paraphrase queries another
+SYNONYMS = [
+    ["wear", "abrasion", "erosion"], ["replace", "swap", "exchange"], ["caliper", "clamp", "bracket"],
+    ["leak", "seep", "drip"], ["noise", "squeal", "rattle"], ["torque", "tightening", "force"],
+    ["sensor", "probe", "detector"], ["crack", "fracture", "split"], ["rotor", "disc", "drum"],
+    ["pump", "compressor", "blower"], ["valve", "gate", "shutoff"], ["corrosion", "rust", "oxidation"],
+    ["overheating", "hot", "thermal"], ["vibration", "shaking", "judder"], ["seal", "gasket", "o-ring"],
+    ["bearing", "bushing", "journal"], ["steering", "rack", "tie-rod"], ["harness", "wiring", "loom"],
+]
+FILLER = ["observed", "during", "inspection", "front", "rear", "left", "right", "unit", "checked", "noted"]
+WORD_TO_GROUP = {word: g for g, group in enumerate(SYNONYMS) for word in group}
+
+
+def word_vector(word, dim):
+    seed = int.from_bytes(hashlib.sha1(word.encode()).digest()[:4], "little")
+    return np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+
+
+class SynonymEncoder:
+    """Averaging word vectors, with synonyms sharing one vector and codes and numbers ignored"""
+
+    def __init__(self, dim=384):
+        self.dim = dim
+        self._cache = {}
+
+    def _vector(self, word):
+        if word not in self._cache:
+            key = f"group{WORD_TO_GROUP[word]}" if word in WORD_TO_GROUP else word
+            self._cache[word] = word_vector(key, self.dim)
+        return self._cache[word]
+
+    def encode(self, texts, convert_to_numpy=True, **kwargs):
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            words = [w for w in re.findall(r"[a-z][a-z-]*", text.lower()) if not any(c.isdigit() for c in w)]
+            for word in words:
+                out[i] += self._vector(word)
+        return out
+
+
+def part_number(i):
+    return f"{'BCRSPV'[i % 6]}P-{1000 + i * 7 % 9000}-{chr(65 + i % 26)}{i}"
+
+
+def make_corpus(n, rng):
+    chunks, topics = [], []
+    for i in range(n):
+        groups = rng.choice(len(SYNONYMS), size=3, replace=False)
+        words = [SYNONYMS[g][0] for g in groups] + list(rng.choice(FILLER, size=8))
+        rng.shuffle(words)
+        chunks.append((f"Part {part_number(i)}: " + " ".join(words) + f". Measured {rng.integers(1, 99)} units.",
+                       f"notes{i // 500}.pdf"))
+        topics.append(groups)
+    return chunks, topics
+
+
+def make_queries(n_chunks, topics, count, rng):
+    targets = rng.choice(n_chunks, size=count, replace=False)
+    queries = {"keyword": [], "question": [], "paraphrase": []}
+    for i in targets:
+        groups = topics[i]
+        queries["keyword"].append((part_number(i), i))
+        queries["question"].append((f"what {SYNONYMS[groups[0]][0]} was found on part {part_number(i)}?", i))
+        paraphrase = " ".join(SYNONYMS[g][1 + rng.integers(0, 2)] for g in groups)
+        queries["paraphrase"].append((f"which note mentions {paraphrase}", i))
+    return queries
+
+
+def evaluate(search, queries, chunk_ids, top_k):
+    hits = 0
+    start = time.perf_counter()
+    for query, target in queries:
+        results = search(query, top_k)
+        hits += any(chunk_ids[chunk[0]] == target for chunk, _ in results)
+    return hits / len(queries), (time.perf_counter() - start) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    encoder = SynonymEncoder()
+    semantic_search.get_model = lambda: encoder
+    rng = np.random.default_rng(0)
+    chunks, topics = make_corpus(args.chunks, rng)
+    chunk_ids = {text: i for i, (text, _) in enumerate(chunks)}
+    queries = make_queries(len(chunks), topics, args.queries, rng)
+
+    index = ChatIndex()
+    index.add(chunks)
+    start = time.perf_counter()
+    index.lexical
+    print(f"{len(chunks)} chunks; BM25 index built in {(time.perf_counter() - start) * 1000:.0f} ms "
+          f"({len(index.lexical.postings)} terms)")
+
+    # Embedding outside the timed region for every strategy, as main.py embeds the question up front
+    embeddings = {query: normalize(encoder.encode([query]))[0] for group in queries.values() for query, _ in group}
+    strategies = {
+        "dense": lambda q, k: index.search(embeddings[q].reshape(1, -1), top_k=k)[0],
+        "bm25": lambda q, k: index.lexical_search(q, top_k=k),
+        "hybrid": lambda q, k: index.hybrid_search(q, top_k=k, query_embedding=embeddings[q]),
+    }
+
+    print(f"\n{'':<10}" + "".join(f"{name:>24}" for name in queries))
+    print(f"{'strategy':<10}" + f"{'recall@' + str(args.top_k) + ' / ms per query':>24}" * len(queries))
+    for name, search in strategies.items():
+        cells = []
+        for group in queries.values():
+            recall, ms = evaluate(search, group, chunk_ids, args.top_k)
+            cells.append(f"{recall:>15.2f} / {ms:>5.2f}")
+        print(f"{name:<10}" + "".join(f"{cell:>24}" for cell in cells))
+
+    # Chunks dense retrieval needs before it finds part-number questions as often as hybrid does at top_k
+    for k in (args.top_k, 20, 50):
+        recall, _ = evaluate(strategies["dense"], queries["question"], chunk_ids, k)
+        print(f"dense recall@{k} on part-number questions: {recall:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Cost of uploading the same files again with the content-addressed ingest
+cache: the first upload parses, OCRs, chunks and embeds; a repeat upload
+(even under a different file name) should only hash the bytes and copy
+cached vectors into the chat index.
+
+Uses scanned PDFs (PyMuPDF, Pillow, tesseract; --simulate-ocr-ms replaces
+tesseract with a delay), a CSV and a text file. Embeddings use the
+HashEncoder stand-in unless --real-model is given.
+
+Usage:
+    python benchmarks/bench_ingest_cache.py [--pdfs 3] [--pages 10] [--simulate-ocr-ms 0]
+"""
+import argparse
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from common import install_encoder
+from bench_ingestion import NamedUpload
+from bench_pdf_ocr import build_scanned_pdf
+import bench_ingestion
+from backend import ingest_cache, ingestion, ocr_engine
+from backend.semantic_search import ChatIndex
+from backend.context_manager import sync_chat_index
+
+
+class CountingEncoder:
+    def __init__(self, model):
+        self.model = model
+        self.encoded = 0
+
+    def encode(self, texts, **kwargs):
+        self.encoded += len(texts)
+        return self.model.encode(texts, **kwargs)
+
+
+def make_files(args):
+    """(bytes, name stem, extension) of every fixture; built once since PyMuPDF output is not byte-stable"""
+    rng = np.random.default_rng(0)
+    table = pd.DataFrame({"part": [f"MX-{i:05d}" for i in range(50000)], "price": rng.random(50000).round(2)})
+    files = [(build_scanned_pdf(args.pages, label=f"Report {i} "), f"report_{i}", "pdf") for i in range(args.pdfs)]
+    files.append((table.to_csv(index=False).encode(), "parts", "csv"))
+    files.append((" ".join(f"Maintenance note {i}: replaced pad." for i in range(4000)).encode(), "notes", "txt"))
+    return files
+
+
+def ingest_and_index(uploads):
+    start = time.perf_counter()
+    results = ingestion.ingest_uploads(uploads)
+    chunks = [chunk for result in results for chunk in result["chunks"]]
+    index = ChatIndex()
+    sync_chat_index(index, chunks, embeddings=ingestion.cached_embeddings(results))
+    ingestion.cache_embeddings(results, index.store)
+    return time.perf_counter() - start, results, len(chunks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdfs", type=int, default=3)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--simulate-ocr-ms", type=float, default=0.0)
+    parser.add_argument("--real-model", action="store_true")
+    args = parser.parse_args()
+
+    from backend import semantic_search
+    encoder = CountingEncoder(install_encoder(args.real_model))
+    semantic_search.get_model = lambda: encoder
+    if args.simulate_ocr_ms:
+        bench_ingestion.SIMULATED_OCR_SECONDS = args.simulate_ocr_ms / 1000
+        ocr_engine.ocr_image_bytes = bench_ingestion.simulated_ocr
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ocr_engine.OCR_CACHE_DIR = f"{tmp}/ocr"
+        ingestion.ingest_cache = ingest_cache.IngestCache(root=f"{tmp}/ingest")
+
+        files = make_files(args)
+        for label, suffix in (("first upload", ""), ("repeat upload", ""), ("renamed copy", " (1)")):
+            encoder.encoded = 0
+            uploads = [NamedUpload(data, f"{stem}{suffix}.{ext}") for data, stem, ext in files]
+            seconds, results, chunks = ingest_and_index(uploads)
+            cached = sum(result["cached"] for result in results)
+            print(f"{label:>14}: {seconds * 1000:8.1f} ms, {chunks} chunks, "
+                  f"{cached}/{len(results)} files from cache, {encoder.encoded} chunks embedded")
+
+
+if __name__ == "__main__":
+    main()
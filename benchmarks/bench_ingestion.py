@@ -0,0 +1,86 @@
+"""
+Wall time of ingesting a mixed upload (several scanned PDFs and images)
+one file after another versus concurrently through ingest_uploads.
+
+Requires PyMuPDF, Pillow and a tesseract binary; pass --simulate-ocr-ms to
+replace tesseract with a fixed per-image delay where it is not installed.
+The OCR cache is pointed at a temporary directory so both runs do real work.
+
+Usage:
+    python benchmarks/bench_ingestion.py [--pdfs 6] [--pages 8] [--images 4] [--simulate-ocr-ms 0] [--ocr-workers N]
+"""
+import argparse
+import io
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bench_pdf_ocr import build_scanned_pdf, render_text_image
+from backend import ingestion, ocr_engine
+
+
+class NamedUpload(io.BytesIO):
+    """Stand-in for Streamlit's UploadedFile"""
+
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+
+
+def make_uploads(args):
+    uploads = [
+        NamedUpload(build_scanned_pdf(args.pages, label=f"Report {i} "), f"report_{i}.pdf") for i in range(args.pdfs)
+    ]
+    uploads += [
+        NamedUpload(render_text_image([f"Receipt {i}", f"Total due {i * 17}.00"]), f"receipt_{i}.png")
+        for i in range(args.images)
+    ]
+    return uploads
+
+
+# Module-level so the OCR process pool workers can unpickle it
+SIMULATED_OCR_SECONDS = 0.0
+
+
+def simulated_ocr(image_bytes):
+    time.sleep(SIMULATED_OCR_SECONDS)
+    return f"simulated text for {len(image_bytes)} bytes"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdfs", type=int, default=6)
+    parser.add_argument("--pages", type=int, default=8)
+    parser.add_argument("--images", type=int, default=4)
+    parser.add_argument("--simulate-ocr-ms", type=float, default=0.0)
+    parser.add_argument("--ocr-workers", type=int, default=0, help="OCR pool size (default: one per core)")
+    args = parser.parse_args()
+
+    global SIMULATED_OCR_SECONDS
+    if args.simulate_ocr_ms:
+        SIMULATED_OCR_SECONDS = args.simulate_ocr_ms / 1000
+        ocr_engine.ocr_image_bytes = simulated_ocr
+
+    if args.ocr_workers:
+        ocr_engine._ocr_pool = ProcessPoolExecutor(max_workers=args.ocr_workers)
+
+    timings = {}
+    for label in ("serial", "concurrent"):
+        uploads = make_uploads(args)
+        with tempfile.TemporaryDirectory() as tmp:
+            ocr_engine.OCR_CACHE_DIR = tmp
+            start = time.perf_counter()
+            if label == "serial":
+                results = [ingestion._ingest_file(upload, lambda **fields: None) for upload in uploads]
+            else:
+                results = ingestion.ingest_uploads(uploads)
+            timings[label] = time.perf_counter() - start
+        chunks = sum(len(result["chunks"]) for result in results)
+        errors = [result["error"] for result in results if result["error"]]
+        print(f"{label:>10}: {timings[label]:.2f}s, {chunks} chunks, {len(errors)} errors")
+
+    print(f"speedup: {timings['serial'] / timings['concurrent']:.1f}x over {len(uploads)} files")
+
+
+if __name__ == "__main__":
+    main()
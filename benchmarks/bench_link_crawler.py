@@ -0,0 +1,66 @@
+"""
+Time to crawl the links found in a document: the old sequential
+requests.get loop versus crawl_urls (concurrent, pooled, deduplicated and
+cached), against a local HTTP stand-in server with per-request latency.
+
+Usage:
+    python benchmarks/bench_link_crawler.py [--links 50] [--delay 0.2]
+"""
+import argparse
+import tempfile
+import time
+
+import requests
+
+from common import APP_DIR  # noqa: F401  (puts app/ on sys.path)
+from local_http import LocalSite
+from backend import link_crawler
+
+
+def old_crawl(urls):
+    results = {}
+    for url in urls:
+        response = requests.get(url, timeout=5)
+        results[url] = link_crawler.html_to_text(response.text)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--links", type=int, default=50)
+    parser.add_argument("--delay", type=float, default=0.2, help="server latency per request in seconds")
+    args = parser.parse_args()
+
+    with LocalSite(delay=args.delay) as site, tempfile.TemporaryDirectory() as tmp:
+        link_crawler.CRAWL_CACHE_DIR = tmp
+        # Documents repeat references, often with trailing punctuation
+        unique = [f"{site.base_url}/ref/{i}" for i in range(args.links)]
+        found = unique + [url + "." for url in unique[: args.links // 4]]
+
+        start = time.perf_counter()
+        old_crawl(found)
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        cold_results = link_crawler.crawl_urls(found)
+        cold = time.perf_counter() - start
+
+        start = time.perf_counter()
+        link_crawler.crawl_urls(found)
+        cached = time.perf_counter() - start
+
+        link_crawler.CACHE_TTL_SECONDS = 0
+        before_304 = site.not_modified
+        start = time.perf_counter()
+        link_crawler.crawl_urls(found)
+        revalidated = time.perf_counter() - start
+
+    print(f"links found={len(found)} unique={len(cold_results)} server delay={args.delay}s")
+    print(f"old sequential:       {sequential:7.2f}s")
+    print(f"crawl_urls (cold):    {cold:7.2f}s  {sequential / cold:6.1f}x")
+    print(f"crawl_urls (cached):  {cached:7.3f}s  {sequential / cached:6.1f}x")
+    print(f"crawl_urls (304s):    {revalidated:7.2f}s  {site.not_modified - before_304} not-modified responses")
+
+
+if __name__ == "__main__":
+    main()
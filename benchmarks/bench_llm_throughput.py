@@ -0,0 +1,76 @@
+"""
+Throughput and latency of the whole Q&A path (context building, prompt,
+scheduler, LLM) under many concurrent sessions, offline.
+
+Each simulated user asks --questions questions back to back through
+qa_engine.answer_question, with a LocalBackend standing in for the
+provider. Runs are repeated for several scheduler concurrency limits, with
+--failure-rate of requests failing transiently to exercise retry/backoff.
+
+Usage:
+    python benchmarks/bench_llm_throughput.py [--users 16] [--questions 3] [--concurrency 1,4,8,16]
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from common import make_chunks
+from backend import qa_engine
+from backend.llm_backends import LocalBackend
+from backend.llm_scheduler import LLMScheduler
+
+
+def run(args, concurrency):
+    backend = LocalBackend(
+        reply=lambda prompt: f"Answer based on {len(prompt)} prompt characters.",
+        chunk_chars=8, interval=args.token_ms / 1000, first_token_delay=args.first_token_ms / 1000,
+        failure_rate=args.failure_rate
+    )
+    scheduler = LLMScheduler(
+        backend, max_concurrency=concurrency, base_delay=0.05, max_delay=0.5,
+        user_rate_per_minute=args.user_rpm, user_burst=args.questions
+    )
+    qa_engine.get_scheduler = lambda: scheduler
+    chunks = make_chunks(20)
+
+    def session(user):
+        latencies = []
+        for q in range(args.questions):
+            start = time.perf_counter()
+            answer = qa_engine.answer_question(f"Question {q} from {user}?", chunks, user=user)
+            latencies.append((time.perf_counter() - start, answer.startswith("⚠️")))
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        results = [item for latencies in pool.map(session, [f"user{u}" for u in range(args.users)]) for item in latencies]
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array([latency for latency, _ in results]) * 1000
+    errors = sum(failed for _, failed in results)
+    print(f"{concurrency:>11} {len(results) / elapsed:>10.1f} {np.percentile(latencies, 50):>8.0f} "
+          f"{np.percentile(latencies, 95):>8.0f} {scheduler.stats['peak_in_flight']:>6} "
+          f"{scheduler.stats['retries']:>7} {errors:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=16)
+    parser.add_argument("--questions", type=int, default=3)
+    parser.add_argument("--concurrency", default="1,4,8,16")
+    parser.add_argument("--first-token-ms", type=float, default=200.0)
+    parser.add_argument("--token-ms", type=float, default=10.0)
+    parser.add_argument("--failure-rate", type=float, default=0.1)
+    parser.add_argument("--user-rpm", type=int, default=60)
+    args = parser.parse_args()
+
+    print(f"{args.users} users x {args.questions} questions, {args.failure_rate:.0%} transient failures")
+    print(f"{'concurrency':>11} {'answers/s':>10} {'p50 ms':>8} {'p95 ms':>8} {'peak':>6} {'retries':>7} {'errors':>6}")
+    for concurrency in (int(c) for c in args.concurrency.split(",")):
+        run(args, concurrency)
+
+
+if __name__ == "__main__":
+    main()
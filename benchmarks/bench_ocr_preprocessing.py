@@ -0,0 +1,225 @@
+"""
+Throughput and character error rate (CER) of OCR on raw images, as
+ocr_engine used to do (pytesseract.image_to_string on the upload), versus
+the preprocessing pipeline (downscale, deskew, adaptive threshold,
+confidence-filtered image_to_data, no-text fast path) that OCR_PREPROCESS
+turns on. It stays opt-in until this shows its CER is no worse.
+
+The fixture set is generated once into --fixtures: document pages with
+known text rendered as a clean scan and as a phone photo (4032px, tilted,
+uneven light, sensor noise, JPEG), short labels and part numbers on a
+white background, plus photos and charts without any text. Pass --rebuild
+after changing the fixture set. Point --fixtures at a directory of your own images, each with a
+<name>.txt ground truth next to it (empty for no text), to use real data.
+
+Without a tesseract binary only the preprocessing cost and the fast-path
+decisions are reported.
+
+Usage:
+    python benchmarks/bench_ocr_preprocessing.py [--pages 8] [--fixtures /tmp/bench_ocr_fixtures] [--rebuild]
+"""
+import argparse
+import glob
+import io
+import os
+import shutil
+import time
+
+import numpy as np
+import pytesseract
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+from common import APP_DIR  # noqa: F401  (puts app/ on sys.path)
+from backend import ocr_engine
+
+WORDS = [
+    "brake", "caliper", "rotor", "pad", "wear", "measured", "service", "interval", "module", "sensor",
+    "torque", "steering", "inspection", "report", "vehicle", "mileage", "replacement", "warranty",
+]
+# Short labels the no-text fast path must not skip: (lines, font size in px)
+LABELS = [
+    (["TOTAL: 1,234.00"], 24),
+    (["Part No. AX-4471-B"], 20),
+    (["Serial: 99812-XK  Model: T400"], 32),
+    (["Invoice 2024", "Due 30 days"], 24),
+    (["OK"], 20),
+]
+FONT_PATHS = ["/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", "/Library/Fonts/Arial.ttf", "C:/Windows/Fonts/arial.ttf"]
+
+
+def load_font(size):
+    for path in FONT_PATHS:
+        if os.path.exists(path):
+            return ImageFont.truetype(path, size)
+    return ImageFont.load_default()
+
+
+def render_page(rng, lines=10, size=(1700, 1200)):
+    font = load_font(34)
+    image = Image.new("L", size, color=255)
+    draw = ImageDraw.Draw(image)
+    truth = []
+    for i in range(lines):
+        line = " ".join(rng.choice(WORDS, size=6)) + f" {rng.integers(1, 999)}"
+        draw.text((80, 80 + i * 100), line, font=font, fill=15)
+        truth.append(line)
+    return image, "\n".join(truth)
+
+
+def render_label(lines, font_size):
+    # A small crop with one or two short lines, like a part-number sticker or a totals box
+    font = load_font(font_size)
+    line_height = int(font_size * 1.4)
+    width = max(int(font.getlength(line)) for line in lines) + 2 * font_size
+    image = Image.new("L", (width, (len(lines) + 1) * line_height), color=255)
+    draw = ImageDraw.Draw(image)
+    for i, line in enumerate(lines):
+        draw.text((font_size, font_size // 2 + i * line_height), line, font=font, fill=0)
+    return image, "\n".join(lines)
+
+
+def as_phone_photo(page, rng):
+    # Upscaling to a phone sensor size, tilting, darkening one corner and adding noise
+    photo = page.resize((4032, int(4032 * page.height / page.width)), Image.BICUBIC)
+    photo = photo.rotate(float(rng.uniform(-4, 4)), expand=True, fillcolor=235, resample=Image.BICUBIC)
+    pixels = np.asarray(photo, dtype=np.float32)
+    ys, xs = np.mgrid[0:pixels.shape[0], 0:pixels.shape[1]]
+    light = 0.55 + 0.45 * (xs / xs.max() * 0.6 + ys / ys.max() * 0.4)
+    pixels = pixels * light + rng.normal(0, 10, pixels.shape)
+    return Image.fromarray(pixels.clip(0, 255).astype(np.uint8)).filter(ImageFilter.GaussianBlur(1.2))
+
+
+def render_no_text(rng, kind, size=(3000, 2000)):
+    image = Image.new("L", size, color=int(rng.integers(120, 220)))
+    draw = ImageDraw.Draw(image)
+    if kind == "shapes":
+        for _ in range(12):
+            x, y = rng.integers(0, size[0] - 400), rng.integers(0, size[1] - 400)
+            r = int(rng.integers(80, 400))
+            draw.ellipse((x, y, x + r, y + r), fill=int(rng.integers(0, 255)))
+        return image.filter(ImageFilter.GaussianBlur(4))
+    # A line chart without labels
+    xs = np.linspace(100, size[0] - 100, 60)
+    ys = size[1] / 2 + np.cumsum(rng.normal(0, 40, len(xs)))
+    draw.line(list(zip(xs, ys)), fill=20, width=6)
+    draw.line([(100, size[1] - 100), (size[0] - 100, size[1] - 100)], fill=0, width=4)
+    draw.line([(100, 100), (100, size[1] - 100)], fill=0, width=4)
+    return image
+
+
+def save(image, path, truth, fmt="PNG", **kwargs):
+    image.save(path, format=fmt, **kwargs)
+    with open(os.path.splitext(path)[0] + ".txt", "w", encoding="utf-8") as f:
+        f.write(truth)
+
+
+def build_fixtures(directory, pages, seed=0):
+    rng = np.random.default_rng(seed)
+    os.makedirs(directory, exist_ok=True)
+    for i in range(pages):
+        page, truth = render_page(rng)
+        save(page, os.path.join(directory, f"scan_{i:02d}.png"), truth)
+        save(as_phone_photo(page, rng).convert("RGB"), os.path.join(directory, f"photo_{i:02d}.jpg"), truth,
+             fmt="JPEG", quality=70)
+    for i, (lines, font_size) in enumerate(LABELS):
+        image, truth = render_label(lines, font_size)
+        save(image, os.path.join(directory, f"label_{i:02d}.png"), truth)
+    for i in range(max(2, pages // 2)):
+        save(render_no_text(rng, "shapes"), os.path.join(directory, f"notext_shapes_{i:02d}.png"), "")
+        save(render_no_text(rng, "chart"), os.path.join(directory, f"notext_chart_{i:02d}.png"), "")
+
+
+def load_fixtures(directory):
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(directory, "*"))):
+        if path.endswith(".txt"):
+            continue
+        truth_path = os.path.splitext(path)[0] + ".txt"
+        if not os.path.exists(truth_path):
+            continue
+        with open(path, "rb") as f, open(truth_path, encoding="utf-8") as t:
+            fixtures.append((os.path.basename(path), f.read(), t.read()))
+    return fixtures
+
+
+def edit_distance(a, b):
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def cer(text, truth):
+    text, truth = " ".join(text.split()), " ".join(truth.split())
+    if not truth:
+        return 0.0 if not text else 1.0
+    return edit_distance(text, truth) / len(truth)
+
+
+def raw_ocr(image_bytes):
+    return ocr_engine.ocr_pil_image(Image.open(io.BytesIO(image_bytes)), preprocess=False)
+
+
+def pipeline_ocr(image_bytes):
+    return ocr_engine.ocr_pil_image(Image.open(io.BytesIO(image_bytes)), preprocess=True)
+
+
+def run_variant(fn, fixtures):
+    rows = []
+    start = time.perf_counter()
+    for name, image_bytes, truth in fixtures:
+        rows.append((name, cer(fn(image_bytes), truth)))
+    return time.perf_counter() - start, rows
+
+
+def group(name):
+    return name.split("_")[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=8)
+    parser.add_argument("--fixtures", default="/tmp/bench_ocr_fixtures")
+    parser.add_argument("--rebuild", action="store_true")
+    args = parser.parse_args()
+
+    if args.rebuild:
+        shutil.rmtree(args.fixtures, ignore_errors=True)
+    if not glob.glob(os.path.join(args.fixtures, "*.txt")):
+        build_fixtures(args.fixtures, args.pages)
+    fixtures = load_fixtures(args.fixtures)
+    groups = sorted({group(name) for name, _, _ in fixtures})
+    print(f"fixtures: {len(fixtures)} images in {args.fixtures} ({', '.join(groups)})")
+
+    # Preprocessing alone, including the fast-path decision
+    start = time.perf_counter()
+    decisions = []
+    for name, image_bytes, truth in fixtures:
+        pixels = ocr_engine.preprocess_image(Image.open(io.BytesIO(image_bytes)))
+        decisions.append((name, pixels is not None, bool(truth.strip())))
+    preprocess_seconds = time.perf_counter() - start
+    missed = [name for name, kept, has_text in decisions if has_text and not kept]
+    skipped = [name for name, kept, has_text in decisions if not has_text and not kept]
+    no_text = sum(1 for _, _, has_text in decisions if not has_text)
+    print(f"preprocessing: {preprocess_seconds / len(fixtures) * 1000:.0f} ms/image, "
+          f"fast path skipped {len(skipped)}/{no_text} images without text, "
+          f"wrongly skipped {len(missed)} with text {missed or ''}")
+
+    try:
+        pytesseract.get_tesseract_version()
+    except Exception as e:
+        print(f"tesseract not available ({type(e).__name__}); skipping OCR throughput and CER")
+        return
+
+    print(f"\n{'variant':<10}{'images/s':>10}" + "".join(f"{'CER ' + g:>14}" for g in groups))
+    for label, fn in [("raw", raw_ocr), ("pipeline", pipeline_ocr)]:
+        seconds, rows = run_variant(fn, fixtures)
+        by_group = {g: [value for name, value in rows if group(name) == g] for g in groups}
+        print(f"{label:<10}{len(fixtures) / seconds:>10.2f}" + "".join(f"{np.mean(by_group[g]):>14.3f}" for g in groups))
+
+
+if __name__ == "__main__":
+    main()
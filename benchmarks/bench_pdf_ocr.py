@@ -0,0 +1,94 @@
+"""
+Ingest time of an image-heavy PDF with the old serial OCR loop versus the
+deduplicating, pooled and cached pipeline in parse_pdf.
+
+The fixture PDF has one scanned text image per page plus a logo reused on
+every page, like a typical scanned report. Requires PyMuPDF, Pillow and a
+tesseract binary.
+
+Usage:
+    python benchmarks/bench_pdf_ocr.py [--pages 200]
+"""
+import argparse
+import io
+import os
+import tempfile
+import time
+
+import fitz
+from PIL import Image, ImageDraw
+
+from common import APP_DIR  # noqa: F401  (puts app/ on sys.path)
+from backend import ocr_engine
+from backend.document_parser import parse_pdf
+
+
+def render_text_image(lines, size=(1200, 400)):
+    image = Image.new("L", size, color=255)
+    draw = ImageDraw.Draw(image)
+    for i, line in enumerate(lines):
+        draw.text((20, 20 + i * 30), line, fill=0)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def build_scanned_pdf(pages, label=""):
+    doc = fitz.open()
+    logo = render_text_image(["MANDO"], size=(200, 60))
+    logo_xref = 0
+    for page_num in range(pages):
+        page = doc.new_page()
+        scan = render_text_image([f"{label}Page {page_num + 1} part number MX-{page_num:05d}", "Total amount due 1,234.50"])
+        page.insert_image(fitz.Rect(40, 100, 560, 300), stream=scan)
+        # Re-using the same xref for the logo, as generated reports do
+        if logo_xref:
+            page.insert_image(fitz.Rect(40, 20, 140, 50), xref=logo_xref)
+        else:
+            logo_xref = page.insert_image(fitz.Rect(40, 20, 140, 50), stream=logo)
+    return doc.tobytes()
+
+
+def old_parse_pdf(data):
+    doc = fitz.open(stream=data, filetype="pdf")
+    full_text = []
+    for page_num, page in enumerate(doc):
+        page_text = page.get_text()
+        if page_text:
+            full_text.append(f"Page {page_num+1} Text:\n{page_text}")
+        for img_index, img in enumerate(page.get_images(full=True)):
+            base_image = doc.extract_image(img[0])
+            ocr_result = ocr_engine.ocr_image_bytes(base_image["image"])
+            full_text.append(f"\nPage {page_num+1} Image {img_index+1} OCR:\n{ocr_result}")
+    return "\n".join(full_text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200)
+    args = parser.parse_args()
+
+    data = build_scanned_pdf(args.pages)
+    with tempfile.TemporaryDirectory() as tmp:
+        ocr_engine.OCR_CACHE_DIR = tmp
+
+        start = time.perf_counter()
+        old_parse_pdf(data)
+        serial = time.perf_counter() - start
+
+        start = time.perf_counter()
+        parse_pdf(io.BytesIO(data))
+        cold = time.perf_counter() - start
+
+        start = time.perf_counter()
+        parse_pdf(io.BytesIO(data))
+        warm = time.perf_counter() - start
+
+    print(f"pages={args.pages} cores={os.cpu_count()}")
+    print(f"old serial:        {serial:8.2f}s")
+    print(f"pipeline (cold):   {cold:8.2f}s  {serial / cold:5.1f}x")
+    print(f"pipeline (cached): {warm:8.2f}s  {serial / warm:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Search latency of ChatIndex against the old module-global Python list index.
+
+Query embeddings are precomputed so only the scoring and top-k selection is
+timed. FAISS backends are included when faiss-cpu is installed.
+
+Usage:
+    python benchmarks/bench_semantic_search.py [--sizes 1000 10000 100000] [--batch 8]
+"""
+import argparse
+
+import numpy as np
+
+from common import install_encoder, random_unit_vectors, timed
+
+
+def old_search(index, query_embedding, top_k=5):
+    similarities = []
+    for chunk, embedding in index:
+        similarity = np.dot(embedding, query_embedding)
+        similarities.append((chunk, similarity))
+    return sorted(similarities, key=lambda x: x[1], reverse=True)[:top_k]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--batch", type=int, default=8, help="queries per batched search call")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    install_encoder()
+    from backend.semantic_search import ChatIndex, faiss
+
+    backends = ["numpy"] + (["flat", "ivf", "hnsw"] if faiss is not None else [])
+    header = f"{'chunks':>8} {'old list (ms)':>14}" + "".join(f" {name + ' (ms)':>12}" for name in backends)
+    print(header + f" {'batched/query (ms)':>19}")
+
+    for n in args.sizes:
+        vectors = random_unit_vectors(n)
+        chunks = [(f"chunk {i}", f"doc{i % 20}.pdf") for i in range(n)]
+        queries = random_unit_vectors(args.batch, seed=1)
+
+        old_index = list(zip(chunks, vectors))
+        row = f"{n:>8} {timed(lambda: old_search(old_index, queries[0]), args.repeats) * 1000:>14.2f}"
+
+        for name in backends:
+            index = ChatIndex(backend=name)
+            index.add(chunks, embeddings=vectors)
+            index.search(queries[:1])  # builds the FAISS structure outside the timing
+            row += f" {timed(lambda: index.search(queries[:1]), args.repeats) * 1000:>12.2f}"
+
+        index = ChatIndex()
+        index.add(chunks, embeddings=vectors)
+        batched = timed(lambda: index.search(queries), args.repeats) / args.batch
+        print(row + f" {batched * 1000:>19.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Perceived latency of answering with and without streaming, using the
+offline LocalBackend in place of Gemini.
+
+Blocking answers appear only once generation finishes; streamed answers
+show their first piece after the model's first-token delay. The script also
+reports when the example code block became runnable.
+
+Usage:
+    python benchmarks/bench_streaming.py [--interval 0.05] [--first-token 0.3]
+"""
+import argparse
+import time
+
+from common import make_chunks
+from backend import qa_engine
+from backend.llm_backends import LocalBackend
+from backend.llm_scheduler import LLMScheduler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--interval", type=float, default=0.05, help="seconds between streamed pieces")
+    parser.add_argument("--first-token", type=float, default=0.3, help="seconds before the first piece")
+    parser.add_argument("--chunk-chars", type=int, default=16)
+    args = parser.parse_args()
+
+    backend = LocalBackend(chunk_chars=args.chunk_chars, interval=args.interval, first_token_delay=args.first_token)
+    scheduler = LLMScheduler(backend)
+    qa_engine.get_scheduler = lambda: scheduler
+    chunks = make_chunks(10)
+    question = "Plot the example values"
+
+    start = time.perf_counter()
+    answer = qa_engine.answer_question(question, chunks)
+    blocking = time.perf_counter() - start
+
+    start = time.perf_counter()
+    first_piece = first_code = None
+    streamed = ""
+    for piece in qa_engine.stream_answer(question, chunks):
+        now = time.perf_counter() - start
+        first_piece = first_piece if first_piece is not None else now
+        streamed += piece
+        if first_code is None and qa_engine.split_answer(streamed)[1]:
+            first_code = now
+    total = time.perf_counter() - start
+
+    assert streamed.strip() == answer
+    print(f"blocking answer:      visible after {blocking * 1000:.0f} ms")
+    print(f"streamed answer:      first text after {first_piece * 1000:.0f} ms, complete after {total * 1000:.0f} ms")
+    print(f"code block runnable:  after {first_code * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Load time and memory of a large CSV export with plain pd.read_csv versus
+the chunked, downcasting table_loader.read_csv, plus the time to the first
+prompt preview and to re-read the frame from Parquet.
+
+The fixture is a synthetic sales export (ids, dates, low-cardinality text,
+small ints, prices) of about --size-mb megabytes, written once to --path.
+Each variant runs in a fresh subprocess so its peak RSS is measured alone.
+
+Usage:
+    python benchmarks/bench_table_loader.py [--size-mb 1024] [--path /tmp/bench_sales.csv]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from common import APP_DIR  # noqa: F401  (puts app/ on sys.path)
+
+VARIANTS = ("pandas", "loader", "preview", "parquet")
+
+
+def write_fixture(path, size_mb, rows_per_block=500_000):
+    rng = np.random.default_rng(0)
+    regions = ["Seoul", "Busan", "Ulsan", "Incheon", "Daegu", "Gwangju"]
+    products = [f"brake-pad-{i:03d}" for i in range(400)]
+    written = 0
+    block = 0
+    with open(path, "w") as f:
+        while written < size_mb * 1024 * 1024:
+            n = rows_per_block
+            df = pd.DataFrame({
+                "order_id": np.arange(block * n, (block + 1) * n),
+                "date": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, n), unit="D"),
+                "region": rng.choice(regions, n),
+                "product": rng.choice(products, n),
+                "quantity": rng.integers(1, 50, n),
+                "unit_price": rng.integers(100, 100000, n) / 100,
+                "discount": rng.choice([0.0, 0.05, 0.1, 0.25], n),
+                "note": np.where(rng.random(n) < 0.01, "expedite", ""),
+            })
+            text = df.to_csv(index=False, header=block == 0)
+            f.write(text)
+            written += len(text)
+            block += 1
+
+
+def run_variant(variant, path):
+    from backend import table_loader
+    start = time.perf_counter()
+    if variant == "pandas":
+        df = pd.read_csv(path)
+    elif variant == "loader":
+        df = table_loader.read_csv(path)
+    elif variant == "preview":
+        df = table_loader.read_csv_preview(path)
+    else:
+        df = pd.read_parquet(path + ".parquet")
+    seconds = time.perf_counter() - start
+    if variant == "loader":
+        # Persisting the downcast frame for the parquet variant, outside the timed load
+        df.to_parquet(path + ".parquet")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({
+        "seconds": seconds, "peak_rss_mb": peak, "rows": len(df),
+        "frame_mb": df.memory_usage(deep=True).sum() / 1024 ** 2
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=1024)
+    parser.add_argument("--path", default="/tmp/bench_sales.csv")
+    parser.add_argument("--variant", choices=VARIANTS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.variant:
+        run_variant(args.variant, args.path)
+        return
+
+    if not os.path.exists(args.path) or abs(os.path.getsize(args.path) / 1024 ** 2 - args.size_mb) > args.size_mb * 0.1:
+        print(f"writing {args.size_mb} MB fixture to {args.path}...")
+        write_fixture(args.path, args.size_mb)
+    print(f"fixture: {os.path.getsize(args.path) / 1024 ** 2:.0f} MB")
+    print(f"{'variant':>8} {'seconds':>8} {'peak RSS MB':>12} {'frame MB':>9} {'rows':>11}")
+    for variant in VARIANTS:
+        output = subprocess.run(
+            [sys.executable, __file__, "--variant", variant, "--path", args.path],
+            capture_output=True, text=True
+        )
+        if output.returncode != 0:
+            print(f"{variant:>8} failed: {output.stderr.strip().splitlines()[-1] if output.stderr else output.returncode}")
+            continue
+        result = json.loads(output.stdout.strip().splitlines()[-1])
+        print(f"{variant:>8} {result['seconds']:>8.2f} {result['peak_rss_mb']:>12.0f} "
+              f"{result['frame_mb']:>9.0f} {result['rows']:>11}")
+
+
+if __name__ == "__main__":
+    main()
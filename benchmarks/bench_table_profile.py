@@ -0,0 +1,91 @@
+"""
+Size of the DataFrame part of the prompt and the cost of building it, with
+the old `df.head(5).to_markdown()` plus column list versus the cached
+column profiles of backend.table_profile.
+
+Two tables: a long sales export (--rows) with ids, dates, categories,
+prices and a sparse note column, and a wide sensor sheet (--columns).
+Profiles are computed once, as at load time; each prompt afterwards only
+formats them.
+
+Usage:
+    python benchmarks/bench_table_profile.py [--rows 2000000] [--columns 500]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from common import APP_DIR  # noqa: F401  (puts app/ on sys.path)
+from backend.chunker import count_tokens
+from backend.context_builder import build_dataframe_section, CONTEXT_TOKEN_BUDGET, DATAFRAME_BUDGET_SHARE
+from backend.table_profile import get_profile, profile_dataframe
+
+
+def make_sales(rows, rng):
+    return pd.DataFrame({
+        "order_id": np.arange(rows, dtype=np.uint32),
+        "order_date": pd.date_range("2023-01-01", periods=rows, freq="15s"),
+        "region": pd.Categorical(rng.choice(["Seoul", "Busan", "Incheon", "Daegu", "Ulsan"], rows)),
+        "product": pd.Categorical(rng.choice([f"brake-pad-{i:03d}" for i in range(400)], rows)),
+        "quantity": rng.integers(1, 50, rows).astype(np.uint8),
+        "unit_price": (rng.random(rows) * 200).round(2),
+        "note": pd.Categorical(np.where(rng.random(rows) < 0.99, None, "expedite")),
+    })
+
+
+def make_sensors(columns, rng, rows=5000):
+    data = {f"sensor_{c:03d}_reading_value": rng.normal(size=rows).round(4) for c in range(columns)}
+    data["notes"] = ["long free-text maintenance note " * 4] * rows
+    return pd.DataFrame(data)
+
+
+def old_section(named_dfs):
+    # What main.py and answer_question put in the prompt before profiles
+    df_text = ""
+    for name, (df, filename) in named_dfs.items():
+        df_text += f"Dataset `{name}` from file '{filename}':\nColumns: {list(df.columns)}\nSample rows:\n{df.head(5).to_markdown()}\n\n"
+    df_info = "\n".join(f"- `{name}` (from file '{filename}'): columns = {list(df.columns)}" for name, (df, filename) in named_dfs.items())
+    return df_text + df_info
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--columns", type=int, default=500)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    tables = {
+        "sales": {"df1": (make_sales(args.rows, rng), "sales.csv")},
+        "sensors": {"df1": (make_sensors(args.columns, rng), "sensors.xlsx")},
+    }
+    budget = int(CONTEXT_TOKEN_BUDGET * DATAFRAME_BUDGET_SHARE)
+
+    print(f"{'table':<9}{'shape':>16}{'old tokens':>12}{'new tokens':>12}{'profile (s)':>13}{'prompt (ms)':>13}")
+    for label, named_dfs in tables.items():
+        df = named_dfs["df1"][0]
+        old_tokens = count_tokens(old_section(named_dfs))
+
+        start = time.perf_counter()
+        get_profile(df)
+        profile_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        text, new_tokens = build_dataframe_section(named_dfs, budget)
+        prompt_ms = (time.perf_counter() - start) * 1000
+
+        shape = f"{df.shape[0]}x{df.shape[1]}"
+        print(f"{label:<9}{shape:>16}{old_tokens:>12}{new_tokens:>12}{profile_seconds:>13.2f}{prompt_ms:>13.1f}")
+
+    # Profiling per prompt instead of once at load
+    df = tables["sales"]["df1"][0]
+    start = time.perf_counter()
+    profile_dataframe(df)
+    print(f"\nre-profiling the sales table on every prompt would add {time.perf_counter() - start:.2f}s")
+    print("\nnew sales section:\n" + build_dataframe_section(tables["sales"], budget)[0])
+
+
+if __name__ == "__main__":
+    main()
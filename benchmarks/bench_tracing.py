@@ -0,0 +1,120 @@
+"""
+Overhead of the tracing layer: the cost of one instrumented span when
+tracing is off (the default) and on, and the wall time of a Q&A turn
+(ingest text uploads, chunk, index, embed the question, retrieve, build
+the prompt) with and without a trace. Prints the waterfall of the last
+traced turn as the sidebar panel shows it.
+
+The LLM call and code execution are left out; embeddings use the
+HashEncoder stand-in.
+
+Usage:
+    python benchmarks/bench_tracing.py [--files 4] [--paragraphs 400] [--turns 15]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from common import install_encoder
+from bench_ingestion import NamedUpload
+from backend import ingestion
+from backend.context_manager import get_contextual_results, sync_chat_index
+from backend.qa_engine import build_prompt
+from backend.semantic_search import ChatIndex, embed_query
+from backend.tracing import Trace, export_trace, span, waterfall
+
+WORDS = ["brake", "pad", "wear", "torque", "limit", "caliper", "report", "invoice", "total", "sensor",
+         "module", "replace", "interval", "service", "warranty", "engine", "mileage", "measured"]
+
+
+def make_uploads(files, paragraphs, seed):
+    rng = np.random.default_rng(seed)
+    uploads = []
+    for i in range(files):
+        text = "\n\n".join(
+            " ".join(rng.choice(WORDS, size=40)) + f". Part BP-{rng.integers(1000, 9999)}." for _ in range(paragraphs)
+        )
+        uploads.append(NamedUpload(text.encode(), f"notes_{seed}_{i}.txt"))
+    return uploads
+
+
+def run_turn(uploads, question):
+    results = ingestion.ingest_uploads(uploads, use_cache=False)
+    chunks = [chunk for result in results for chunk in result["chunks"]]
+    chat_history = {"chat": {"context": {"text_chunks": chunks, "sources": []}}}
+    index = ChatIndex()
+    with span("index") as s:
+        s.count("chunks", len(chunks))
+        sync_chat_index(index, chunks)
+    embedding = embed_query(question)
+    context = get_contextual_results("chat", question, chat_history, index=index, query_embedding=embedding)
+    return build_prompt(question, context)
+
+
+def per_span_ns(iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        with span("stage") as s:
+            s.count("items")
+    return (time.perf_counter() - start) / iterations * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=4)
+    parser.add_argument("--paragraphs", type=int, default=400)
+    parser.add_argument("--turns", type=int, default=15)
+    args = parser.parse_args()
+
+    install_encoder()
+    start = time.perf_counter()
+    for _ in range(1_000_000):
+        pass
+    loop_ns = (time.perf_counter() - start) * 1000
+    off_ns = per_span_ns(1_000_000) - loop_ns
+    with Trace("micro"):
+        on_ns = per_span_ns(100_000) - loop_ns
+    print(f"one span: {off_ns:.0f} ns with tracing off, {on_ns:.0f} ns with tracing on\n")
+
+    question = "what torque limit was measured for part BP-2041?"
+    run_turn(make_uploads(args.files, args.paragraphs, seed=10_000), question)
+    untraced, traced, spans = [], [], []
+    trace = None
+    for turn in range(args.turns):
+        # Alternating so drift on the machine affects both sides alike
+        # Fresh files and questions every turn, so nothing comes from the embedding cache
+        uploads = make_uploads(args.files, args.paragraphs, seed=2 * turn)
+        start = time.perf_counter()
+        run_turn(uploads, f"{question} ({2 * turn})")
+        untraced.append(time.perf_counter() - start)
+
+        uploads = make_uploads(args.files, args.paragraphs, seed=2 * turn + 1)
+        start = time.perf_counter()
+        with Trace("turn") as trace:
+            run_turn(uploads, f"{question} ({2 * turn + 1})")
+        traced.append(time.perf_counter() - start)
+        spans.append(len(trace.records()))
+
+    off, on = statistics.median(untraced) * 1000, statistics.median(traced) * 1000
+    print(f"turn ({args.files} files x {args.paragraphs} paragraphs): {off:.1f} ms untraced, "
+          f"{on:.1f} ms traced ({(on - off) / off:+.1%}), {statistics.median(spans):.0f} spans per turn")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "traces.jsonl")
+        start = time.perf_counter()
+        export_trace(trace, path)
+        print(f"JSONL export: {(time.perf_counter() - start) * 1000:.1f} ms, {os.path.getsize(path)} bytes per turn\n")
+
+    print(f"{'stage':<28}{'start ms':>9}{'end ms':>9}{'busy ms':>9}  counters")
+    for row in waterfall(trace.records()):
+        label = "  " * row["depth"] + row["name"] + (f" x{row['calls']}" if row["calls"] > 1 else "")
+        counters = ", ".join(f"{key} {value}" for key, value in row["counters"].items())
+        print(f"{label:<28}{row['start_ms']:>9.1f}{row['end_ms']:>9.1f}{row['busy_ms']:>9.1f}  {counters}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Helpers shared by the benchmark scripts"""
+import hashlib
+import os
+import sys
+import time
+import types
+
+import numpy as np
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+
+class HashEncoder:
+    """Deterministic stand-in for SentenceTransformer.encode"""
+
+    def __init__(self, dim=384):
+        self.dim = dim
+
+    def encode(self, texts, convert_to_numpy=True, **kwargs):
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            seed = int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:4], "little")
+            vec = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+            out[i] = vec / np.linalg.norm(vec)
+        return out
+
+
+def install_encoder(real_model=False):
+    """Returning the embedding model, substituting HashEncoder unless real_model is set"""
+    if not real_model:
+        # Substituting the encoder class before backend.semantic_search is imported
+        module = types.ModuleType("sentence_transformers")
+        module.SentenceTransformer = lambda name: HashEncoder()
+        sys.modules["sentence_transformers"] = module
+    from backend.semantic_search import get_model
+    return get_model()
+
+
+def make_chunks(n, seed=0):
+    rng = np.random.default_rng(seed)
+    words = ["invoice", "flight", "marks", "total", "page", "report", "engine", "brake", "sensor", "module"]
+    return [
+        (f"chunk {i} " + " ".join(rng.choice(words, size=60)), f"doc{i % 20}.pdf")
+        for i in range(n)
+    ]
+
+
+def random_unit_vectors(n, dim=384, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def timed(fn, repeats=3):
+    """Median wall time of fn() in seconds"""
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return float(np.median(samples))
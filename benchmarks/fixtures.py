@@ -0,0 +1,109 @@
+"""Generated fixture corpora for the end-to-end benchmark suite (run_suite.py)"""
+import io
+
+import fitz
+import numpy as np
+import pandas as pd
+from pptx import Presentation
+from pptx.util import Inches, Pt
+
+from bench_pdf_ocr import build_scanned_pdf, render_text_image
+
+WORDS = [
+    "brake", "caliper", "rotor", "pad", "wear", "measured", "service", "interval", "module", "sensor",
+    "torque", "steering", "inspection", "report", "vehicle", "mileage", "replacement", "warranty",
+    "supplier", "invoice", "delivery", "quality", "defect", "batch", "assembly", "line", "shift",
+]
+# Every document count, page count and table size is multiplied by the scale's factor
+SCALES = {"small": 1, "medium": 4, "large": 16}
+
+
+def part_number(doc, page):
+    return f"MX-{doc:03d}-{page:03d}"
+
+
+def paragraph(rng, words=60):
+    return " ".join(rng.choice(WORDS, size=words)).capitalize() + "."
+
+
+def text_pdf(doc, pages, rng):
+    """A born-digital report: a few paragraphs per page, each page naming its own part number"""
+    pdf = fitz.open()
+    for page_num in range(pages):
+        page = pdf.new_page()
+        text = f"Report {doc}, page {page_num + 1}. Part {part_number(doc, page_num)} torque limit " \
+               f"{40 + (doc * 7 + page_num) % 60} Nm.\n\n" + "\n\n".join(paragraph(rng) for _ in range(4))
+        page.insert_textbox(fitz.Rect(50, 50, 550, 800), text, fontsize=9)
+    return pdf.tobytes()
+
+
+def pptx_deck(slides, rng):
+    """A deck with a title, a bullet paragraph and one screenshot-like image per slide"""
+    deck = Presentation()
+    for slide_num in range(slides):
+        slide = deck.slides.add_slide(deck.slide_layouts[5])
+        slide.shapes.title.text = f"Quality review {slide_num + 1}"
+        box = slide.shapes.add_textbox(Inches(0.5), Inches(1.5), Inches(9), Inches(2))
+        box.text_frame.text = paragraph(rng, 40)
+        box.text_frame.paragraphs[0].font.size = Pt(12)
+        image = render_text_image([f"Defect rate slide {slide_num + 1}: {rng.integers(1, 9)}.{rng.integers(0, 9)}%"])
+        slide.shapes.add_picture(io.BytesIO(image), Inches(0.5), Inches(4), width=Inches(6))
+    buffer = io.BytesIO()
+    deck.save(buffer)
+    return buffer.getvalue()
+
+
+def parts_table(rows, rng):
+    return pd.DataFrame({
+        "part": [f"MX-{i:07d}" for i in range(rows)],
+        "supplier": rng.choice(["Hanil", "Daewon", "Sejin", "Korea Brake", "Mando"], rows),
+        "price": (rng.random(rows) * 200).round(2),
+        "quantity": rng.integers(1, 500, rows),
+        "shipped": pd.date_range("2023-01-01", periods=rows, freq="min").strftime("%Y-%m-%d %H:%M"),
+    })
+
+
+def xlsx_bytes(df):
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+
+def linked_notes(doc, base_url, links, rng):
+    """Meeting notes citing `links` reference pages on the local site"""
+    lines = []
+    for i in range(links):
+        lines.append(paragraph(rng, 25))
+        lines.append(f"See {base_url}/reference/{doc}/{i} for the supplier bulletin.")
+    return "\n\n".join(lines).encode()
+
+
+def build_corpus(scale, base_url, seed=0):
+    """
+    (file name, bytes) uploads for a scale: text PDFs, scanned PDFs, PPTX
+    decks, a large CSV and an XLSX sheet, and link-heavy notes pointing at
+    base_url. Returns (uploads, questions), where questions are
+    (kind, question) pairs answerable from the corpus.
+    """
+    factor = SCALES[scale]
+    rng = np.random.default_rng(seed)
+    uploads = []
+    text_docs = 2 * factor
+    for doc in range(text_docs):
+        uploads.append((f"report_{doc}.pdf", text_pdf(doc, 10, rng)))
+    for doc in range(factor):
+        uploads.append((f"scan_{doc}.pdf", build_scanned_pdf(4, label=f"Scan {doc} ")))
+        uploads.append((f"review_{doc}.pptx", pptx_deck(8, rng)))
+        uploads.append((f"notes_{doc}.txt", linked_notes(doc, base_url, 10, rng)))
+    table = parts_table(50_000 * factor, rng)
+    uploads.append(("parts.csv", table.to_csv(index=False).encode()))
+    uploads.append(("orders.xlsx", xlsx_bytes(table.head(5_000 * factor))))
+
+    questions = []
+    for i in range(12):
+        doc, page = int(rng.integers(text_docs)), int(rng.integers(10))
+        questions.append(("keyword", part_number(doc, page)))
+        questions.append(("text", f"What is the torque limit of part {part_number(doc, page)}?"))
+        questions.append(("paraphrase", f"Which {' '.join(rng.choice(WORDS, size=3))} issues were reported?"))
+    questions += [("data", "What is the average price per supplier in df1?")] * 4
+    return uploads, questions
@@ -0,0 +1,63 @@
+"""Local HTTP stand-in server for crawling benchmarks"""
+import hashlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_page(path, paragraphs=20):
+    body = "".join(f"<p>Reference page {path}, paragraph {i}: brake module service notes.</p>" for i in range(paragraphs))
+    return f"<html><head><style>p {{}}</style><script>var x = 1;</script></head><body>{body}</body></html>".encode()
+
+
+class LocalSite:
+    """
+    Serves generated HTML pages on 127.0.0.1 with a fixed per-request delay,
+    ETag / If-None-Match support, and counters of full and 304 responses.
+    """
+
+    def __init__(self, delay=0.2, paragraphs=20):
+        self.delay = delay
+        self.paragraphs = paragraphs
+        self.full_responses = 0
+        self.not_modified = 0
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                time.sleep(site.delay)
+                body = make_page(self.path, site.paragraphs)
+                etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    site.not_modified += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                site.full_responses += 1
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,109 @@
+"""
+Import-time profile of the modules app/main.py loads before the home page
+renders, to keep startup regressions visible.
+
+Each module is imported in a fresh interpreter with `-X importtime`; the
+report lists its cumulative import time and the slowest transitive imports.
+Heavy dependencies (sentence_transformers / torch, google.generativeai)
+should not show up here since they load lazily.
+
+Usage:
+    python benchmarks/profile_startup.py [--top 10] [--max-ms 3000] [--json]
+
+Exits with status 1 if the total exceeds --max-ms.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+
+# Everything main.py imports at module level, in order
+STARTUP_MODULES = [
+    "streamlit",
+    "PIL.Image",
+    "streamlit_lottie",
+    "backend.document_parser",
+    "backend.ocr_engine",
+    "backend.chunker",
+    "backend.qa_engine",
+    "backend.semantic_search",
+    "backend.resources",
+    "backend.context_manager",
+    "pandas",
+    "plotly.graph_objects",
+    "backend.link_crawler",
+]
+
+
+def run_importtime(code):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=APP_DIR,
+        capture_output=True,
+        text=True,
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        entries.append((int(cumulative), name.strip()))
+    return result, entries
+
+
+def profile_module(module, interpreter_modules):
+    """Returning (cumulative_us, [(cumulative_us, name), ...]) for importing module"""
+    result, entries = run_importtime(f"import {module}")
+    if result.returncode != 0:
+        return None, result.stderr.strip().splitlines()[-1:] or ["import failed"]
+
+    # Leaving out what the bare interpreter imports at startup (site, .pth hooks)
+    entries = [entry for entry in entries if entry[1] not in interpreter_modules]
+    total = max((cumulative for cumulative, name in entries if name == module), default=0)
+    return total, sorted(entries, reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=5, help="slowest transitive imports to list per module")
+    parser.add_argument("--max-ms", type=float, default=None)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    _, baseline = run_importtime("pass")
+    interpreter_modules = {name for _, name in baseline}
+
+    report = {}
+    for module in STARTUP_MODULES:
+        total, entries = profile_module(module, interpreter_modules)
+        if total is None:
+            report[module] = {"error": entries[0]}
+            continue
+        report[module] = {
+            "ms": total / 1000,
+            "slowest": [{"module": name, "ms": us / 1000} for us, name in entries[1:args.top + 1]],
+        }
+
+    # Modules share dependencies, so the largest single import is a lower bound on startup
+    total_ms = sum(entry.get("ms", 0) for entry in report.values())
+    if args.json:
+        print(json.dumps({"modules": report, "sum_ms": total_ms}, indent=2))
+    else:
+        for module, entry in report.items():
+            if "error" in entry:
+                print(f"{module:<28} {'n/a':>9}  ({entry['error']})")
+                continue
+            print(f"{module:<28} {entry['ms']:>7.1f}ms")
+            for slow in entry["slowest"]:
+                print(f"    {slow['module']:<40} {slow['ms']:>7.1f}ms")
+        print(f"{'sum of modules':<28} {total_ms:>7.1f}ms")
+
+    if args.max_ms is not None and total_ms > args.max_ms:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
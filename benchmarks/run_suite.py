@@ -0,0 +1,370 @@
+"""
+End-to-end offline benchmark of ingestion and Q&A at several corpus scales,
+with machine-readable results and a comparison against a saved baseline.
+
+Each scale builds a generated corpus (fixtures.py: text PDFs, scanned PDFs,
+PPTX decks with screenshots, a large CSV and an XLSX sheet, and notes whose
+links point at a local HTTP server) and runs, in a fresh process so peak
+RSS belongs to that scale alone:
+
+- ingest: ingest_uploads without the ingest cache, crawling the found
+  links, and indexing every chunk into a ChatIndex
+- Q&A: per question, embed, retrieve, build the prompt and stream the
+  answer from the offline LocalBackend, running any code block it returns
+  in the sandboxed executor; each question is traced, giving per-stage times
+
+Embeddings use the HashEncoder stand-in unless --real-model is passed, and
+OCR is replaced by a fixed per-image delay (--simulate-ocr-ms) when no
+tesseract binary is installed; both are recorded in the results. Times are
+seconds for whole runs and milliseconds per question.
+
+With --baseline, every metric is compared against an earlier --output file
+and the run exits with status 1 if any got worse by more than --tolerance.
+
+Usage:
+    python benchmarks/run_suite.py [--scales small,medium] [--output results.json]
+    python benchmarks/run_suite.py --baseline results.json [--tolerance 0.1]
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from common import install_encoder
+import bench_ingestion
+from bench_ingestion import NamedUpload
+from fixtures import SCALES, build_corpus
+from local_http import LocalSite
+
+# Bumped whenever metrics are added, renamed or measured differently, so stale baselines are not compared
+SUITE_VERSION = 1
+# Metrics where a larger value is better; for every other metric smaller is better
+HIGHER_IS_BETTER = ("files_per_s", "chunks_per_s", "mb_per_s", "recall")
+# Differences below these are noise however large they are relative to the baseline
+MIN_CHANGE = {"ms": 2.0, "s": 0.1, "mb": 2.0}
+# Reported for context but not compared: generating the corpus is not the app's work
+NOT_COMPARED = ("fixture_s",)
+
+
+def stub_reply(prompt):
+    """The stub LLM: a pandas code block for data questions, a short prose answer otherwise"""
+    question = prompt.rsplit("Question:", 1)[-1]
+    if "df1" in question:
+        return (
+            "Average price per supplier:\n\n```python\n"
+            "print(df1.groupby('supplier')['price'].mean().round(2))\n```"
+        )
+    return f"Based on the reports, {question.strip()[:80]} is covered in the context above."
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def directory_mb(path):
+    return sum(
+        os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names
+    ) / 2**20
+
+
+def percentiles(samples):
+    samples = np.asarray(samples) * 1000
+    return {f"p{q}_ms": round(float(np.percentile(samples, q)), 2) for q in (50, 95, 99)}
+
+
+def run_ingest(uploads, site_url, index):
+    from backend.context_manager import sync_chat_index
+    from backend.ingestion import ingest_uploads
+    from backend.chunker import chunk_text
+    from backend.link_crawler import crawl_urls
+
+    files = [NamedUpload(data, name) for name, data in uploads]
+    start = time.perf_counter()
+    results = ingest_uploads(files, use_cache=False)
+    parsed = time.perf_counter()
+
+    chunks = [chunk for result in results for chunk in result["chunks"]]
+    links = [link for result in results for link in result["links"] if link.startswith(site_url)]
+    pages = crawl_urls(links, use_cache=False)
+    for link, text in pages.items():
+        chunks.extend(chunk_text(text, f"Link: {link}"))
+    crawled = time.perf_counter()
+
+    sync_chat_index(index, chunks)
+    indexed = time.perf_counter()
+
+    errors = [result["error"] for result in results if result["error"]]
+    for error in errors:
+        print(error, file=sys.stderr)
+    megabytes = sum(len(data) for _, data in uploads) / 2**20
+    return results, chunks, {
+        "files": len(uploads),
+        "input_mb": round(megabytes, 2),
+        "chunks": len(chunks),
+        "links_crawled": len(pages),
+        "errors": len(errors),
+        "parse_s": round(parsed - start, 3),
+        "crawl_s": round(crawled - parsed, 3),
+        "index_s": round(indexed - crawled, 3),
+        "total_s": round(indexed - start, 3),
+        "files_per_s": round(len(uploads) / (indexed - start), 2),
+        "chunks_per_s": round(len(chunks) / (indexed - start), 1),
+        "mb_per_s": round(megabytes / (indexed - start), 2),
+    }
+
+
+def run_questions(questions, chunks, named_dfs, index, repeats):
+    from backend.code_executor import get_code_executor
+    from backend.context_manager import get_contextual_results
+    from backend.qa_engine import split_answer, stream_answer
+    from backend.semantic_search import embed_query, get_embedding_service
+    from backend.table_loader import resolve_table
+    from backend.tracing import Trace, waterfall
+
+    chat_history = {"bench": {"context": {"text_chunks": chunks, "sources": []}}}
+    # Repeated passes ask the same questions; every pass should embed them, not hit the service's cache
+    get_embedding_service().cache_entries = 0
+    executor = get_code_executor()
+    # Starting the sandbox workers up front, as the app does at launch, so the first data question is not timed with them
+    executor.run("pass")
+    latencies = {}
+    stages = {}
+    code_errors = 0
+    for kind, question in questions * repeats:
+        with Trace("question", kind=kind) as trace:
+            embedding = embed_query(question)
+            context = get_contextual_results("bench", question, chat_history, index=index, query_embedding=embedding)
+            dfs = named_dfs if kind == "data" else {}
+            answer, executed = "", 0
+            for piece in stream_answer(question, context, named_dfs=dfs):
+                answer += piece
+                _, code_blocks = split_answer(answer)
+                for code in code_blocks[executed:]:
+                    tables = {name: resolve_table(df) for name, (df, _) in dfs.items()}
+                    code_errors += executor.run(code, tables)["error"] is not None
+                    executed += 1
+        latencies.setdefault(kind, []).append(trace.duration_ms / 1000)
+        for row in waterfall(trace.records()):
+            if row["depth"] == 1:
+                stages.setdefault(row["name"], []).append(row["busy_ms"])
+
+    every = [latency for samples in latencies.values() for latency in samples]
+    metrics = {"questions": len(questions), "runs": len(every), "code_errors": code_errors, **percentiles(every)}
+    for kind, samples in latencies.items():
+        metrics[kind] = percentiles(samples)
+    metrics["stage_median_ms"] = {name: round(statistics.median(times), 2) for name, times in stages.items()}
+    return metrics
+
+
+def run_scale(scale, args):
+    """One scale, end to end; meant to run in its own process (see --scale-worker)"""
+    install_encoder(args.real_model)
+    from backend import ocr_engine, qa_engine
+    from backend.llm_backends import LocalBackend
+    from backend.llm_scheduler import LLMScheduler
+    from backend.semantic_search import ChatIndex
+
+    simulate_ocr = args.simulate_ocr_ms is not None
+    if simulate_ocr:
+        bench_ingestion.SIMULATED_OCR_SECONDS = args.simulate_ocr_ms / 1000
+        ocr_engine.ocr_image_bytes = bench_ingestion.simulated_ocr
+    backend = LocalBackend(
+        reply=stub_reply, chunk_chars=16, interval=args.llm_token_ms / 1000,
+        first_token_delay=args.llm_first_token_ms / 1000
+    )
+    scheduler = LLMScheduler(backend)
+    qa_engine.get_scheduler = lambda: scheduler
+
+    tmp = tempfile.mkdtemp(prefix="bench_suite_")
+    try:
+        ocr_engine.OCR_CACHE_DIR = os.path.join(tmp, "ocr")
+        with LocalSite(delay=args.site_delay_ms / 1000, paragraphs=20) as site:
+            start = time.perf_counter()
+            uploads, questions = build_corpus(scale, site.base_url)
+            fixture_seconds = time.perf_counter() - start
+
+            index = ChatIndex()
+            results, chunks, ingest = run_ingest(uploads, site.base_url, index)
+            del uploads
+
+        index_path = os.path.join(tmp, "index", "chat")
+        os.makedirs(os.path.dirname(index_path))
+        index.save(index_path)
+        named_dfs = {
+            f"df{i + 1}": table for i, table in enumerate(
+                table for result in results for table in result["dataframes"]
+            )
+        }
+        qa = run_questions(questions, chunks, named_dfs, index, args.repeats)
+        return {
+            "fixture_s": round(fixture_seconds, 2),
+            "ingest": ingest,
+            "index": {
+                "chunks": len(index),
+                "resident_mb": round(index.nbytes / 2**20, 2),
+                "disk_mb": round(directory_mb(os.path.dirname(index_path)), 2),
+            },
+            "qa": qa,
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+        }
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def settings(args):
+    return {
+        "embedding_model": "all-MiniLM-L6-v2" if args.real_model else "HashEncoder",
+        "ocr": f"simulated {args.simulate_ocr_ms} ms/image" if args.simulate_ocr_ms is not None else "tesseract",
+        "llm": f"LocalBackend, first token {args.llm_first_token_ms} ms, {args.llm_token_ms} ms/piece",
+        "site_delay_ms": args.site_delay_ms,
+        "repeats": args.repeats,
+    }
+
+
+def flatten(metrics, prefix=""):
+    flat = {}
+    for key, value in metrics.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+def unit(name):
+    last = name.rsplit(".", 1)[-1]
+    return next((suffix for suffix in MIN_CHANGE if last.endswith("_" + suffix)), None)
+
+
+def compare(current, baseline, tolerance):
+    """Printing every metric next to its baseline value; returns the names of those that regressed"""
+    if baseline.get("version") != current["version"]:
+        print(f"Baseline is from suite version {baseline.get('version')}, not {current['version']}; "
+              f"some metrics may not be comparable")
+    if baseline.get("settings") != current["settings"]:
+        print(f"Baseline settings differ: {baseline.get('settings')}")
+
+    regressions = []
+    print(f"\n{'metric':<44}{'baseline':>12}{'current':>12}{'change':>9}")
+    for scale, metrics in current["scales"].items():
+        old = flatten(baseline.get("scales", {}).get(scale, {}))
+        for name, value in flatten(metrics).items():
+            if name not in old or name in NOT_COMPARED:
+                continue
+            before = old[name]
+            change = (value - before) / before if before else 0.0
+            higher_is_better = name.rsplit(".", 1)[-1].endswith(HIGHER_IS_BETTER)
+            worse = change < -tolerance if higher_is_better else change > tolerance
+            suffix = unit(name)
+            if suffix is None and not higher_is_better:
+                worse = False  # counts (files, chunks, questions) describe the workload, not its speed
+            if suffix is not None and abs(value - before) < MIN_CHANGE[suffix]:
+                worse = False
+            label = f"{scale}.{name}"
+            if worse:
+                regressions.append(label)
+            flag = "  REGRESSION" if worse else ""
+            print(f"{label:<44}{before:>12g}{value:>12g}{change:>+9.1%}{flag}")
+    return regressions
+
+
+def print_summary(report):
+    print(f"{'scale':<8}{'files':>7}{'MB':>8}{'chunks':>8}{'ingest s':>10}{'files/s':>9}"
+          f"{'index MB':>10}{'disk MB':>9}{'peak RSS':>10}{'q p50':>8}{'q p95':>8}{'q p99':>8}")
+    for scale, m in report["scales"].items():
+        ingest, index, qa = m["ingest"], m["index"], m["qa"]
+        print(f"{scale:<8}{ingest['files']:>7}{ingest['input_mb']:>8.1f}{ingest['chunks']:>8}"
+              f"{ingest['total_s']:>10.2f}{ingest['files_per_s']:>9.1f}{index['resident_mb']:>10.1f}"
+              f"{index['disk_mb']:>9.1f}{m['peak_rss_mb']:>10.0f}{qa['p50_ms']:>8.1f}{qa['p95_ms']:>8.1f}"
+              f"{qa['p99_ms']:>8.1f}")
+    for scale, m in report["scales"].items():
+        stages = ", ".join(f"{name} {ms:.1f}" for name, ms in m["qa"]["stage_median_ms"].items())
+        print(f"{scale}: ingest {m['ingest']['parse_s']:.2f} s parse, {m['ingest']['crawl_s']:.2f} s crawl, "
+              f"{m['ingest']['index_s']:.2f} s index; median ms per question: {stages}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="small,medium", help=f"comma-separated, from {', '.join(SCALES)}")
+    parser.add_argument("--output", help="write the results as JSON to this path")
+    parser.add_argument("--baseline", help="compare against the JSON written by an earlier --output")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="relative change counted as a regression")
+    parser.add_argument("--repeats", type=int, default=3, help="passes over the question set per scale")
+    parser.add_argument("--simulate-ocr-ms", type=float, default=None,
+                        help="replace tesseract with this per-image delay (default: 50 when tesseract is missing)")
+    parser.add_argument("--llm-first-token-ms", type=float, default=0.0)
+    parser.add_argument("--llm-token-ms", type=float, default=0.0)
+    parser.add_argument("--site-delay-ms", type=float, default=5.0)
+    parser.add_argument("--real-model", action="store_true")
+    parser.add_argument("--scale-worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.simulate_ocr_ms is None and shutil.which("tesseract") is None:
+        args.simulate_ocr_ms = 50.0
+
+    if args.scale_worker:
+        print(json.dumps(run_scale(args.scale_worker, args)))
+        return
+
+    scales = [scale.strip() for scale in args.scales.split(",") if scale.strip()]
+    unknown = [scale for scale in scales if scale not in SCALES]
+    if unknown:
+        parser.error(f"unknown scales {unknown}, expected some of {list(SCALES)}")
+
+    report = {
+        "version": SUITE_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "machine": {
+            "python": platform.python_version(), "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(), "cpus": os.cpu_count(),
+        },
+        "settings": settings(args),
+        "scales": {},
+    }
+    for scale in scales:
+        print(f"Running {scale} scale...", file=sys.stderr)
+        # A fresh interpreter per scale, so peak RSS is not carried over from a larger run
+        command = [
+            sys.executable, os.path.abspath(__file__), "--scale-worker", scale,
+            "--llm-first-token-ms", str(args.llm_first_token_ms), "--llm-token-ms", str(args.llm_token_ms),
+            "--site-delay-ms", str(args.site_delay_ms), "--repeats", str(args.repeats),
+        ]
+        if args.simulate_ocr_ms is not None:
+            command += ["--simulate-ocr-ms", str(args.simulate_ocr_ms)]
+        if args.real_model:
+            command.append("--real-model")
+        completed = subprocess.run(command, stdout=subprocess.PIPE, text=True)
+        if completed.returncode != 0:
+            sys.exit(f"The {scale} scale failed with exit status {completed.returncode}")
+        report["scales"][scale] = json.loads(completed.stdout.strip().splitlines()[-1])
+
+    print_summary(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} metrics regressed by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.tolerance:.0%}")
+
+
+if __name__ == "__main__":
+    main()
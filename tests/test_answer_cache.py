@@ -0,0 +1,43 @@
+import io
+
+import pandas as pd
+
+from backend import answer_cache
+from backend.answer_cache import AnswerCache, context_fingerprint
+from backend.ingestion import ingest_uploads
+
+
+class NamedUpload(io.BytesIO):
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+
+
+def named_dfs(csv):
+    result = ingest_uploads([NamedUpload(csv, "sales.csv")], use_cache=False)[0]
+    return {"df1": result["dataframes"][0]}
+
+
+def test_corrected_upload_with_same_shape_changes_the_fingerprint():
+    original = named_dfs(b"region,total\nnorth,100\nsouth,200\n")
+    corrected = named_dfs(b"region,total\nnorth,100\nsouth,250\n")
+
+    assert context_fingerprint([], original) == context_fingerprint([], named_dfs(b"region,total\nnorth,100\nsouth,200\n"))
+    assert context_fingerprint([], original) != context_fingerprint([], corrected)
+
+
+def test_frames_without_an_ingest_key_are_fingerprinted_by_content():
+    first = {"df1": (pd.DataFrame({"total": [100, 200]}), "t.csv")}
+    second = {"df1": (pd.DataFrame({"total": [100, 250]}), "t.csv")}
+
+    assert context_fingerprint([], first) != context_fingerprint([], second)
+
+
+def test_semantic_matching_is_off_by_default(tmp_path):
+    assert answer_cache.SEMANTIC_MATCH_THRESHOLD is None
+    cache = AnswerCache(path=str(tmp_path / "answers.db"))
+    chunks = [("Totals per year", "report.pdf")]
+    cache.put("What is the total for 2023?", chunks, "1,000", question_embedding=[1.0, 0.0])
+
+    assert cache.get("What is the total for 2024?", chunks, question_embedding=[1.0, 0.0]) is None
+    assert cache.get("what is the total for 2023", chunks, question_embedding=[1.0, 0.0]) == "1,000"
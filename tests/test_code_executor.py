@@ -0,0 +1,86 @@
+import gc
+import os
+from collections import OrderedDict
+
+import pandas as pd
+
+from backend.code_executor import CodeExecutor, SharedTables, _run_in_worker, decode_table
+
+
+def run_in_worker(code, tables=None, max_stdout=1000, max_table_rows=100):
+    shared = SharedTables()
+    handles = shared.acquire(tables or {})
+    try:
+        return _run_in_worker(code, handles, OrderedDict(), cpu_seconds=10, memory_bytes=1 << 30,
+                              max_stdout=max_stdout, max_table_rows=max_table_rows)
+    finally:
+        shared.clear()
+
+
+def test_export_is_removed_when_the_dataframe_dies(tmp_path):
+    shared = SharedTables(directory=str(tmp_path))
+    df = pd.DataFrame({"a": range(10)})
+    tables = {"df1": df}
+    (path, _), = shared.acquire(tables).values()
+    shared.release(tables)
+    assert os.path.exists(path)
+
+    del df, tables
+    gc.collect()
+    assert not os.path.exists(path)
+    assert len(shared) == 0
+
+
+def test_eviction_and_clear_leave_no_files(tmp_path):
+    shared = SharedTables(directory=str(tmp_path), max_bytes=0)
+    frames = [pd.DataFrame({"a": range(100)}) for _ in range(3)]
+    for df in frames:
+        shared.acquire({"df": df})
+        shared.release({"df": df})
+    assert len(shared) == 0
+    assert os.listdir(tmp_path) == []
+
+    shared.max_bytes = 1 << 30
+    shared.acquire({"df": frames[0]})
+    shared.clear()
+    del frames
+    gc.collect()
+    assert os.listdir(tmp_path) == []
+
+
+def test_printed_and_written_dataframes_come_back_as_tables_in_order():
+    df = pd.DataFrame({"supplier": ["Hanil", "Mando", "Hanil"], "price": [1.5, 2.0, 3.5]})
+    result = run_in_worker(
+        "print('Average price')\n"
+        "print(df1.groupby('supplier')['price'].mean())\n"
+        "st.markdown('**Done**')\n"
+        "st.dataframe(df1)\n",
+        {"df1": df},
+    )
+
+    assert result["error"] is None
+    assert [output["kind"] for output in result["outputs"]] == ["text", "table", "markdown", "table"]
+    assert result["stdout"] == "Average price\n"
+    means = decode_table(result["outputs"][1])
+    assert means["price"].tolist() == [2.5, 2.0]
+    pd.testing.assert_frame_equal(decode_table(result["outputs"][3]), df)
+
+
+def test_large_tables_and_output_are_capped():
+    df = pd.DataFrame({"a": range(500)})
+    result = run_in_worker("st.write(df1)\nprint('x' * 5000)", {"df1": df}, max_stdout=100, max_table_rows=20)
+
+    table = result["outputs"][0]
+    assert table["rows"] == 500 and len(decode_table(table)) == 20
+    assert result["stdout"].startswith("x" * 100)
+    assert result["stdout"].endswith("(output truncated)")
+
+
+def test_executor_returns_outputs_from_the_worker_process():
+    executor = CodeExecutor(workers=1)
+    try:
+        result = executor.run("print(df1.head(2))", {"df1": pd.DataFrame({"a": [1, 2, 3]})})
+    finally:
+        executor.close()
+    assert result["error"] is None
+    assert decode_table(result["outputs"][0])["a"].tolist() == [1, 2]
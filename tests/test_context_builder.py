@@ -0,0 +1,27 @@
+from backend.context_builder import build_context, strip_boilerplate
+
+HEADER = "ACME Brake Systems - Confidential - Service Report 2024"
+
+
+def test_repeated_line_that_answers_the_question_is_kept():
+    chunks = [
+        (f"2024-03-0{day} 08:1{day} caliper check\nPart: MX-4471-B\nwear {day} mm, within limits", "log.txt")
+        for day in range(1, 4)
+    ]
+    text, _, report = build_context(chunks)
+    assert "Part: MX-4471-B" in text
+    assert report["chunks_used"] == 3
+
+
+def test_page_headers_and_footers_are_stripped_after_the_first_chunk():
+    texts = [f"{HEADER}\nPage {page}\nObservation {page}: rotor wear.\nPage footer" for page in range(1, 5)]
+    stripped = strip_boilerplate(texts)
+
+    assert stripped[0] == texts[0]
+    for page, text in enumerate(stripped[1:], start=2):
+        assert text == f"Page {page}\nObservation {page}: rotor wear."
+
+
+def test_repeated_lines_inside_a_chunk_are_not_stripped():
+    texts = [f"Line {i} of section A\nTorque spec: 45 Nm\nLine {i} of section B" for i in range(4)]
+    assert strip_boilerplate(texts) == texts
@@ -0,0 +1,20 @@
+import pytest
+
+from backend.lexical_index import is_keyword_query
+
+
+@pytest.mark.parametrize("query", ["MX-4471-B", "BP-2041 torque", "mx4471 supplier", "4471-22"])
+def test_short_queries_naming_an_id_are_keyword_queries(query):
+    assert is_keyword_query(query)
+
+
+@pytest.mark.parametrize("query", [
+    "What was revenue in 2023?",
+    "summary of 2022 results",
+    "Q3 2023 defects",
+    "1st shift defects",
+    "brake wear",
+    "Which supplier delivered part MX-4471-B late last month?",
+])
+def test_questions_with_plain_numbers_or_many_terms_are_not(query):
+    assert not is_keyword_query(query)
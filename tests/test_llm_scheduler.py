@@ -0,0 +1,101 @@
+import threading
+import time
+
+import pytest
+
+from backend.llm_backends import LLMBackend, LocalBackend, TransientLLMError
+from backend.llm_scheduler import LLMScheduler, StreamStalled
+
+
+def scheduler_for(backend, **kwargs):
+    return LLMScheduler(backend, max_concurrency=1, base_delay=0.0, max_delay=0.0, user_rate_per_minute=0, **kwargs)
+
+
+def test_slow_or_abandoned_stream_does_not_hold_the_slot():
+    scheduler = scheduler_for(LocalBackend(reply="x" * 64, chunk_chars=8, interval=0.0, first_token_delay=0.0))
+    stream = scheduler.stream("prompt")
+    assert next(stream) == "x" * 8
+
+    # The caller is now "running a code block" and never resumes the stream
+    answered = []
+    other = threading.Thread(target=lambda: answered.append(scheduler.generate("other prompt")))
+    other.start()
+    other.join(timeout=5)
+
+    assert answered == ["x" * 64]
+    stream.close()
+    assert scheduler.stats["in_flight"] == 0
+
+
+def test_closing_the_stream_stops_the_reader():
+    scheduler = scheduler_for(LocalBackend(reply="x" * 400, chunk_chars=4, interval=0.01, first_token_delay=0.0))
+    stream = scheduler.stream("prompt")
+    next(stream)
+    stream.close()
+
+    deadline = time.monotonic() + 2
+    while scheduler.stats["in_flight"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert scheduler.stats["in_flight"] == 0
+
+
+def test_stream_retries_before_the_first_piece_and_reraises_after():
+    class Flaky(LLMBackend):
+        def __init__(self):
+            self.calls = 0
+
+        def stream(self, prompt, images=None):
+            self.calls += 1
+            if self.calls == 1:
+                raise TransientLLMError("busy")
+            yield "first"
+            raise ValueError("broken mid-answer")
+
+    backend = Flaky()
+    stream = scheduler_for(backend).stream("prompt")
+    assert next(stream) == "first"
+    with pytest.raises(ValueError):
+        next(stream)
+    assert backend.calls == 2
+
+
+def test_backend_without_streaming_answers_in_one_piece():
+    class Plain(LLMBackend):
+        def generate(self, prompt, images=None):
+            return f"answer to {prompt}"
+
+    assert list(scheduler_for(Plain()).stream("q")) == ["answer to q"]
+
+
+def test_stalled_stream_gives_up_and_releases_the_slot():
+    resume = threading.Event()
+
+    class Stalling(LLMBackend):
+        def generate(self, prompt, images=None):
+            return "other answer"
+
+        def stream(self, prompt, images=None):
+            yield "first"
+            resume.wait(10)
+            yield "late"
+
+    scheduler = scheduler_for(Stalling(), stream_idle_seconds=0.2)
+    stream = scheduler.stream("prompt")
+    assert next(stream) == "first"
+    started = time.monotonic()
+    with pytest.raises(StreamStalled):
+        next(stream)
+    assert time.monotonic() - started < 2
+    assert scheduler.stats["in_flight"] == 0
+
+    # The slot is free for other sessions even though the provider is still stuck
+    assert scheduler.generate("other prompt") == "other answer"
+    resume.set()
+
+
+def test_waiting_for_a_slot_is_not_a_stall():
+    scheduler = scheduler_for(LocalBackend(reply="x" * 8, chunk_chars=8, interval=0.0, first_token_delay=0.0),
+                              stream_idle_seconds=0.1)
+    scheduler._slots.acquire()
+    threading.Timer(0.5, scheduler._slots.release).start()
+    assert list(scheduler.stream("prompt")) == ["x" * 8]
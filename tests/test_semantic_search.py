@@ -0,0 +1,61 @@
+import threading
+
+import numpy as np
+
+from backend.semantic_search import ChatIndex
+
+
+def make_chunks(n, source):
+    return [(f"brake report {source} part MX-{i:05d} torque {i % 97} Nm", source) for i in range(n)]
+
+
+def vectors(n, seed):
+    return np.random.default_rng(seed).standard_normal((n, 32)).astype(np.float32)
+
+
+def test_concurrent_adds_and_searches_stay_consistent():
+    index = ChatIndex(dtype="float32")
+    index.add(make_chunks(200, "base.pdf"), embeddings=vectors(200, 0))
+    queries = vectors(4, 99)
+    errors = []
+
+    def writer(worker):
+        try:
+            for round_num in range(20):
+                source = f"upload-{worker}-{round_num}.pdf"
+                index.add(make_chunks(50, source), embeddings=vectors(50, worker * 100 + round_num))
+        except Exception as e:
+            errors.append(e)
+
+    def reader():
+        try:
+            for round_num in range(100):
+                for hits in index.search(queries, top_k=10):
+                    assert len(hits) == 10
+                assert index.hybrid_search("MX-00042", top_k=3)
+                assert index.hybrid_search("brake torque", top_k=5, query_embedding=queries[0])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(2)] + \
+              [threading.Thread(target=reader) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(index) == len(index.store) == 200 + 2 * 20 * 50
+    assert len(index.lexical.doc_lengths) == len(index)
+
+
+def test_the_same_chunks_added_twice_at_once_are_indexed_once():
+    index = ChatIndex(dtype="float32")
+    chunks = make_chunks(500, "report.pdf")
+    embeddings = vectors(500, 1)
+    threads = [threading.Thread(target=index.add, args=(chunks,), kwargs={"embeddings": embeddings}) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(index) == len(index.store) == 500
@@ -0,0 +1,46 @@
+import io
+
+import pandas as pd
+
+from backend import table_loader
+from backend.table_loader import downcast, load_tables
+
+
+class NamedUpload(io.BytesIO):
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+
+
+def test_arithmetic_on_downcast_integers_does_not_wrap():
+    df = downcast(pd.DataFrame({"shipped": [5, 200, 5], "returned": [15, 5, 15], "qty": [100, 120, 7]}))
+
+    assert (df["shipped"] - df["returned"]).tolist() == [-10, 195, -10]
+    assert (df["shipped"] * df["returned"]).tolist() == [75, 1000, 75]
+    assert (df["qty"] * 2).tolist() == [200, 240, 14]
+    assert df["qty"].sum() * 1_000_000 == 227_000_000
+
+
+def test_downcast_keeps_exact_floats_and_categories():
+    df = downcast(pd.DataFrame({"price": [1.5, 2.25, None, 4.0], "region": ["north", "north", "south", "south"]}))
+
+    assert df["price"].dtype == "float32"
+    assert isinstance(df["region"].dtype, pd.CategoricalDtype)
+
+
+def test_workbook_sheets_are_parsed_in_one_pass(monkeypatch):
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer) as writer:
+        for i in range(3):
+            pd.DataFrame({"a": [i, i + 1]}).to_excel(writer, sheet_name=f"s{i}", index=False)
+    calls = []
+    read_excel = pd.read_excel
+    monkeypatch.setattr(table_loader.pd, "read_excel", lambda *args, **kwargs: calls.append(kwargs) or read_excel(*args, **kwargs))
+
+    tables = load_tables(NamedUpload(buffer.getvalue(), "book.xlsx"), "xlsx", background_bytes=1)
+    assert [label for _, label in tables] == ["book.xlsx [s0]", "book.xlsx [s1]", "book.xlsx [s2]"]
+    frames = [table.result(timeout=10) for table, _ in tables]
+
+    assert [df["a"].tolist() for df in frames] == [[0, 1], [1, 2], [2, 3]]
+    # One pass for the previews, one for the full sheets
+    assert len(calls) == 2